@@ -0,0 +1,150 @@
+import logging
+import threading
+from datetime import date, timedelta
+from sqlalchemy import text, bindparam
+from be.model import store
+
+# 支持的滚动窗口（天数）
+WINDOWS = {"1d": 1, "7d": 7, "30d": 30}
+DEFAULT_WINDOW = "7d"
+GLOBAL_SCOPE = None  # 全站榜单使用的 store_id 键
+
+
+class BestsellerBoard:
+    """
+    畅销榜：以 book_sales_daily（按 店铺 × 书籍 × 日期 汇总的销量）为物化表，
+    内存中保存最近 30 天的日销量，按店铺与全站两个维度提供 1d/7d/30d 滚动窗口排名。
+    - 启动时从物化表加载（表为空时先由 history_order_detail.sales 回填）；
+    - 支付成功后由 Buyer.payment 在同一事务内增量写表，并在提交后调用 record 更新内存；
+    - 定时 refresh 从物化表重建内存，合并其他进程写入的销量；
+    - 日期统一以数据库时钟（CURDATE()）为准：支付写表用 CURDATE()，加载时记录数据库日期与本机日期的偏移，
+      内存中的记录与窗口计算按同一偏移换算，应用与数据库时区不同或跨零点时同一笔销量不会落入不同的日桶。
+    """
+
+    def __init__(self):
+        self._daily = {}  # (store_id, sales_date) -> {book_id: sales}
+        self._ranked = {}  # (store_id, window, today) -> [(book_id, sales)]
+        self._lock = threading.Lock()
+        self._day_offset = timedelta(0)  # 数据库日期 - 本机日期
+        self.loaded = False
+
+    def today(self) -> date:
+        """
+        按数据库时钟换算的当天日期
+        """
+        return date.today() + self._day_offset
+
+    def load(self, engine=None, backfill: bool = True):
+        engine = engine or store.get_db_conn()
+        with engine.connect() as conn:
+            db_today = conn.execute(text("SELECT CURDATE()")).scalar()
+            since = db_today - timedelta(days=max(WINDOWS.values()) - 1)
+            if backfill:
+                count = conn.execute(text("SELECT COUNT(*) FROM book_sales_daily")).scalar()
+                if not count:
+                    conn.execute(text("""
+                        INSERT INTO book_sales_daily (store_id, book_id, sales_date, sales)
+                        SELECT h.store_id, hod.book_id, DATE(h.commit_time), SUM(hod.sales)
+                        FROM history_order h
+                        JOIN history_order_detail hod ON h.order_id = hod.order_id
+                        WHERE hod.sales > 0
+                        GROUP BY h.store_id, hod.book_id, DATE(h.commit_time)
+                    """))
+                    conn.commit()
+                    logging.info("[INFO] book_sales_daily backfilled from history_order_detail")
+            rows = conn.execute(text("""
+                SELECT store_id, book_id, sales_date, sales
+                FROM book_sales_daily
+                WHERE sales_date >= :since
+            """), {"since": since}).fetchall()
+
+        daily = {}
+        for store_id, book_id, sales_date, sales in rows:
+            for scope in (store_id, GLOBAL_SCOPE):
+                counter = daily.setdefault((scope, sales_date), {})
+                counter[book_id] = counter.get(book_id, 0) + int(sales)
+        with self._lock:
+            self._daily = daily
+            self._ranked = {}
+            self._day_offset = db_today - date.today()
+            self.loaded = True
+        logging.info(f"[INFO] Bestseller board loaded: {len(rows)} daily rows")
+
+    def refresh(self):
+        try:
+            self.load(backfill=False)
+        except Exception as e:
+            logging.error(f"[ERROR] Failed to refresh bestseller board: {str(e)}")
+
+    def record(self, store_id: str, sales: list, sales_date: date = None):
+        """
+        记录一笔已提交的支付：sales 为 [(book_id, 销量)]，sales_date 默认为数据库时钟的当天
+        """
+        sales_date = sales_date or self.today()
+        with self._lock:
+            for scope in (store_id, GLOBAL_SCOPE):
+                counter = self._daily.setdefault((scope, sales_date), {})
+                for book_id, count in sales:
+                    counter[book_id] = counter.get(book_id, 0) + count
+            self._ranked = {}
+
+    def top(self, n: int = 10, store_id: str = None, window: str = DEFAULT_WINDOW) -> list:
+        """
+        返回窗口内销量最高的 n 本书：[(book_id, 销量)]
+        """
+        days = WINDOWS[window]
+        today = self.today()
+        key = (store_id, window, today)
+        with self._lock:
+            ranked = self._ranked.get(key)
+            if ranked is None:
+                totals = {}
+                for offset in range(days):
+                    counter = self._daily.get((store_id, today - timedelta(days=offset)))
+                    if not counter:
+                        continue
+                    for book_id, count in counter.items():
+                        totals[book_id] = totals.get(book_id, 0) + count
+                ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+                self._ranked[key] = ranked
+        return ranked[:n]
+
+    def clear(self):
+        with self._lock:
+            self._daily = {}
+            self._ranked = {}
+            self.loaded = False
+
+
+def bestseller_books(conn, n: int, store_id: str = None, window: str = DEFAULT_WINDOW) -> list:
+    """
+    畅销榜书籍详情（按销量降序），conn 为已打开的数据库连接
+    """
+    ranked = bestseller_board.top(n, store_id=store_id, window=window)
+    if not ranked:
+        return []
+    query_book_details = text("""
+        SELECT book_id, title, author, publisher, price
+        FROM new_books
+        WHERE book_id IN :book_ids
+    """).bindparams(bindparam("book_ids", expanding=True))
+    rows = conn.execute(query_book_details, {"book_ids": [book_id for book_id, _ in ranked]}).fetchall()
+    details = {row[0]: row for row in rows}
+    books = []
+    for book_id, sales in ranked:
+        row = details.get(book_id)
+        if row is None:
+            continue
+        books.append({
+            "book_id": row[0],
+            "title": row[1],
+            "author": row[2],
+            "publisher": row[3],
+            "price": row[4],
+            "sales": sales,
+        })
+    return books
+
+
+# 全局实例（进程内共享）
+bestseller_board = BestsellerBoard()
@@ -6,12 +6,17 @@ from be.model import error
 from sqlalchemy.sql import text
 from sqlalchemy.exc import SQLAlchemyError
 import json
-from fe.access.book import Book
 from be.model.times import unpaid_orders
+from be.model.recommend_cache import recommend_cache
+from be.model.bestseller import bestseller_board, bestseller_books, WINDOWS
+from be.model import recommender
+from be.model.minhash import minhash_index
+from be.model.title_model import model_registry, title_batcher, title_result_cache, title_input_hash, DEFAULT_TITLE_MODEL
+from be.model.title_matcher import fast_extract_titles
+from be.model.title_jobs import title_job_pool, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED, MAX_LONG_POLL_SECONDS
+from be.model.credentials import credential_service
 from datetime import datetime
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 from collections import defaultdict
-import torch
 import re
 import logging
 
@@ -148,7 +153,7 @@ class Buyer(db_conn.DBConn):
 
             # 2. 检查商店是否存在（事务外）
             with self.conn.connect() as conn:
-                store_check_query = "SELECT 1 FROM stores WHERE store_id = :store_id"
+                store_check_query = "SELECT 1 FROM store WHERE store_id = :store_id"
                 store_result = conn.execute(text(store_check_query), {"store_id": store_id}).fetchone()
                 if store_result is None:
                     return error.error_non_exist_store_id(store_id) + (order_id,)
@@ -268,8 +273,11 @@ class Buyer(db_conn.DBConn):
                 # 验证用户密码
                 query_user = text("SELECT * FROM users WHERE user_id = :user_id")
                 user = conn.execute(query_user, {"user_id": user_id}).mappings().fetchone()
-                if not user or user['password'] != password:
+                if not user:
                     return error.error_authorization_fail()
+                code, message = credential_service.verify(user_id, password, user['password'])
+                if code != 200:
+                    return code, message
 
                 # 计算订单总金额
                 query_total_price = text("""
@@ -293,7 +301,7 @@ class Buyer(db_conn.DBConn):
                 conn.execute(update_buyer_balance, {"total_price": total_price, "user_id": user_id})
 
                 # 增加卖家余额
-                query_store = text("SELECT user_id FROM stores WHERE store_id = :store_id")
+                query_store = text("SELECT user_id FROM store WHERE store_id = :store_id")
                 seller_user_id = conn.execute(query_store, {"store_id": order['store_id']}).scalar()
                 if not seller_user_id:
                     return 528, "Invalid store_id"
@@ -329,6 +337,19 @@ class Buyer(db_conn.DBConn):
                         "sales": detail['count'],  # 假设销量等于数量
                     })
 
+                # 增量维护畅销榜物化表（与支付同一事务），日期取数据库时钟，与回填使用同一时钟
+                for detail in order_details:
+                    upsert_sales = text("""
+                        INSERT INTO book_sales_daily (store_id, book_id, sales_date, sales)
+                        VALUES (:store_id, :book_id, CURDATE(), :sales)
+                        ON DUPLICATE KEY UPDATE sales = sales + VALUES(sales)
+                    """)
+                    conn.execute(upsert_sales, {
+                        "store_id": order['store_id'],
+                        "book_id": detail['book_id'],
+                        "sales": detail['count'],
+                    })
+
                 # 查询订单数据
                 query_order_data = text("""
                     SELECT order_id, store_id, user_id, commit_time 
@@ -359,6 +380,13 @@ class Buyer(db_conn.DBConn):
 
                 conn.commit()  # 提交事务
                 print("[DEBUG] Transaction committed.")
+                recommend_cache.invalidate_user(user_id)
+                bestseller_board.record(
+                    order['store_id'],
+                    [(detail['book_id'], detail['count']) for detail in order_details],
+                )
+                if minhash_index.accepting_updates:
+                    minhash_index.add(user_id, [detail['book_id'] for detail in order_details])
 
         except Exception as e: 
             conn.rollback()  # 出现异常回滚事务
@@ -407,8 +435,11 @@ class Buyer(db_conn.DBConn):
                     {"user_id": user_id}
                 ).fetchone()
 
-                if result is None or result[0] != password:
+                if result is None:
                     return error.error_authorization_fail()
+            code, message = credential_service.verify(user_id, password, result[0])
+            if code != 200:
+                return code, message
 
             # 2. 更新余额（事务内）
             with self.conn.connect() as connection:
@@ -751,6 +782,7 @@ class Buyer(db_conn.DBConn):
                     conn.execute(delete_new_order_details, {"order_id": order_id})
 
                     trans.commit()
+                    recommend_cache.invalidate_user(user_id)
                 except Exception as e:
                     trans.rollback()
                     logging.error(f"[ERROR] 取消订单时发生错误: {str(e)}")
@@ -841,168 +873,57 @@ class Buyer(db_conn.DBConn):
             print(f"[ERROR] Exception in auto_cancel: {str(e)}")
             return 528, f"Unexpected error: {str(e)}"       
 
-    def recommend_books_one(self, user_id: str, count: int) -> (int, str, list):
+    def recommend_books_one(self, user_id: str, count: int, engine: str = None) -> (int, str, list):
+        """
+        单用户推荐，默认使用协同过滤引擎，engine 可指定其他已注册的推荐引擎
+        """
+        return recommender.recommend(self.conn, user_id, count, name=engine, default="collaborative", endpoint="buyer")
+
+    def bestsellers(self, store_id: str = None, window: str = "7d", count: int = 10) -> (int, str, list):
+        """
+        畅销榜：按店铺（store_id 为空时为全站）返回滚动窗口内销量最高的书籍
+        """
+        if window not in WINDOWS:
+            return 400, f"Invalid window {window}, expected one of {', '.join(WINDOWS)}", []
         try:
             with self.conn.connect() as conn:
-                # 检查用户是否存在
-                user_check_query = "SELECT 1 FROM users WHERE user_id = :user_id"
-                user_exists = conn.execute(text(user_check_query), {"user_id": user_id}).fetchone()
-                print(f"[DEBUG] 检查用户是否存在: user_id={user_id}, user_exists={user_exists}")
-                if not user_exists:
-                    print(f"[ERROR] 用户 {user_id} 不存在。")
-                    return 404, "User does not exist", []
-
-                # 第一步：找到当前用户的订单
-                user_orders_query = "SELECT order_id FROM history_order WHERE user_id = :user_id"
-                user_orders = conn.execute(text(user_orders_query), {"user_id": user_id}).fetchall()
-                print(f"[DEBUG] 用户 {user_id} 的订单：{user_orders}")
-                user_order_ids = [record[0] for record in user_orders]  # 确保使用元组索引提取数据
-                print(f"[DEBUG] 提取的订单ID：{user_order_ids}")
-
-                # 检查用户是否有订单
-                if not user_order_ids:
-                    print(f"[ERROR] 用户 {user_id} 没有订单。")
-                    return 528, "User has no orders", []
-
-                # 第二步：通过订单ID找到用户已购买的书籍
-                purchased_books_query = """
-                    SELECT DISTINCT book_id 
-                    FROM history_order_detail 
-                    WHERE order_id IN :order_ids
-                """
-                print(f"[DEBUG] 执行查询以获取已购买书籍：{purchased_books_query}")
-                purchased_books = conn.execute(
-                    text(purchased_books_query),
-                    {"order_ids": tuple(user_order_ids)}
-                ).fetchall()
-                print(f"[DEBUG] 查询结果：{purchased_books}")
-                user_purchased_books = {record[0] for record in purchased_books}
-                print(f"[DEBUG] 用户 {user_id} 已购买的书籍：{user_purchased_books}")
-
-                # 检查是否找到已购买的书籍
-                if not user_purchased_books:
-                    print(f"[ERROR] 用户 {user_id} 没有已购买的书籍。")
-                    return 528, "User has not purchased any books", []
-
-                # 第三步：查找其他用户购买相同书籍的订单和用户
-                similar_users_query = """
-                    SELECT DISTINCT h.user_id, hod.order_id, hod.book_id
-                    FROM history_order_detail hod
-                    JOIN history_order h ON hod.order_id = h.order_id
-                    WHERE hod.book_id IN :book_ids
-                    AND h.user_id != :user_id
-                """
-                print(f"[DEBUG] 执行查询以查找购买相同书籍的用户：{similar_users_query}")
-                similar_users = conn.execute(
-                    text(similar_users_query),
-                    {"book_ids": tuple(user_purchased_books), "user_id": user_id}
-                ).fetchall()
-                print(f"[DEBUG] 查询结果（购买相同书籍的用户）：{similar_users}")
-
-                # 提取订单ID和用户ID
-                order_ids = set()
-                user_ids = set()
-                for record in similar_users:
-                    order_ids.add(record[1])  # 假设 order_id 在元组中是第二个元素
-                    user_ids.add(record[0])   # 假设 user_id 在元组中是第一个元素
-                print(f"[DEBUG] 提取的订单ID：{order_ids}")
-                print(f"[DEBUG] 提取的用户ID：{user_ids}")
-
-                # 检查是否找到其他用户
-                if not user_ids:
-                    print("[ERROR] 未找到购买相同书籍的其他用户。")
-                    return 528, "No similar users found", []
-
-                # 第四步：查找这些用户购买的其他书籍，排除当前用户已购买的书籍
-                other_books_query = """
-                    SELECT hod.book_id, COUNT(*) as frequency
-                    FROM history_order_detail hod
-                    JOIN history_order h ON hod.order_id = h.order_id
-                    WHERE hod.order_id IN :order_ids
-                    AND hod.book_id NOT IN :user_books
-                    AND h.user_id IN :user_ids
-                    GROUP BY hod.book_id
-                    ORDER BY frequency DESC
-                    LIMIT :count
-                """
-                print(f"[DEBUG] 执行查询以获取推荐书籍：{other_books_query}")
-                print(f"[DEBUG] 查询参数：order_ids={tuple(order_ids)}, user_books={tuple(user_purchased_books)}, user_ids={tuple(user_ids)}, count={count}")
-                other_books = conn.execute(
-                    text(other_books_query),
-                    {
-                        "order_ids": tuple(order_ids),
-                        "user_books": tuple(user_purchased_books),
-                        "user_ids": tuple(user_ids),
-                        "count": count,
-                    },
-                ).mappings().fetchall()
-                print(f"[DEBUG] 查询结果：{list(other_books)}")
-
-                if not other_books:
-                    print("[ERROR] 未找到推荐书籍。")
-                    return 200, "No recommended books found", []
-
-                # 获取书籍详细信息
-                book_ids = [record["book_id"] for record in other_books]
-                print(f"[DEBUG] 提取的书籍ID：{book_ids}")
-                book_query = """
-                    SELECT book_id, title, author, publisher, price
-                    FROM new_books
-                    WHERE book_id IN :book_ids
-                """
-                print(f"[DEBUG] 执行查询以获取书籍详细信息：{book_query}")
-                books = conn.execute(
-                    text(book_query),
-                    {"book_ids": tuple(book_ids)}
-                ).mappings().fetchall()
-                print(f"[DEBUG] 书籍查询结果：{list(books)}")
-
-                recommend_books = []
-                for book in books:
-                    recommend_books.append({
-                        "book_id": book["book_id"],
-                        "title": book.get("title", "Unknown title"),
-                        "author": book.get("author", "Unknown author"),
-                        "publisher": book.get("publisher", "Unknown publisher"),
-                        "price": book.get("price", "Unknown price"),
-                    })
-
-                print(f"[DEBUG] 最终推荐书籍：{recommend_books}")
-                return 200, "ok", recommend_books
+                books = bestseller_books(conn, count, store_id=store_id, window=window)
+        except Exception as e:
+            logging.error(f"[ERROR] 获取畅销榜时出错: {str(e)}")
+            return 528, f"Error in bestsellers: {str(e)}", []
+        return 200, "ok", books
 
-        except Exception as e: 
-            print(f"[ERROR] 推荐过程出现错误：{str(e)}")
-            return 528, f"Error in recommendation: {str(e)}", []
-        
-    def generate_and_extract_titles(self, txt, model_id='charent/ChatLM-mini-Chinese'):
+    def generate_and_extract_titles(self, txt, model_id=DEFAULT_TITLE_MODEL, force_model=False):
         try:
             # 检查输入是否为空
             if not txt.strip():
                 return 540, "输入文本不能为空", []
 
-            # 设置设备
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
-            # 加载分词器和模型
-            tokenizer = AutoTokenizer.from_pretrained(model_id)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_id, trust_remote_code=True).to(device)
-
-            # 对输入文本进行分词
-            encode_ids = tokenizer([txt])
-            input_ids = torch.LongTensor(encode_ids['input_ids']).to(device)
-            attention_mask = torch.LongTensor(encode_ids['attention_mask']).to(device)
-
-            # 生成输出
-            outs = model.my_generate(
-                input_ids=input_ids,
-                attention_mask=attention_mask,
-                max_seq_len=256,
-                search_type='beam',
-            )
-
-            # 解码生成的输出
-            outs_txt = tokenizer.batch_decode(outs.cpu().numpy(), skip_special_tokens=True, clean_up_tokenization_spaces=True)
-            output_text = outs_txt[0]
+            # 快速路径：《》书名或目录中的完整书名直接返回，不调用模型（force_model 时跳过）
+            if not force_model:
+                fast_titles = fast_extract_titles(txt)
+                if fast_titles:
+                    return 200, fast_titles
+
+            # 按内容哈希查找已有结果：先查进程内 LRU，再查 generated_titles 表，命中时不再调用模型
+            input_hash = title_input_hash(model_id, txt)
+            cached_titles = title_result_cache.get(input_hash)
+            if cached_titles is not None:
+                return 200, cached_titles
+            with self.conn.connect() as conn:
+                row = conn.execute(text("""
+                    SELECT titles FROM generated_titles
+                    WHERE input_hash = :input_hash
+                    ORDER BY _id DESC
+                    LIMIT 1
+                """), {"input_hash": input_hash}).fetchone()
+            if row is not None:
+                cached_titles = json.loads(row[0])
+                title_result_cache.put(input_hash, cached_titles)
+                return 200, cached_titles
+
+            # 交给微批推理队列：与并发请求合并为一次 my_generate 调用
+            output_text = title_batcher.generate(model_id, txt)
 
             # 使用正则表达式从生成的输出文本中提取书名
             pattern = r'《(.*?)》'
@@ -1012,19 +933,104 @@ class Buyer(db_conn.DBConn):
             # 插入数据库
             with self.conn.connect() as conn:
                 insert_query = text("""
-                    INSERT INTO generated_titles (input_text, generated_text, titles, created_at)
-                    VALUES (:input_text, :generated_text, :titles, NOW())
+                    INSERT INTO generated_titles (input_hash, model_id, input_text, generated_text, titles, created_at)
+                    VALUES (:input_hash, :model_id, :input_text, :generated_text, :titles, NOW())
                 """)
                 conn.execute(insert_query, {
+                    "input_hash": input_hash,
+                    "model_id": model_id,
                     "input_text": txt,
                     "generated_text": output_text,
                     "titles": json.dumps(unique_titles, ensure_ascii=False),
                 })
                 conn.commit()
+            title_result_cache.put(input_hash, unique_titles)
 
             # 返回状态码和提取的书名
             return 200, unique_titles
 
         except Exception as e:
             logging.error(f"生成和提取书名时出错: {str(e)}")
-            return 528, []
\ No newline at end of file
+            return 528, []
+
+    def submit_title_job(self, txt, model_id=DEFAULT_TITLE_MODEL, force_model=False) -> (int, str, str):
+        """
+        提交异步书名提取任务，立即返回 job_id，推理由后台执行池完成
+        """
+        if not txt or not txt.strip():
+            return 540, "输入文本不能为空", ""
+        job_id = uuid.uuid1().hex
+        try:
+            with self.conn.connect() as conn:
+                conn.execute(text("""
+                    INSERT INTO title_jobs (job_id, input_hash, model_id, input_text, status, created_at, updated_at)
+                    VALUES (:job_id, :input_hash, :model_id, :input_text, :status, NOW(), NOW())
+                """), {
+                    "job_id": job_id,
+                    "input_hash": title_input_hash(model_id, txt),
+                    "model_id": model_id,
+                    "input_text": txt,
+                    "status": JOB_PENDING,
+                })
+                conn.commit()
+                if not title_job_pool.submit(job_id, self._run_title_job, job_id, txt, model_id, force_model):
+                    conn.execute(text("DELETE FROM title_jobs WHERE job_id = :job_id"), {"job_id": job_id})
+                    conn.commit()
+                    return 503, "Title job queue is full", ""
+        except Exception as e:
+            logging.error(f"提交书名提取任务时出错: {str(e)}")
+            return 528, f"Error in submit title job: {str(e)}", ""
+        return 200, "ok", job_id
+
+    def _update_title_job(self, job_id, status, titles=None, error_message=None):
+        with self.conn.connect() as conn:
+            conn.execute(text("""
+                UPDATE title_jobs
+                SET status = :status, titles = :titles, error = :error, updated_at = NOW()
+                WHERE job_id = :job_id
+            """), {
+                "job_id": job_id,
+                "status": status,
+                "titles": None if titles is None else json.dumps(titles, ensure_ascii=False),
+                "error": error_message,
+            })
+            conn.commit()
+
+    def _run_title_job(self, job_id, txt, model_id, force_model=False):
+        self._update_title_job(job_id, JOB_RUNNING)
+        result = self.generate_and_extract_titles(txt, model_id, force_model)
+        if result[0] == 200:
+            self._update_title_job(job_id, JOB_DONE, titles=result[1])
+        else:
+            message = result[1] if len(result) == 3 else "title extraction failed"
+            self._update_title_job(job_id, JOB_FAILED, error_message=message)
+
+    def title_job_status(self, job_id, wait=0) -> (int, str, dict):
+        """
+        查询异步书名提取任务；wait > 0 时在任务结束前最多等待 wait 秒（长轮询）。
+        只有执行该任务的 worker 能被唤醒，其他 worker 直接返回数据库中的当前状态，由客户端继续轮询
+        """
+        try:
+            wait = min(max(float(wait or 0), 0), MAX_LONG_POLL_SECONDS)
+        except (TypeError, ValueError):
+            return 400, "Invalid wait", {}
+        if wait > 0:
+            title_job_pool.wait(job_id, wait)
+        try:
+            with self.conn.connect() as conn:
+                row = conn.execute(text("""
+                    SELECT job_id, status, titles, error
+                    FROM title_jobs
+                    WHERE job_id = :job_id
+                """), {"job_id": job_id}).mappings().fetchone()
+        except Exception as e:
+            logging.error(f"查询书名提取任务时出错: {str(e)}")
+            return 528, f"Error in title job status: {str(e)}", {}
+        if row is None:
+            return 404, "Title job does not exist", {}
+        return 200, "ok", {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "titles": json.loads(row["titles"]) if row["titles"] else None,
+            "error": row["error"],
+        }
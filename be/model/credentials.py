@@ -0,0 +1,234 @@
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from be.model.recommend_cache import _resolve_env_number
+
+HASH_PREFIX = "scrypt"
+SCRYPT_N = 2 ** 14  # 约 16MB 内存、数十毫秒 CPU，离线爆破成本远高于明文/快速哈希
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value.encode("ascii"))
+
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    """
+    生成 scrypt 哈希，格式为 scrypt$n$r$p$salt$hash，参数随哈希保存，调参后旧哈希仍可校验
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r, dklen=SCRYPT_DKLEN)
+    return f"{HASH_PREFIX}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def is_hashed(stored: str) -> bool:
+    return bool(stored) and stored.startswith(HASH_PREFIX + "$")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    校验密码：scrypt 哈希按保存的参数重新计算后做常量时间比较；
+    尚未迁移的旧数据是明文，同样用常量时间比较，登录成功后再重新哈希
+    """
+    if stored is None or password is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        digest = hashlib.scrypt(password.encode("utf-8"), salt=_b64decode(salt), n=int(n), r=int(r), p=int(p),
+                                maxmem=256 * int(n) * int(r), dklen=len(_b64decode(expected)))
+    except (ValueError, TypeError) as e:
+        logging.error(f"[ERROR] Malformed password hash: {str(e)}")
+        return False
+    return hmac.compare_digest(digest, _b64decode(expected))
+
+
+class CredentialService:
+    """
+    密码哈希与校验服务：
+    - scrypt 计算放在独立的有界线程池中执行（hashlib.scrypt 计算期间释放 GIL），
+      排队 + 执行中的任务数不超过 max_pending，超出时直接返回繁忙，不让请求线程无限堆积；
+    - queue_depth() / stats() 暴露当前排队深度与峰值，便于观察是否需要扩容；
+    - 校验通过的 (user_id, 存储的哈希, 密码摘要) 短暂缓存 cache_seconds 秒，
+      支付 → 充值这类连续校验同一密码的请求无需重复计算；密码修改后存储的哈希变化，旧缓存自然失效。
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, cache_seconds: float = 30,
+                 cache_entries: int = 10000, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.cache_seconds = cache_seconds
+        self.cache_entries = cache_entries
+        self.n, self.r, self.p = n, r, p
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._bulk_slots = threading.BoundedSemaphore(max(1, max_workers - 1))  # 批量哈希至少给交互请求留一个线程
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (user_id, stored, password 摘要) -> 过期时间
+        self._cache_key = secrets.token_bytes(32)  # 缓存键中的密码摘要使用进程内随机密钥，不保存明文
+        self._pending = 0
+        self.peak_depth = 0
+        self.rejected = 0
+        self.cache_hits = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="credential")
+            return self._executor
+
+    def _run(self, fn, *args):
+        """
+        在线程池中执行 fn 并等待结果；队列已满时返回 (False, None)
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logging.warning(f"[WARN] Credential pool is full ({self.max_pending} pending)")
+            return False, None
+        with self._lock:
+            self._pending += 1
+            self.peak_depth = max(self.peak_depth, self._pending)
+        try:
+            return True, self._get_executor().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _digest(self, user_id: str, password: str, stored: str) -> tuple:
+        return user_id, stored, hmac.new(self._cache_key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def _cached(self, key) -> bool:
+        with self._lock:
+            expire_at = self._cache.get(key)
+            if expire_at is None:
+                return False
+            if expire_at <= time.time():
+                del self._cache[key]
+                return False
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return True
+
+    def _remember(self, key):
+        if self.cache_seconds <= 0 or self.cache_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = time.time() + self.cache_seconds
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def verify(self, user_id: str, password: str, stored: str) -> tuple:
+        """
+        校验用户密码，返回 (状态码, 消息)：200 通过，401 不匹配，503 校验队列已满
+        """
+        if stored is None or password is None:
+            return 401, "authorization fail."
+        key = self._digest(user_id, password, stored)
+        if self._cached(key):
+            return 200, "ok"
+        accepted, ok = self._run(verify_password, password, stored)
+        if not accepted:
+            return 503, "Credential service is busy"
+        if not ok:
+            return 401, "authorization fail."
+        self._remember(key)
+        return 200, "ok"
+
+    def hash(self, password: str) -> str:
+        """
+        在线程池中生成哈希；队列已满时返回 None
+        """
+        accepted, hashed = self._run(hash_password, password, self.n, self.r, self.p)
+        return hashed if accepted else None
+
+    def hash_many(self, passwords: list) -> list:
+        """
+        批量生成哈希（批量注册）：任务数受 _bulk_slots 限制并阻塞等待空位，
+        不会占满排队上限而让登录、支付的校验请求返回繁忙；
+        任一任务失败（scrypt 参数错误、内存不足、线程池已关闭）时返回 None，与 hash 的繁忙返回一致
+        """
+        futures = []
+        try:
+            executor = self._get_executor()
+            for password in passwords:
+                self._bulk_slots.acquire()
+                try:
+                    future = executor.submit(hash_password, password, self.n, self.r, self.p)
+                except Exception:
+                    self._bulk_slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._bulk_slots.release())
+                futures.append(future)
+            return [future.result() for future in futures]
+        except (ValueError, MemoryError, RuntimeError) as e:
+            for future in futures:
+                future.cancel()
+            with self._lock:
+                self.rejected += 1
+            logging.error(f"[ERROR] Bulk password hashing failed: {str(e)}")
+            return None
+
+    def needs_rehash(self, stored: str) -> bool:
+        """
+        明文或参数低于当前配置的哈希需要在下次登录成功时重新哈希
+        """
+        if not is_hashed(stored):
+            return True
+        try:
+            _, n, r, p, _, _ = stored.split("$")
+        except ValueError:
+            return True
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == user_id]:
+                del self._cache[key]
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "peak_depth": self.peak_depth,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "cache_hits": self.cache_hits,
+                "cache_size": len(self._cache),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.peak_depth = self._pending
+            self.rejected = 0
+            self.cache_hits = 0
+
+
+# 全局实例（进程内共享）
+credential_service = CredentialService(
+    max_workers=_resolve_env_number("BOOKSTORE_CREDENTIAL_WORKERS", 4, int),
+    max_pending=_resolve_env_number("BOOKSTORE_CREDENTIAL_MAX_PENDING", 64, int),
+    cache_seconds=_resolve_env_number("BOOKSTORE_CREDENTIAL_CACHE_SECONDS", 30, float),
+)
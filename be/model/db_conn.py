@@ -4,7 +4,6 @@ from be.model import store  # 从 store.py 中获取全局数据库连接
 import json
 import logging
 from sqlalchemy.sql import text
-import mysql.connector as mysql
 
 
 class DBConn:
@@ -56,7 +55,7 @@ class DBConn:
         """
         检查商店 ID 是否存在
         """
-        query = text("SELECT store_id FROM stores WHERE store_id = :store_id;")
+        query = text("SELECT store_id FROM store WHERE store_id = :store_id;")
         with self.conn.connect() as conn:
             result = conn.execute(query, {"store_id": store_id}).fetchone()
         return result is not None
@@ -0,0 +1,32 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    延迟导入的模块代理：首次访问属性时才真正 import，
+    用于 torch / transformers 等只有少数接口用到、却会显著拖慢启动和增加内存的依赖。
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
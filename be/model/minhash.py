@@ -0,0 +1,256 @@
+import logging
+import random
+import threading
+import time
+import zlib
+from sqlalchemy import text
+from be.model import store
+from be.model.recommend_cache import _resolve_env_number
+
+MINHASH_NUM_PERM = 64  # 签名长度（哈希函数个数）
+MINHASH_BANDS = 16  # LSH 分段数，每段 MINHASH_NUM_PERM // MINHASH_BANDS 行
+MINHASH_SEED = 20240601
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+MINHASH_MAX_AGE_SECONDS = 300  # 索引最长使用时长，与推荐缓存 TTL 一致
+MINHASH_RETRY_SECONDS = 30  # 重建失败后再次尝试前的等待时间
+
+
+class MinHashIndex:
+    """
+    用户购买集合的 MinHash 签名与 LSH 索引，用于近似查找购买行为相似的用户。
+    - 每个用户的已购书籍集合压缩为 num_perm 维 MinHash 签名，两签名相同位置相等的比例估计 Jaccard 相似度；
+    - 签名按 bands 分段，每段哈希进一个桶，至少一段完全相同的用户互为候选；
+    - 查询只访问用户自身签名所在的 bands 个桶，代价与书籍热度无关，
+      不再需要扫描包含某本畅销书的全部订单。
+    启动时（或首次查询时）从历史订单全量构建，支付成功后由 Buyer.payment 增量更新。
+    增量更新只作用于处理该支付的进程，其他 worker 的索引看不到这笔购买；
+    因此索引构建超过 max_age_seconds 后视为过期（is_stale），由定时 refresh 或查询触发的后台线程全量重建，
+    重建期间继续使用旧索引，完成后原子替换；各进程的近邻结果最多落后 max_age_seconds。
+    所有全量构建（首次加载、定时任务、后台线程）都持有同一把 _build_lock，不会并发执行；
+    构建期间的 add/remove_user 除作用于旧索引外还会记录下来，替换后重放，避免被新索引覆盖而丢失。
+    """
+
+    def __init__(self, num_perm: int = MINHASH_NUM_PERM, bands: int = MINHASH_BANDS, seed: int = MINHASH_SEED,
+                 max_age_seconds: float = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        # 通用哈希族 h(x) = (a * x + b) mod p
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self._user_books = {}  # user_id -> {book_id}
+        self._signatures = {}  # user_id -> tuple
+        self._buckets = {}  # (band, band_values) -> {user_id}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._pending = None  # 全量构建期间的增量更新：[(user_id, book_ids 或 None 表示删除)]
+        self._retry_at = 0.0
+        self.max_age_seconds = max_age_seconds
+        self.loaded_at = None
+        self.loaded = False
+
+    def signature(self, book_ids) -> tuple:
+        signature = [_MAX_HASH] * self.num_perm
+        for book_id in book_ids:
+            x = zlib.crc32(str(book_id).encode("utf-8"))
+            for i, (a, b) in enumerate(self._perms):
+                value = ((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH
+                if value < signature[i]:
+                    signature[i] = value
+        return tuple(signature)
+
+    def _band_keys(self, signature: tuple) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _unindex(self, user_id: str):
+        signature = self._signatures.pop(user_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            members = self._buckets.get(key)
+            if members is not None:
+                members.discard(user_id)
+                if not members:
+                    del self._buckets[key]
+
+    def _index(self, user_id: str, books: set):
+        signature = self.signature(books)
+        self._signatures[user_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(user_id)
+
+    def _apply_add(self, user_id: str, book_ids):
+        books = self._user_books.setdefault(user_id, set())
+        before_size = len(books)
+        books.update(book_ids)
+        if len(books) == before_size and user_id in self._signatures:
+            return
+        self._unindex(user_id)
+        self._index(user_id, books)
+
+    def _apply_remove(self, user_id: str):
+        self._unindex(user_id)
+        self._user_books.pop(user_id, None)
+
+    def load(self, engine, before=None):
+        """
+        从历史订单（不含已取消订单）全量构建索引；before 不为空时只使用该时间之前的订单。
+        查询开始后发生的增量更新在替换索引时重放；调用方负责持有 _build_lock（见 ensure_loaded/refresh）
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            user_books = self._build(engine, before)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        signatures = {}
+        buckets = {}
+        for user_id, books in user_books.items():
+            signature = self.signature(books)
+            signatures[user_id] = signature
+            for key in self._band_keys(signature):
+                buckets.setdefault(key, set()).add(user_id)
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._user_books = user_books
+            self._signatures = signatures
+            self._buckets = buckets
+            for user_id, book_ids in pending:
+                if book_ids is None:
+                    self._apply_remove(user_id)
+                else:
+                    self._apply_add(user_id, book_ids)
+            self.loaded_at = time.monotonic()
+            self.loaded = True
+        logging.info(f"[INFO] MinHash index loaded: {len(user_books)} users")
+
+    @staticmethod
+    def _build(engine, before) -> dict:
+        query = """
+            SELECT DISTINCT h.user_id, hod.book_id
+            FROM history_order h
+            JOIN history_order_detail hod ON h.order_id = hod.order_id
+            WHERE h.status <> 3
+        """
+        params = {}
+        if before is not None:
+            query += " AND h.commit_time < :before"
+            params["before"] = before
+        with engine.connect() as conn:
+            rows = conn.execute(text(query), params).fetchall()
+
+        user_books = {}
+        for user_id, book_id in rows:
+            user_books.setdefault(user_id, set()).add(book_id)
+        return user_books
+
+    def ensure_loaded(self, engine):
+        """
+        进程内首次使用时同步加载（此时没有旧索引可用）
+        """
+        if self.loaded:
+            return
+        with self._build_lock:
+            if not self.loaded:
+                self.load(engine)
+
+    def is_stale(self) -> bool:
+        """
+        已加载且超过 max_age_seconds 未重建；max_age_seconds 为空时永不过期
+        """
+        if not self.loaded or not self.max_age_seconds:
+            return False
+        return time.monotonic() - self.loaded_at >= self.max_age_seconds
+
+    def refresh(self, engine=None):
+        """
+        定时任务/后台线程：已加载且过期的索引全量重建，合并其他进程处理的支付；未使用过索引的进程不加载。
+        已有重建在进行时直接返回；重建期间查询继续使用旧索引，失败后 MINHASH_RETRY_SECONDS 内不再重试
+        """
+        if not self.is_stale() or time.monotonic() < self._retry_at:
+            return
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            if self.is_stale():
+                self.load(engine or store.get_db_conn())
+        except Exception as e:
+            self._retry_at = time.monotonic() + MINHASH_RETRY_SECONDS
+            logging.error(f"[ERROR] Failed to refresh MinHash index: {str(e)}")
+        finally:
+            self._build_lock.release()
+
+    def refresh_in_background(self, engine=None):
+        """
+        请求路径发现索引过期时调用：在后台线程中重建，不阻塞当前请求
+        """
+        if not self.is_stale() or self._build_lock.locked() or time.monotonic() < self._retry_at:
+            return
+        threading.Thread(target=self.refresh, args=(engine,), daemon=True).start()
+
+    def add(self, user_id: str, book_ids):
+        """
+        合并用户新购买的书籍并重新计算签名
+        """
+        book_ids = list(book_ids)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((user_id, book_ids))
+            self._apply_add(user_id, book_ids)
+
+    @property
+    def accepting_updates(self) -> bool:
+        """
+        已加载或正在构建；两者皆否时增量更新无意义（之后的首次加载会读到这笔购买）
+        """
+        return self.loaded or self._pending is not None
+
+    def remove_user(self, user_id: str):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((user_id, None))
+            self._apply_remove(user_id)
+
+    def books(self, user_id: str) -> set:
+        with self._lock:
+            return set(self._user_books.get(user_id, ()))
+
+    def query(self, book_ids, exclude: str = None, limit: int = 50) -> list:
+        """
+        返回与 book_ids 相似的候选用户：[(user_id, 估计的 Jaccard 相似度)]，按相似度降序
+        """
+        signature = self.signature(book_ids)
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            candidates.discard(exclude)
+            scored = []
+            for user_id in candidates:
+                other = self._signatures[user_id]
+                matches = sum(1 for x, y in zip(signature, other) if x == y)
+                scored.append((user_id, matches / self.num_perm))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._user_books = {}
+            self._signatures = {}
+            self._buckets = {}
+            self.loaded_at = None
+            self.loaded = False
+
+
+# 全局实例（进程内共享）
+minhash_index = MinHashIndex(
+    max_age_seconds=_resolve_env_number("BOOKSTORE_MINHASH_MAX_AGE_SECONDS", MINHASH_MAX_AGE_SECONDS, float),
+)
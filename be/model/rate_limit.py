@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import text
+from be.model import store
+from be.model.recommend_cache import _resolve_env_number
+
+CLASS_EXPENSIVE = "expensive"  # 搜索、推荐、书名提取：单次占用连接时间长
+CLASS_CHECKOUT = "checkout"  # 下单、支付、充值
+CLASS_DEFAULT = "default"
+
+# Flask endpoint（蓝图名.函数名）所属的限流类别，未列出的归入 default
+ENDPOINT_CLASSES = {
+    "auth.search_book": CLASS_EXPENSIVE,
+    "auth.search_book_regex": CLASS_EXPENSIVE,
+    "auth.recommend_books": CLASS_EXPENSIVE,
+    "auth.recommend_books_batch": CLASS_EXPENSIVE,
+    "buyer.recommend_books_one": CLASS_EXPENSIVE,
+    "buyer.extract_title": CLASS_EXPENSIVE,
+    "buyer.submit_title_job": CLASS_EXPENSIVE,
+    "buyer.title_job_status": CLASS_EXPENSIVE,  # 长轮询最多占用请求线程 MAX_LONG_POLL_SECONDS
+    "buyer.new_order": CLASS_CHECKOUT,
+    "buyer.payment": CLASS_CHECKOUT,
+    "buyer.add_funds": CLASS_CHECKOUT,
+}
+EXEMPT_ENDPOINTS = {"shutdown.be_shutdown"}
+BUCKET_IDLE_SECONDS = 300  # 超过该时长未访问的令牌桶视为已满，清理掉
+BUCKET_PURGE_BATCH = 1000  # 共享令牌桶每批删除的行数
+
+# 类别 -> (单用户速率/秒, 单用户突发, 类别总速率/秒, 类别总突发)，速率为 0 表示不限制
+DEFAULT_LIMITS = {
+    CLASS_EXPENSIVE: (20, 40, 200, 400),
+    CLASS_CHECKOUT: (0, 0, 0, 0),
+    CLASS_DEFAULT: (0, 0, 0, 0),
+}
+
+
+def load_limits() -> dict:
+    """
+    读取限流配置：BOOKSTORE_RATE_LIMIT_<CLASS>_USER_RATE / _USER_BURST / _CLASS_RATE / _CLASS_BURST
+    """
+    limits = {}
+    for name, (user_rate, user_burst, class_rate, class_burst) in DEFAULT_LIMITS.items():
+        prefix = f"BOOKSTORE_RATE_LIMIT_{name.upper()}"
+        limits[name] = (
+            _resolve_env_number(f"{prefix}_USER_RATE", user_rate, float),
+            _resolve_env_number(f"{prefix}_USER_BURST", user_burst, float),
+            _resolve_env_number(f"{prefix}_CLASS_RATE", class_rate, float),
+            _resolve_env_number(f"{prefix}_CLASS_BURST", class_burst, float),
+        )
+    return limits
+
+
+class MemoryBucketStore:
+    """
+    进程内令牌桶：key -> (剩余令牌, 上次更新时间)，单进程部署使用
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, burst: float, now: float) -> float:
+        """
+        尝试取一个令牌：成功返回 0，失败返回需要等待的秒数
+        """
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def purge(self, idle_seconds: float = BUCKET_IDLE_SECONDS):
+        cutoff = time.time() - idle_seconds
+        with self._lock:
+            for key in [k for k, (_, updated_at) in self._buckets.items() if updated_at < cutoff]:
+                del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class MySQLBucketStore:
+    """
+    共享令牌桶：多 worker 部署时保存在 rate_limit_buckets 表中，行锁保证同一个桶的扣减串行；
+    每次检查多一次数据库往返，只在需要跨进程统一限额时启用
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def consume(self, key: str, rate: float, burst: float, now: float) -> float:
+        engine = self.engine or store.get_db_conn()
+        with engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = :key FOR UPDATE"),
+                {"key": key},
+            ).fetchone()
+            tokens, updated_at = (row[0], row[1]) if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute(text("""
+                INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at)
+                VALUES (:key, :tokens, :now)
+                ON DUPLICATE KEY UPDATE tokens = VALUES(tokens), updated_at = VALUES(updated_at)
+            """), {"key": key, "tokens": tokens - 1 if wait == 0 else tokens, "now": now})
+            conn.commit()
+        return wait
+
+    def purge(self, idle_seconds: float = BUCKET_IDLE_SECONDS, batch_size: int = BUCKET_PURGE_BATCH) -> int:
+        """
+        分批删除超过 idle_seconds 未访问的令牌桶（闲置的桶已回满，删除后与新建的桶等价），返回删除行数
+        """
+        engine = self.engine or store.get_db_conn()
+        cutoff = time.time() - idle_seconds
+        total = 0
+        with engine.connect() as conn:
+            while True:
+                deleted = conn.execute(
+                    text("DELETE FROM rate_limit_buckets WHERE updated_at < :cutoff LIMIT :batch_size"),
+                    {"cutoff": cutoff, "batch_size": batch_size},
+                ).rowcount
+                conn.commit()
+                total += deleted
+                if deleted < batch_size:
+                    return total
+
+
+class RateLimiter:
+    """
+    准入控制：每个请求同时检查 (客户端, 类别) 和 (类别) 两个令牌桶，任一不足即拒绝。
+    - 客户端桶（配置项 *_USER_*，按 serve.admission_control 传入的客户端地址区分）防止个别客户端刷接口，类别总桶限制昂贵读请求占用的连接总量，下单、支付不受其影响；
+    - 共享存储出错时放行（fail open），限流故障不影响正常交易。
+    """
+
+    def __init__(self, limits: dict = None, bucket_store=None, enabled: bool = True):
+        self.limits = limits or load_limits()
+        self.bucket_store = bucket_store or MemoryBucketStore()
+        self.enabled = enabled
+        self.rejected = {}  # 类别 -> 拒绝次数
+        self._rejected_lock = threading.Lock()
+
+    @staticmethod
+    def classify(endpoint: str) -> str:
+        return ENDPOINT_CLASSES.get(endpoint, CLASS_DEFAULT)
+
+    def check(self, endpoint: str, identity: str) -> float:
+        """
+        返回 0 表示放行，否则为建议的重试等待秒数
+        """
+        if not self.enabled or endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return 0
+        name = self.classify(endpoint)
+        user_rate, user_burst, class_rate, class_burst = self.limits.get(name, (0, 0, 0, 0))
+        now = time.time()
+        try:
+            if user_rate > 0:
+                wait = self.bucket_store.consume(f"user:{name}:{identity}", user_rate, user_burst, now)
+                if wait:
+                    return self._reject(name, wait)
+            if class_rate > 0:
+                wait = self.bucket_store.consume(f"class:{name}", class_rate, class_burst, now)
+                if wait:
+                    return self._reject(name, wait)
+        except Exception as e:
+            logging.error(f"[ERROR] Rate limiter store failed, allowing request: {str(e)}")
+        return 0
+
+    def purge(self):
+        try:
+            self.bucket_store.purge()
+        except Exception as e:
+            logging.error(f"[ERROR] Failed to purge rate limit buckets: {str(e)}")
+
+    def _reject(self, name: str, wait: float) -> float:
+        with self._rejected_lock:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+        return wait
+
+
+def build_rate_limiter() -> RateLimiter:
+    enabled = os.getenv("BOOKSTORE_RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no")
+    bucket_store = MySQLBucketStore() if os.getenv("BOOKSTORE_RATE_LIMIT_STORE", "memory") == "mysql" else None
+    return RateLimiter(bucket_store=bucket_store, enabled=enabled)
+
+
+# 全局实例（进程内共享）
+rate_limiter = build_rate_limiter()
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _resolve_env_number(name: str, default, cast=float):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"[WARN] Invalid {name}={value}, fallback to default {default}")
+        return default
+
+
+class RecommendationCache:
+    """
+    推荐结果缓存：按 (user_id, engine, n) 缓存推荐列表。
+    - 容量有上限，超出时按 LRU 淘汰；
+    - 每个条目带 TTL，过期后视为未命中；
+    - 用户的历史订单发生写入（支付、取消、超时取消）时按用户整体失效。
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expire_at, value)
+        self._user_keys = {}  # user_id -> set(key)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str, engine: str, n: int):
+        """
+        命中时返回缓存的推荐结果，否则返回 None
+        """
+        key = (user_id, engine, n)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expire_at, value = entry
+            if expire_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, user_id: str, engine: str, n: int, value):
+        if self.max_entries <= 0:
+            return
+        key = (user_id, engine, n)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """
+        用户的历史订单发生变化时，清除该用户在所有引擎下的缓存
+        """
+        with self._lock:
+            keys = self._user_keys.pop(user_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        user_keys = self._user_keys.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                self._user_keys.pop(key[0], None)
+
+
+# 全局缓存实例（进程内共享）
+recommend_cache = RecommendationCache(
+    max_entries=_resolve_env_number("BOOKSTORE_RECOMMEND_CACHE_SIZE", 10000, int),
+    ttl_seconds=_resolve_env_number("BOOKSTORE_RECOMMEND_CACHE_TTL", 300.0),
+)
@@ -0,0 +1,343 @@
+import os
+import logging
+import threading
+from abc import ABC, abstractmethod
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+from be.model.recommend_cache import recommend_cache
+from be.model.bestseller import bestseller_books
+from be.model.minhash import minhash_index, MinHashIndex
+
+DEFAULT_ENGINE_ENV = "BOOKSTORE_RECOMMENDER"  # 对所有推荐接口生效
+ENDPOINT_ENGINE_ENV = "BOOKSTORE_RECOMMENDER_{}"  # 单个接口的引擎，如 BOOKSTORE_RECOMMENDER_AUTH，优先于全局设置
+MINHASH_MAX_CANDIDATES = 50  # MinHash 引擎参与聚合的相似用户上限
+
+
+class Recommender(ABC):
+    """
+    推荐引擎接口。
+    recommend(engine, user_id, n, before=None) -> (状态码, 消息, 书籍列表)
+    - engine: SQLAlchemy Engine，引擎自行管理连接与异常；
+    - before: 可选的时间截断，只使用 commit_time 早于该时间的历史订单（用于离线回放评测）。
+    书籍列表中每项至少包含 book_id/title/author/publisher/price。
+    """
+    name = ""
+
+    @abstractmethod
+    def recommend(self, engine, user_id: str, n: int, before=None) -> (int, str, list):
+        ...
+
+    @staticmethod
+    def _cutoff(alias: str, before) -> str:
+        if before is None:
+            return ""
+        column = f"{alias}.commit_time" if alias else "commit_time"
+        return f" AND {column} < :before"
+
+    def _purchased_books(self, conn, user_id: str, before=None) -> (list, set):
+        """
+        查询用户的历史订单 ID 与已购买的书籍集合（不含已取消订单，与 MinHash 索引口径一致）
+        """
+        query_orders = text(
+            "SELECT order_id FROM history_order WHERE user_id = :user_id AND status <> 3" + self._cutoff("", before)
+        )
+        orders = conn.execute(query_orders, {"user_id": user_id, "before": before}).fetchall()
+        order_ids = [order[0] for order in orders]
+        if not order_ids:
+            return order_ids, set()
+
+        query_books = text("""
+            SELECT DISTINCT book_id
+            FROM history_order_detail
+            WHERE order_id IN :order_ids
+        """)
+        books = conn.execute(query_books, {"order_ids": tuple(order_ids)}).fetchall()
+        return order_ids, {book[0] for book in books}
+
+    @staticmethod
+    def _book_details(conn, book_ids: list) -> list:
+        """
+        按 book_ids 的顺序返回书籍详情
+        """
+        if not book_ids:
+            return []
+        query_book_details = text("""
+            SELECT book_id, title, author, publisher, price
+            FROM new_books
+            WHERE book_id IN :book_ids
+        """)
+        rows = conn.execute(query_book_details, {"book_ids": tuple(book_ids)}).mappings().fetchall()
+        details = {}
+        for book in rows:
+            details.setdefault(book["book_id"], {
+                "book_id": book["book_id"],
+                "title": book.get("title", "Unknown title"),
+                "author": book.get("author", "Unknown author"),
+                "publisher": book.get("publisher", "Unknown publisher"),
+                "price": book.get("price", "Unknown price"),
+            })
+        return [details[book_id] for book_id in book_ids if book_id in details]
+
+
+class CooccurrenceRecommender(Recommender):
+    """
+    共现推荐（/auth/recommend_books）：与当前用户买过同一本书的用户，
+    他们购买过、当前用户未购买的书按出现次数排序。
+    """
+    name = "cooccurrence"
+
+    def recommend(self, engine, user_id: str, n: int, before=None) -> (int, str, list):
+        try:
+            with engine.connect() as conn:
+                order_ids, user_books = self._purchased_books(conn, user_id, before)
+                # 没有历史订单（冷启动）时以畅销榜兜底
+                if not order_ids:
+                    return 200, "ok", bestseller_books(conn, n)
+                if not user_books:
+                    return 200, "ok", []
+
+                query_related_users = text("""
+                    SELECT DISTINCT h.user_id
+                    FROM history_order h
+                    JOIN history_order_detail hod ON h.order_id = hod.order_id
+                    WHERE hod.book_id IN :user_books AND h.user_id != :user_id
+                """ + self._cutoff("h", before))
+                related_users = conn.execute(
+                    query_related_users, {"user_books": tuple(user_books), "user_id": user_id, "before": before}
+                ).fetchall()
+                related_users = {user[0] for user in related_users}
+                logging.debug(f"[DEBUG] Related users fetched: {related_users}")
+                if not related_users:
+                    return 200, "ok", []
+
+                query_other_books = text("""
+                    SELECT hod.book_id, COUNT(*) AS frequency
+                    FROM history_order_detail hod
+                    JOIN history_order h ON hod.order_id = h.order_id
+                    WHERE hod.book_id NOT IN :user_books
+                    AND h.user_id IN :related_users
+                """ + self._cutoff("h", before) + """
+                    GROUP BY hod.book_id
+                    ORDER BY frequency DESC
+                    LIMIT :n_recommendations
+                """)
+                recommended_books = conn.execute(
+                    query_other_books,
+                    {
+                        "user_books": tuple(user_books),
+                        "related_users": tuple(related_users),
+                        "n_recommendations": n,
+                        "before": before,
+                    },
+                ).fetchall()
+                book_ids = [book[0] for book in recommended_books]
+                logging.debug(f"[DEBUG] Recommended books fetched: {book_ids}")
+                return 200, "ok", self._book_details(conn, book_ids)
+
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] SQLAlchemy error in recommend_books: {str(e)}")
+            return 528, f"Database error: {str(e)}", []
+        except Exception as e:
+            logging.error(f"[ERROR] Unexpected error in recommend_books: {str(e)}")
+            return 538, f"Unexpected error: {str(e)}", []
+
+
+class CollaborativeRecommender(Recommender):
+    """
+    协同过滤推荐（/buyer/recommend_books_one）：先找出购买过相同书籍的相似用户及其订单，
+    再统计这些订单中当前用户未购买的书籍。
+    """
+    name = "collaborative"
+
+    def recommend(self, engine, user_id: str, n: int, before=None) -> (int, str, list):
+        try:
+            with engine.connect() as conn:
+                # 检查用户是否存在
+                user_check_query = "SELECT 1 FROM users WHERE user_id = :user_id"
+                user_exists = conn.execute(text(user_check_query), {"user_id": user_id}).fetchone()
+                if not user_exists:
+                    print(f"[ERROR] 用户 {user_id} 不存在。")
+                    return 404, "User does not exist", []
+
+                # 第一步 / 第二步：找到当前用户的订单及已购买的书籍
+                user_order_ids, user_purchased_books = self._purchased_books(conn, user_id, before)
+
+                # 检查用户是否有订单（冷启动时以畅销榜兜底）
+                if not user_order_ids:
+                    print(f"[ERROR] 用户 {user_id} 没有订单。")
+                    fallback_books = bestseller_books(conn, n)
+                    if fallback_books:
+                        return 200, "ok (bestseller fallback)", fallback_books
+                    return 528, "User has no orders", []
+
+                # 检查是否找到已购买的书籍
+                if not user_purchased_books:
+                    print(f"[ERROR] 用户 {user_id} 没有已购买的书籍。")
+                    fallback_books = bestseller_books(conn, n)
+                    if fallback_books:
+                        return 200, "ok (bestseller fallback)", fallback_books
+                    return 528, "User has not purchased any books", []
+
+                # 第三步：查找其他用户购买相同书籍的订单和用户
+                similar_users_query = """
+                    SELECT DISTINCT h.user_id, hod.order_id, hod.book_id
+                    FROM history_order_detail hod
+                    JOIN history_order h ON hod.order_id = h.order_id
+                    WHERE hod.book_id IN :book_ids
+                    AND h.user_id != :user_id
+                """ + self._cutoff("h", before)
+                similar_users = conn.execute(
+                    text(similar_users_query),
+                    {"book_ids": tuple(user_purchased_books), "user_id": user_id, "before": before}
+                ).fetchall()
+
+                order_ids = set()
+                user_ids = set()
+                for record in similar_users:
+                    user_ids.add(record[0])
+                    order_ids.add(record[1])
+                logging.debug(f"[DEBUG] 相似用户：{user_ids}，相关订单：{order_ids}")
+
+                # 检查是否找到其他用户
+                if not user_ids:
+                    print("[ERROR] 未找到购买相同书籍的其他用户。")
+                    return 528, "No similar users found", []
+
+                # 第四步：查找这些用户购买的其他书籍，排除当前用户已购买的书籍
+                other_books_query = """
+                    SELECT hod.book_id, COUNT(*) as frequency
+                    FROM history_order_detail hod
+                    JOIN history_order h ON hod.order_id = h.order_id
+                    WHERE hod.order_id IN :order_ids
+                    AND hod.book_id NOT IN :user_books
+                    AND h.user_id IN :user_ids
+                    GROUP BY hod.book_id
+                    ORDER BY frequency DESC
+                    LIMIT :count
+                """
+                other_books = conn.execute(
+                    text(other_books_query),
+                    {
+                        "order_ids": tuple(order_ids),
+                        "user_books": tuple(user_purchased_books),
+                        "user_ids": tuple(user_ids),
+                        "count": n,
+                    },
+                ).mappings().fetchall()
+
+                if not other_books:
+                    print("[ERROR] 未找到推荐书籍。")
+                    return 200, "No recommended books found", []
+
+                book_ids = [record["book_id"] for record in other_books]
+                recommend_books = self._book_details(conn, book_ids)
+                logging.debug(f"[DEBUG] 最终推荐书籍：{recommend_books}")
+                return 200, "ok", recommend_books
+
+        except Exception as e:
+            print(f"[ERROR] 推荐过程出现错误：{str(e)}")
+            return 528, f"Error in recommendation: {str(e)}", []
+
+
+class MinHashRecommender(Recommender):
+    """
+    基于 MinHash LSH 的近似协同过滤：在索引中查找与当前用户购买集合相似的用户（至多 MINHASH_MAX_CANDIDATES 个），
+    按估计相似度加权累计他们购买过、当前用户未购买的书籍。代价只与候选用户数相关，
+    当前用户买过超级畅销书时也不会扫描包含该书的全部订单。
+    """
+    name = "minhash"
+
+    def __init__(self, index: MinHashIndex = minhash_index):
+        self.index = index
+        self._snapshot = None
+        self._snapshot_before = None
+        self._snapshot_lock = threading.Lock()
+
+    def _index_for(self, engine, before) -> MinHashIndex:
+        if before is None:
+            # 首次使用时同步加载；过期的索引交给后台线程重建，本次查询继续使用旧索引
+            self.index.ensure_loaded(engine)
+            self.index.refresh_in_background(engine)
+            return self.index
+        # 离线回放：复用截断时间不晚于 before 的快照，避免使用未来数据
+        with self._snapshot_lock:
+            if self._snapshot is None or before < self._snapshot_before:
+                snapshot = MinHashIndex(self.index.num_perm, self.index.bands)
+                snapshot.load(engine, before=before)
+                self._snapshot, self._snapshot_before = snapshot, before
+            return self._snapshot
+
+    def recommend(self, engine, user_id: str, n: int, before=None) -> (int, str, list):
+        try:
+            index = self._index_for(engine, before)
+            with engine.connect() as conn:
+                order_ids, user_books = self._purchased_books(conn, user_id, before)
+                # 没有历史订单（冷启动）时以畅销榜兜底
+                if not order_ids:
+                    return 200, "ok", bestseller_books(conn, n)
+                if not user_books:
+                    return 200, "ok", []
+
+                scores = {}
+                for other_id, similarity in index.query(user_books, exclude=user_id, limit=MINHASH_MAX_CANDIDATES):
+                    for book_id in index.books(other_id) - user_books:
+                        scores[book_id] = scores.get(book_id, 0.0) + similarity
+                ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:n]
+                return 200, "ok", self._book_details(conn, [book_id for book_id, _ in ranked])
+
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] SQLAlchemy error in minhash recommendation: {str(e)}")
+            return 528, f"Database error: {str(e)}", []
+        except Exception as e:
+            logging.error(f"[ERROR] Unexpected error in minhash recommendation: {str(e)}")
+            return 538, f"Unexpected error: {str(e)}", []
+
+
+RECOMMENDERS = {}
+
+
+def register_recommender(recommender: Recommender):
+    """
+    注册推荐引擎，新引擎实现 Recommender 接口后在此注册即可按名称选用
+    """
+    RECOMMENDERS[recommender.name] = recommender
+    return recommender
+
+
+def get_recommender(name: str = None, default: str = CooccurrenceRecommender.name, endpoint: str = None) -> Recommender:
+    """
+    选择推荐引擎：请求参数 > 接口环境变量 BOOKSTORE_RECOMMENDER_<ENDPOINT> > 全局环境变量 BOOKSTORE_RECOMMENDER > 接口默认引擎。
+    全局环境变量会覆盖所有接口各自的默认引擎，只想调整某个接口时使用接口环境变量
+    """
+    if not name and endpoint:
+        name = os.getenv(ENDPOINT_ENGINE_ENV.format(endpoint.upper()))
+    name = name or os.getenv(DEFAULT_ENGINE_ENV) or default
+    if name not in RECOMMENDERS:
+        raise KeyError(name)
+    return RECOMMENDERS[name]
+
+
+def recommend(engine, user_id: str, n: int, name: str = None, default: str = CooccurrenceRecommender.name,
+              endpoint: str = None) -> (int, str, list):
+    """
+    通过推荐缓存调用指定引擎，返回 (状态码, 消息, 书籍列表)；endpoint 用于按接口选择引擎（见 get_recommender）
+    """
+    try:
+        recommender = get_recommender(name, default, endpoint)
+    except KeyError:
+        return 400, f"Unknown recommender engine {name}", []
+
+    cached = recommend_cache.get(user_id, recommender.name, n)
+    if cached is not None:
+        message, books = cached
+        return 200, message, books
+
+    code, message, books = recommender.recommend(engine, user_id, n)
+    if code == 200:
+        recommend_cache.put(user_id, recommender.name, n, (message, books))
+    return code, message, books
+
+
+register_recommender(CooccurrenceRecommender())
+register_recommender(CollaborativeRecommender())
+register_recommender(MinHashRecommender())
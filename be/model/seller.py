@@ -2,13 +2,77 @@ from sqlalchemy import text
 from be.model import error
 from be.model import db_conn
 import sqlalchemy as sa
+import base64
 import json
 import logging
+from datetime import datetime
 
 # 配置日志记录器
 logging.basicConfig(level=logging.INFO)  # 设置最低日志级别为 INFO
 logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)  # 启用 SQL 语句日志
 
+REQUIRED_BOOK_FIELDS = [
+    "tags", "picture", "title", "author", "publisher",
+    "original_title", "translator", "pub_year", "pages", "price",
+    "currency_unit", "binding", "isbn", "author_intro", "book_intro", "content"
+]
+BOOK_COLUMNS = [
+    "book_id", "tags", "pictures_path", "title", "author", "publisher", "original_title", "translator",
+    "pub_year", "pages", "price", "currency_unit", "binding", "isbn", "author_intro", "book_intro", "content"
+]
+ADD_BOOKS_CHUNK = 500  # 批量上架时每条多行 INSERT 的书籍数
+ADD_BOOKS_MAX = 5000  # 单次批量上架请求的最大书籍数
+ADD_STOCK_LEVELS_MAX = 5000  # 单次批量补货请求的最大书籍数
+LIST_ORDERS_MAX_LIMIT = 100  # 订单列表每页最多条数
+DELIVERY_ORDERS_MAX = 5000  # 单次批量发货请求的最大订单数
+
+
+def encode_order_cursor(commit_time: datetime, row_id: int) -> str:
+    """
+    键集分页游标：上一页最后一条订单的 (commit_time, _id)；commit_time 为空时时间部分留空
+    """
+    raw = f"{commit_time.isoformat() if commit_time is not None else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_order_cursor(cursor: str) -> tuple:
+    """
+    解析游标，格式错误时返回 None；时间部分为空表示上一页停在 commit_time 为空的订单
+    """
+    try:
+        commit_time, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return (datetime.fromisoformat(commit_time) if commit_time else None), int(row_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def book_params(book_id: str, book_info: dict) -> dict:
+    """
+    把 book_info 转换为 new_books 的列值，tags 列表按换行符拼接为字符串
+    """
+    tags = book_info["tags"]
+    if isinstance(tags, list):
+        tags = "\n".join(tags)  # 将列表转换为单个字符串，用换行符分隔
+    return {
+        "book_id": book_id,
+        "tags": tags,
+        "pictures_path": book_info.get("picture", ""),
+        "title": book_info.get("title", "Unknown Title"),
+        "author": book_info.get("author", "Unknown Author"),
+        "publisher": book_info.get("publisher", "Unknown Publisher"),
+        "original_title": book_info.get("original_title", ""),
+        "translator": book_info.get("translator", ""),
+        "pub_year": book_info.get("pub_year", 0),
+        "pages": book_info.get("pages", 0),
+        "price": book_info.get("price", 0.0),
+        "currency_unit": book_info.get("currency_unit", "USD"),
+        "binding": book_info.get("binding", ""),
+        "isbn": book_info.get("isbn", ""),
+        "author_intro": book_info.get("author_intro", ""),
+        "book_intro": book_info.get("book_intro", ""),
+        "content": book_info.get("content", "")
+    }
+
 
 class Seller(db_conn.DBConn):
     def __init__(self):
@@ -17,74 +81,27 @@ class Seller(db_conn.DBConn):
     def add_book(self, user_id: str, store_id: str, book_id: str, book_json_str: str, stock_level: int):
         """
         向指定 store_id 的商店添加一本新书。
+        用户、商店归属的检查合并在 INSERT ... SELECT 中：只有 store_id 属于 user_id 时才会插入；
+        书籍已在店内时触发唯一键冲突。stores 与 new_books 的写入在同一事务中完成，
+        new_books 是各店共享的目录，其他店铺已上架过的书不再重复写入。
         """
+        # 从 book_json_str 中提取书籍详细信息（不访问数据库）
         try:
-            # 检查用户是否存在
-            if not self.user_id_exist(user_id):
-                # print(f"[ERROR] User ID {user_id} does not exist.")
-                return error.error_non_exist_user_id(user_id)
-
-            print(f"[DEBUG] User ID {user_id} exists.")
-
-            # 检查商店是否存在
-            if not self.store_id_exist(store_id):
-                # print(f"[ERROR] Store ID {store_id} does not exist.")
-                return error.error_non_exist_store_id(store_id)
-
-            print(f"[DEBUG] Store ID {store_id} exists.")
-
-            # # 检查书籍是否已存在
-            if self.book_id_exist_in_store(store_id, user_id, book_id,stock_level):
-                print(f"[ERROR] Book ID {book_id} already exists in store {store_id} for user {user_id}.")
-                return error.error_exist_book_id(book_id)
-
-
-            # 从 book_json_str 中提取书籍详细信息
-            try:
-                print(f"[DEBUG] Parsing book information JSON: {book_json_str}")
-                book_info = json.loads(book_json_str)
-                required_fields = [
-                    "tags", "picture", "title", "author", "publisher",
-                    "original_title", "translator", "pub_year", "pages", "price",
-                    "currency_unit", "binding", "isbn", "author_intro", "book_intro", "content"
-                ]
-                
-                # 检查所有必需字段是否存在
-                missing_fields = [field for field in required_fields if field not in book_info]
-                if missing_fields:
-                    print(f"[ERROR] Missing required fields: {missing_fields}")
-                    return 400, f"Missing required fields: {', '.join(missing_fields)} in book information."
-            except json.JSONDecodeError as e: 
-                print(f"[ERROR] Invalid JSON format: {str(e)}")
-                return 400, f"Invalid JSON format: {str(e)}"
-
-            print(f"[DEBUG] Book information parsed successfully: {book_info}")
-
-            # 将书籍添加到商店的表中
-            insert_store_query = text("""
-                INSERT INTO stores (store_id, user_id, book_id, price, stock_level)
-                VALUES (:store_id, :user_id, :book_id, :price, :stock_level)
-                ON DUPLICATE KEY UPDATE
-                    price = VALUES(price),
-                    stock_level = stock_level + VALUES(stock_level);
-                """)
-
-            # print("[DEBUG] Preparing to insert book into stores table.")
-            with self.conn.connect() as conn:
-                conn.execute(insert_store_query, {
-                    "store_id": store_id,
-                    "user_id": user_id,
-                    "book_id": book_id,
-                    "price": book_info["price"],
-                    "stock_level": stock_level
-                })
-                conn.commit()
-            print("[DEBUG] Book successfully inserted into stores table.")
-            # 检查并创建 new_books 表全文索引
-
-            
-            # 将书籍详细信息添加到 new_books 表中
-            insert_book_query = text("""
+            book_info = json.loads(book_json_str)
+        except json.JSONDecodeError as e: 
+            return 400, f"Invalid JSON format: {str(e)}"
+        missing_fields = [field for field in REQUIRED_BOOK_FIELDS if field not in book_info]
+        if missing_fields:
+            return 400, f"Missing required fields: {', '.join(missing_fields)} in book information."
+
+        insert_store_query = text("""
+            INSERT INTO stores (store_id, user_id, book_id, price, stock_level)
+            SELECT :store_id, :user_id, :book_id, :price, :stock_level
+            FROM store s
+            JOIN users u ON u.user_id = s.user_id
+            WHERE s.store_id = :store_id AND s.user_id = :user_id
+        """)
+        insert_book_query = text("""
             INSERT INTO new_books (
                 book_id, tags, pictures_path, title, author, publisher, original_title, translator,
                 pub_year, pages, price, currency_unit, binding, isbn, author_intro, book_intro, content
@@ -92,44 +109,176 @@ class Seller(db_conn.DBConn):
             VALUES (
                 :book_id, :tags, :pictures_path, :title, :author, :publisher, :original_title, :translator,
                 :pub_year, :pages, :price, :currency_unit, :binding, :isbn, :author_intro, :book_intro, :content
-            );
-            """)
-            tags = book_info["tags"]
-            if isinstance(tags, list):
-                tags = "\n".join(tags)  # 将列表转换为单个字符串，用换行符分隔
-
-            # print(f"[DEBUG] Flattened tags: {tags}")
+            )
+            ON DUPLICATE KEY UPDATE book_id = book_id;
+        """)
+        try:
             with self.conn.connect() as conn:
-                conn.execute(insert_book_query, {
-                "book_id": book_id,
-                "tags": tags,
-                "pictures_path": book_info.get("picture", ""),
-                "title": book_info.get("title", "Unknown Title"),
-                "author": book_info.get("author", "Unknown Author"),
-                "publisher": book_info.get("publisher", "Unknown Publisher"),
-                "original_title": book_info.get("original_title", ""),
-                "translator": book_info.get("translator", ""),
-                "pub_year": book_info.get("pub_year", 0),
-                "pages": book_info.get("pages", 0),
-                "price": book_info.get("price", 0.0),
-                "currency_unit": book_info.get("currency_unit", "USD"),
-                "binding": book_info.get("binding", ""),
-                "isbn": book_info.get("isbn", ""),
-                "author_intro": book_info.get("author_intro", ""),
-                "book_intro": book_info.get("book_intro", ""),
-                "content": book_info.get("content", "")
-            })
-                conn.commit()
-            # print(f"[DEBUG] Book ID {book_id} successfully inserted into new_books.")
-            
-
+                trans = conn.begin()
+                try:
+                    result = conn.execute(insert_store_query, {
+                        "store_id": store_id,
+                        "user_id": user_id,
+                        "book_id": book_id,
+                        "price": book_info["price"],
+                        "stock_level": stock_level
+                    })
+                    if result.rowcount == 0:
+                        trans.rollback()
+                        return self._add_book_guard_error(conn, user_id, store_id)
+                    conn.execute(insert_book_query, book_params(book_id, book_info))
+                    trans.commit()
+                except sa.exc.IntegrityError:
+                    trans.rollback()
+                    return error.error_exist_book_id(book_id)
+                except Exception:
+                    trans.rollback()
+                    raise
         except Exception as e: 
-            print(f"[ERROR] An error occurred while adding the book: {str(e)}")
+            logging.error(f"[ERROR] An error occurred while adding the book: {str(e)}")
             return 528, f"Unexpected error: {str(e)}"
 
-        print(f"[DEBUG] Book ID {book_id} successfully added.")
         return 200, "ok"
 
+    @staticmethod
+    def _add_book_guard_error(conn, user_id: str, store_id: str) -> tuple:
+        """
+        INSERT ... SELECT 未插入任何行时才执行：区分用户不存在、商店不存在和商店不属于该用户
+        """
+        exists = conn.execute(text("""
+            SELECT
+                EXISTS (SELECT 1 FROM users WHERE user_id = :user_id),
+                EXISTS (SELECT 1 FROM store WHERE store_id = :store_id)
+        """), {"user_id": user_id, "store_id": store_id}).fetchone()
+        if not exists[0]:
+            return error.error_non_exist_user_id(user_id)
+        if not exists[1]:
+            return error.error_non_exist_store_id(store_id)
+        return error.error_authorization_fail()
+
+    def add_books(self, user_id: str, store_id: str, books: list, stock_level: int) -> tuple:
+        """
+        批量上架：一次校验用户、商店归属和已在店内的书籍，再按 ADD_BOOKS_CHUNK 分块，
+        每块在同一事务中用多行语句写入 stores 和 new_books（共享目录中已有的书保持不变）；
+        已在店内的书与 add_book 一致按 516 报告，不修改其价格和库存，重试的批次不会重复累加库存。
+        :param books: book_info 列表，每个元素需包含 id 与 REQUIRED_BOOK_FIELDS
+        :return: (状态码, 消息, [{"book_id", "code", "message"}])，逐本返回结果，单本失败不影响其他书
+        """
+        if not isinstance(books, list):
+            return 400, "books must be a list", []
+        if len(books) > ADD_BOOKS_MAX:
+            return 400, f"Too many books, at most {ADD_BOOKS_MAX} per request", []
+        try:
+            with self.conn.connect() as conn:
+                exists = conn.execute(text("""
+                    SELECT
+                        EXISTS (SELECT 1 FROM users WHERE user_id = :user_id),
+                        EXISTS (SELECT 1 FROM store WHERE store_id = :store_id),
+                        EXISTS (SELECT 1 FROM store WHERE store_id = :store_id AND user_id = :user_id)
+                """), {"user_id": user_id, "store_id": store_id}).fetchone()
+                if not exists[0]:
+                    return (*error.error_non_exist_user_id(user_id), [])
+                if not exists[1]:
+                    return (*error.error_non_exist_store_id(store_id), [])
+                if not exists[2]:
+                    return (*error.error_authorization_fail(), [])
+
+                book_ids = [b["id"] for b in books if isinstance(b, dict) and isinstance(b.get("id"), str) and b["id"]]
+                in_store = set()
+                if book_ids:
+                    query_in_store = text(
+                        "SELECT book_id FROM stores WHERE store_id = :store_id AND book_id IN :book_ids"
+                    ).bindparams(sa.bindparam("book_ids", expanding=True))
+                    rows = conn.execute(query_in_store, {"store_id": store_id, "book_ids": book_ids}).fetchall()
+                    in_store = {row[0] for row in rows}
+
+            # 一次遍历完成逐本校验
+            results = []
+            accepted = []
+            seen = set()
+            for book_info in books:
+                book_id = book_info.get("id") if isinstance(book_info, dict) else None
+                if not book_id:
+                    results.append({"book_id": book_id, "code": 400, "message": "Missing book id"})
+                    continue
+                if not isinstance(book_id, str):
+                    results.append({"book_id": book_id, "code": 400, "message": "book id must be a string"})
+                    continue
+                missing_fields = [field for field in REQUIRED_BOOK_FIELDS if field not in book_info]
+                if missing_fields:
+                    results.append({"book_id": book_id, "code": 400,
+                                    "message": f"Missing required fields: {', '.join(missing_fields)}"})
+                    continue
+                if book_id in in_store or book_id in seen:
+                    code, message = error.error_exist_book_id(book_id)
+                    results.append({"book_id": book_id, "code": code, "message": message})
+                    continue
+                seen.add(book_id)
+                results.append({"book_id": book_id, "code": 200, "message": "ok"})
+                accepted.append((len(results) - 1, book_id, book_info))
+
+            for start in range(0, len(accepted), ADD_BOOKS_CHUNK):
+                chunk = accepted[start:start + ADD_BOOKS_CHUNK]
+                try:
+                    existing = self._insert_books_chunk(user_id, store_id, chunk, stock_level)
+                    for index, book_id, _ in chunk:
+                        if book_id in existing:
+                            results[index]["code"], results[index]["message"] = error.error_exist_book_id(book_id)
+                except sa.exc.SQLAlchemyError as e:
+                    logging.error(f"[ERROR] Failed to add book chunk to store {store_id}: {str(e)}")
+                    for index, _, _ in chunk:
+                        results[index]["code"] = 528
+                        results[index]["message"] = f"Database error: {str(e)}"
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] Database error in add_books: {str(e)}")
+            return 528, f"Database error: {str(e)}", []
+        return 200, "ok", results
+
+    def _insert_books_chunk(self, user_id: str, store_id: str, chunk: list, stock_level: int) -> set:
+        """
+        在一个事务中写入一块书籍：先锁定查询本块中已在店内的 book_id（预检查之后被并发上架的书），
+        其余书籍多行插入 stores，new_books 多行插入，目录中已有的 book_id 不做修改。
+        :return: 已在店内、未写入的 book_id 集合，由调用方按 516 报告
+        """
+        query_existing = text(
+            "SELECT book_id FROM stores WHERE store_id = :store_id AND book_id IN :book_ids FOR UPDATE"
+        ).bindparams(sa.bindparam("book_ids", expanding=True))
+
+        with self.conn.connect() as conn:
+            trans = conn.begin()
+            try:
+                rows = conn.execute(query_existing, {
+                    "store_id": store_id, "book_ids": [book_id for _, book_id, _ in chunk]
+                }).fetchall()
+                existing = {row[0] for row in rows}
+                pending = [(book_id, book_info) for _, book_id, book_info in chunk if book_id not in existing]
+                if pending:
+                    store_values = []
+                    store_params = {"store_id": store_id, "user_id": user_id, "stock_level": stock_level}
+                    book_values = []
+                    book_params_all = {}
+                    for i, (book_id, book_info) in enumerate(pending):
+                        store_values.append(f"(:store_id, :user_id, :book_id_{i}, :price_{i}, :stock_level)")
+                        store_params[f"book_id_{i}"] = book_id
+                        store_params[f"price_{i}"] = book_info["price"]
+                        book_values.append("(" + ", ".join(f":{column}_{i}" for column in BOOK_COLUMNS) + ")")
+                        for column, value in book_params(book_id, book_info).items():
+                            book_params_all[f"{column}_{i}"] = value
+                    conn.execute(text(f"""
+                        INSERT INTO stores (store_id, user_id, book_id, price, stock_level)
+                        VALUES {', '.join(store_values)}
+                    """), store_params)
+                    conn.execute(text(f"""
+                        INSERT INTO new_books ({', '.join(BOOK_COLUMNS)})
+                        VALUES {', '.join(book_values)}
+                        ON DUPLICATE KEY UPDATE book_id = book_id
+                    """), book_params_all)
+                trans.commit()
+            except Exception:
+                trans.rollback()
+                raise
+        return existing
+
 
     #     return 200, "ok"
     # def add_stock_level(self, user_id: str, store_id: str, book_id: str, add_stock_level: int):
@@ -239,6 +388,96 @@ class Seller(db_conn.DBConn):
         logging.info(f"[INFO] Stock level for book_id {book_id} in store {store_id} successfully updated.")
         return 200, "ok"
 
+    def add_stock_levels(self, user_id: str, store_id: str, adjustments: list) -> tuple:
+        """
+        批量调整库存：同一事务中锁定相关库存行，逐本校验后用一条 UPDATE ... JOIN（UNION ALL 派生表）应用全部增量。
+        delta 可为负数（盘点纠正），调整后库存不能小于 0；同一本书出现多次时增量合并。
+        :param adjustments: [{"book_id": ..., "delta": ...}]
+        :return: (状态码, 消息, [{"book_id", "code", "message", "stock_level"}])
+        """
+        if not isinstance(adjustments, list):
+            return 400, "adjustments must be a list", []
+        if len(adjustments) > ADD_STOCK_LEVELS_MAX:
+            return 400, f"Too many adjustments, at most {ADD_STOCK_LEVELS_MAX} per request", []
+
+        deltas = {}  # book_id -> 合并后的增量，保持请求中的顺序
+        invalid = []
+        for entry in adjustments:
+            book_id = entry.get("book_id") if isinstance(entry, dict) else None
+            delta = entry.get("delta") if isinstance(entry, dict) else None
+            if not isinstance(book_id, str) or not book_id or isinstance(delta, bool) or not isinstance(delta, int) or delta == 0:
+                invalid.append({"book_id": book_id, "code": 400, "message": "Invalid book_id or delta",
+                                "stock_level": None})
+                continue
+            deltas[book_id] = deltas.get(book_id, 0) + delta
+
+        results = {}
+        try:
+            with self.conn.connect() as conn:
+                trans = conn.begin()
+                try:
+                    exists = conn.execute(text("""
+                        SELECT
+                            EXISTS (SELECT 1 FROM users WHERE user_id = :user_id),
+                            EXISTS (SELECT 1 FROM store WHERE store_id = :store_id),
+                            EXISTS (SELECT 1 FROM store WHERE store_id = :store_id AND user_id = :user_id)
+                    """), {"user_id": user_id, "store_id": store_id}).fetchone()
+                    if not exists[0]:
+                        trans.rollback()
+                        return (*error.error_non_exist_user_id(user_id), [])
+                    if not exists[1]:
+                        trans.rollback()
+                        return (*error.error_non_exist_store_id(store_id), [])
+                    if not exists[2]:
+                        trans.rollback()
+                        return (*error.error_authorization_fail(), [])
+
+                    current = {}
+                    if deltas:
+                        query_levels = text("""
+                            SELECT book_id, stock_level FROM stores
+                            WHERE store_id = :store_id AND book_id IN :book_ids
+                            FOR UPDATE
+                        """).bindparams(sa.bindparam("book_ids", expanding=True))
+                        rows = conn.execute(query_levels, {"store_id": store_id, "book_ids": list(deltas)}).fetchall()
+                        current = {row[0]: row[1] for row in rows}
+
+                    applied = {}
+                    for book_id, delta in deltas.items():
+                        if book_id not in current:
+                            code, message = error.error_non_exist_book_id(book_id)
+                            results[book_id] = {"book_id": book_id, "code": code, "message": message, "stock_level": None}
+                        elif current[book_id] + delta < 0:
+                            code, message = error.error_stock_level_low(book_id)
+                            results[book_id] = {"book_id": book_id, "code": code, "message": message,
+                                                "stock_level": current[book_id]}
+                        else:
+                            applied[book_id] = delta
+                            results[book_id] = {"book_id": book_id, "code": 200, "message": "ok",
+                                                "stock_level": current[book_id] + delta}
+
+                    if applied:
+                        params = {"store_id": store_id}
+                        selects = []
+                        for i, (book_id, delta) in enumerate(applied.items()):
+                            params[f"book_id_{i}"] = book_id
+                            params[f"delta_{i}"] = delta
+                            selects.append(f"SELECT :book_id_{i} AS book_id, :delta_{i} AS delta")
+                        conn.execute(text(f"""
+                            UPDATE stores s
+                            JOIN ({' UNION ALL '.join(selects)}) d ON s.book_id = d.book_id
+                            SET s.stock_level = s.stock_level + d.delta
+                            WHERE s.store_id = :store_id
+                        """), params)
+                    trans.commit()
+                except Exception:
+                    trans.rollback()
+                    raise
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] Database error in add_stock_levels: {str(e)}")
+            return 528, f"Database error: {str(e)}", []
+        return 200, "ok", list(results.values()) + invalid
+
 
     #     return 200, "Store created successfully"
     # def create_store(self, user_id: str, store_id: str) -> tuple:
@@ -284,7 +523,7 @@ class Seller(db_conn.DBConn):
         try:
             # 1. 检查商店是否已存在（事务外）
             with self.conn.connect() as connection:
-                query_exist = sa.text("SELECT COUNT(1) FROM stores WHERE store_id = :store_id")
+                query_exist = sa.text("SELECT COUNT(1) FROM store WHERE store_id = :store_id")
                 result = connection.execute(query_exist, {"store_id": store_id}).scalar()
                 if result > 0:
                     logging.info(f"[INFO] Store {store_id} already exists.")
@@ -295,7 +534,7 @@ class Seller(db_conn.DBConn):
                 trans = connection.begin()  # 显式事务
                 try:
                     query_insert = sa.text("""
-                    INSERT INTO stores (store_id, user_id)
+                    INSERT INTO store (store_id, user_id)
                     VALUES (:store_id, :user_id);
                     """)
                     connection.execute(query_insert, {"store_id": store_id, "user_id": user_id})
@@ -391,7 +630,7 @@ class Seller(db_conn.DBConn):
             with self.conn.connect() as conn:
                 query_store_exist = text("""
                 SELECT COUNT(1) 
-                FROM stores 
+                FROM store 
                 WHERE store_id = :store_id
                 """)
                 store_count = conn.execute(query_store_exist, {"store_id": store_id}).scalar()
@@ -446,4 +685,159 @@ class Seller(db_conn.DBConn):
             return 528, f"发货时发生未知错误: {str(e)}"
 
         logging.info(f"[INFO] Delivery success: store_id={store_id}, order_id={order_id}")
-        return 200, "发货成功"
\ No newline at end of file
+        return 200, "发货成功"
+
+    def delivery_orders(self, store_id: str, order_ids: list) -> tuple:
+        """
+        批量发货：同一事务中一条查询锁定并校验所有订单的归属与状态，
+        再用一条 UPDATE 把全部待发货订单 (状态 1) 更新为待收货 (状态 2)。
+        :return: (状态码, 消息, [{"order_id", "code", "message"}])，逐单返回结果，与 delivery_order 的错误码一致
+        """
+        if not isinstance(order_ids, list) or not all(isinstance(o, str) and o for o in order_ids):
+            return 400, "order_ids must be a list of order ids", []
+        if len(order_ids) > DELIVERY_ORDERS_MAX:
+            return 400, f"Too many orders, at most {DELIVERY_ORDERS_MAX} per request", []
+        order_ids = list(dict.fromkeys(order_ids))
+
+        results = {}
+        try:
+            with self.conn.connect() as conn:
+                trans = conn.begin()
+                try:
+                    store_exists = conn.execute(
+                        text("SELECT EXISTS (SELECT 1 FROM store WHERE store_id = :store_id)"),
+                        {"store_id": store_id},
+                    ).scalar()
+                    if not store_exists:
+                        trans.rollback()
+                        return (*error.error_non_exist_store_id(store_id), [])
+
+                    eligible = []
+                    if order_ids:
+                        query_orders = text("""
+                            SELECT order_id, store_id, status
+                            FROM history_order
+                            WHERE order_id IN :order_ids
+                            FOR UPDATE
+                        """).bindparams(sa.bindparam("order_ids", expanding=True))
+                        rows = conn.execute(query_orders, {"order_ids": order_ids}).fetchall()
+                        orders = {row[0]: (row[1], row[2]) for row in rows}
+                        for order_id in order_ids:
+                            if order_id not in orders:
+                                code, message = error.error_invalid_order_id(order_id)
+                            elif orders[order_id][0] != store_id:
+                                code, message = error.error_invalid_store_id(store_id)
+                            elif orders[order_id][1] != 1:
+                                code, message = error.error_invalid_order_status(order_id)
+                            else:
+                                code, message = 200, "ok"
+                                eligible.append(order_id)
+                            results[order_id] = {"order_id": order_id, "code": code, "message": message}
+
+                    if eligible:
+                        update_status = text("""
+                            UPDATE history_order
+                            SET status = 2
+                            WHERE order_id IN :order_ids AND store_id = :store_id AND status = 1
+                        """).bindparams(sa.bindparam("order_ids", expanding=True))
+                        conn.execute(update_status, {"order_ids": eligible, "store_id": store_id})
+                    trans.commit()
+                except Exception:
+                    trans.rollback()
+                    raise
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] Database error in delivery_orders: {str(e)}")
+            return 528, f"Database error: {str(e)}", []
+        logging.info(f"[INFO] Bulk delivery: store_id={store_id}, delivered={len(eligible)}/{len(order_ids)}")
+        return 200, "ok", list(results.values())
+
+    def list_orders(self, user_id: str, store_id: str, status: int = None, start_time: datetime = None,
+                    end_time: datetime = None, limit: int = 20, cursor: str = None,
+                    include_items: bool = False) -> tuple:
+        """
+        卖家订单列表：按 store_id / status / 时间窗口过滤，commit_time 倒序，
+        走 history_order(store_id, status, commit_time) 复合索引，用 (commit_time, _id) 键集分页。
+        commit_time 为空的订单（MySQL 倒序时 NULL 排在最后）排在所有有时间的订单之后，按 _id 倒序；
+        指定时间窗口时不返回这些订单。
+        include_items 为真时用一条 IN 查询批量取回本页所有订单的明细。
+        :return: (状态码, 消息, {"orders": [...], "next_cursor": 下一页游标或 None})
+        """
+        if not isinstance(limit, int) or not 0 < limit <= LIST_ORDERS_MAX_LIMIT:
+            return 400, f"limit must be between 1 and {LIST_ORDERS_MAX_LIMIT}", {}
+        position = None
+        if cursor:
+            position = decode_order_cursor(cursor)
+            if position is None:
+                return 400, "Invalid cursor", {}
+
+        conditions = ["store_id = :store_id"]
+        params = {"store_id": store_id, "user_id": user_id, "limit": limit + 1}
+        if status is not None:
+            conditions.append("status = :status")
+            params["status"] = status
+        if start_time is not None:
+            conditions.append("commit_time >= :start_time")
+            params["start_time"] = start_time
+        if end_time is not None:
+            conditions.append("commit_time < :end_time")
+            params["end_time"] = end_time
+        if position is not None:
+            params["cursor_time"], params["cursor_id"] = position
+            if params["cursor_time"] is None:
+                conditions.append("commit_time IS NULL AND _id < :cursor_id")
+            else:
+                conditions.append(
+                    "(commit_time < :cursor_time OR (commit_time = :cursor_time AND _id < :cursor_id)"
+                    " OR commit_time IS NULL)"
+                )
+
+        try:
+            with self.conn.connect() as conn:
+                exists = conn.execute(text("""
+                    SELECT
+                        EXISTS (SELECT 1 FROM store WHERE store_id = :store_id),
+                        EXISTS (SELECT 1 FROM store WHERE store_id = :store_id AND user_id = :user_id)
+                """), params).fetchone()
+                if not exists[0]:
+                    return (*error.error_non_exist_store_id(store_id), {})
+                if not exists[1]:
+                    return (*error.error_authorization_fail(), {})
+
+                rows = conn.execute(text(f"""
+                    SELECT _id, order_id, user_id, status, commit_time
+                    FROM history_order
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY commit_time DESC, _id DESC
+                    LIMIT :limit
+                """), params).mappings().fetchall()
+
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = encode_order_cursor(rows[-1]["commit_time"], rows[-1]["_id"])
+                orders = [{
+                    "order_id": row["order_id"],
+                    "buyer_id": row["user_id"],
+                    "status": row["status"],
+                    "commit_time": row["commit_time"].isoformat() if row["commit_time"] else None,
+                } for row in rows]
+
+                if include_items and orders:
+                    query_items = text("""
+                        SELECT order_id, book_id, count, price
+                        FROM history_order_detail
+                        WHERE order_id IN :order_ids
+                    """).bindparams(sa.bindparam("order_ids", expanding=True))
+                    items = {}
+                    for item in conn.execute(query_items, {"order_ids": [o["order_id"] for o in orders]}).mappings():
+                        items.setdefault(item["order_id"], []).append({
+                            "book_id": item["book_id"],
+                            "count": item["count"],
+                            "price": float(item["price"]) if item["price"] is not None else None,
+                        })
+                    for order in orders:
+                        order["items"] = items.get(order["order_id"], [])
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] Database error in list_orders: {str(e)}")
+            return 528, f"Database error: {str(e)}", {}
+        return 200, "ok", {"orders": orders, "next_cursor": next_cursor}
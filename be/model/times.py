@@ -2,6 +2,7 @@ from collections import deque
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine, text
 from be.model.store import resolve_db_url
+from be.model.recommend_cache import recommend_cache
 import os
 # 定义全局变量
 unpaid_orders = deque()
@@ -95,6 +96,7 @@ def cancel_expired_order(order_id):
             print(f"[DEBUG] After removing: unpaid_orders={list(unpaid_orders)}")
             
             conn.commit()
+            recommend_cache.invalidate_user(order["user_id"])
             print(f"[DEBUG] Order {order_id} cancelled and moved to history.")
     except Exception as e:
         print(f"[ERROR] Error cancelling expired order {order_id}: {str(e)}")
@@ -0,0 +1,113 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from be.model import store
+from be.model.recommend_cache import _resolve_env_number
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+MAX_LONG_POLL_SECONDS = 30  # 状态查询长轮询的最长等待时间
+TITLE_JOB_STALE_SECONDS = 600  # pending/running 任务超过该时长未更新即视为执行它的进程已退出
+
+
+class TitleJobPool:
+    """
+    书名提取异步任务的后台执行池：
+    - 最多 max_workers 个线程执行推理，不占用 Web 请求线程；
+    - 排队 + 执行中的任务总数不超过 max_pending，超出时 submit 返回 False，由调用方拒绝请求；
+    - 每个任务对应一个 Event，任务结束时置位，供状态接口长轮询等待。
+    Event 只存在于执行该任务的进程中：多 worker 部署时，长轮询请求落到其他 worker 上会立即返回
+    数据库中的当前状态，客户端需要继续轮询（退化为普通的数据库轮询）。
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._events = {}  # job_id -> Event
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="title-job")
+            return self._executor
+
+    def submit(self, job_id: str, fn, *args) -> bool:
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self._events[job_id] = threading.Event()
+        try:
+            self._get_executor().submit(self._run, job_id, fn, args)
+        except Exception:
+            self._finish(job_id)
+            raise
+        return True
+
+    def _run(self, job_id: str, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logging.error(f"[ERROR] Title job {job_id} crashed: {str(e)}")
+        finally:
+            self._finish(job_id)
+
+    def _finish(self, job_id: str):
+        with self._lock:
+            event = self._events.pop(job_id, None)
+        self._slots.release()
+        if event is not None:
+            event.set()
+
+    def wait(self, job_id: str, timeout: float) -> bool:
+        """
+        等待任务结束；任务不在本进程的执行池中（已结束或由其他进程执行）时立即返回 False
+        """
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is None:
+            return False
+        return event.wait(timeout)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+
+def fail_stale_title_jobs(engine=None, stale_seconds: float = None) -> int:
+    """
+    启动时调用：进程退出时仍为 pending/running 的任务不会再被执行，
+    超过 stale_seconds 未更新的标记为 failed，避免客户端永远等待。返回处理的任务数
+    """
+    if stale_seconds is None:
+        stale_seconds = _resolve_env_number("BOOKSTORE_TITLE_JOB_STALE_SECONDS", TITLE_JOB_STALE_SECONDS, float)
+    engine = engine or store.get_db_conn()
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            UPDATE title_jobs
+            SET status = :failed, error = :error, updated_at = NOW()
+            WHERE status IN (:pending, :running)
+            AND updated_at < NOW() - INTERVAL :stale_seconds SECOND
+        """), {
+            "failed": JOB_FAILED,
+            "error": "title job was interrupted",
+            "pending": JOB_PENDING,
+            "running": JOB_RUNNING,
+            "stale_seconds": int(stale_seconds),
+        })
+        conn.commit()
+    if result.rowcount:
+        logging.warning(f"[WARNING] Marked {result.rowcount} interrupted title jobs as failed")
+    return result.rowcount
+
+
+# 全局实例（进程内共享）
+title_job_pool = TitleJobPool(
+    max_workers=_resolve_env_number("BOOKSTORE_TITLE_JOB_WORKERS", 2, int),
+    max_pending=_resolve_env_number("BOOKSTORE_TITLE_JOB_MAX_PENDING", 100, int),
+)
@@ -0,0 +1,165 @@
+import logging
+import re
+import threading
+from collections import deque
+from sqlalchemy import text
+from be.model import store
+
+MIN_TITLE_LENGTH = 2  # 过短的书名（单字）几乎会匹配任何文本，不参与目录匹配
+SHORT_TITLE_LENGTH = 4  # 短于该长度的书名容易与常用词重合，需要额外过滤
+GENERIC_TITLE_MIN_CONTAINERS = 2  # 短书名作为子串出现在至少这么多其他书名中时视为常用词
+# 常见的两三字泛称：目录中即使有同名书，出现在普通文本中也多半不是在指这本书
+COMMON_WORDS = frozenset({
+    "小说", "历史", "中国", "世界", "文学", "故事", "生活", "人生", "爱情", "哲学", "经济", "科学", "艺术",
+    "教育", "管理", "心理学", "经济学", "社会学", "诗歌", "散文", "童话", "科幻", "悬疑", "推理", "传记",
+    "时间", "未来", "青春", "旅行", "家庭", "朋友", "孩子", "工作", "学习", "读书", "中国人", "现代", "古代",
+})
+BRACKET_PATTERN = re.compile(r'《(.*?)》')
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick 多模式匹配自动机：一次扫描文本即可找出所有出现的模式串，耗时与模式数量无关
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]  # state -> {char: next_state}
+        self._fail = [0]
+        self._output = [None]  # state -> 以该状态结尾的模式串
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = next_state
+        self._output[state] = pattern
+
+    def _build(self):
+        self._dict_link = [0] * len(self._goto)  # 沿失败链最近的、有输出的状态
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._dict_link[next_state] = fail if self._output[fail] is not None else self._dict_link[fail]
+                queue.append(next_state)
+
+    def find_all(self, text: str) -> list:
+        """
+        返回所有匹配：[(起始位置, 结束位置, 模式串)]
+        """
+        matches = []
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            hit = state if self._output[state] is not None else self._dict_link[state]
+            while hit:
+                pattern = self._output[hit]
+                matches.append((index - len(pattern) + 1, index + 1, pattern))
+                hit = self._dict_link[hit]
+        return matches
+
+
+def generic_titles(patterns: set) -> set:
+    """
+    找出像常用词的短书名：在 COMMON_WORDS 中，或作为子串出现在至少 GENERIC_TITLE_MIN_CONTAINERS 个其他书名中；
+    用短书名构建自动机扫描一遍全部书名，耗时与书名总长度成正比
+    """
+    short = {p for p in patterns if len(p) < SHORT_TITLE_LENGTH}
+    if not short:
+        return set()
+    containers = {}
+    automaton = AhoCorasick(short)
+    for title in patterns:
+        for pattern in {match[2] for match in automaton.find_all(title)}:
+            if pattern != title:
+                containers[pattern] = containers.get(pattern, 0) + 1
+    return {p for p in short if p in COMMON_WORDS or containers.get(p, 0) >= GENERIC_TITLE_MIN_CONTAINERS}
+
+
+def longest_non_overlapping(matches: list) -> list:
+    """
+    从重叠的匹配中优先保留起点靠前、长度更长的，避免《三体》同时命中“三体”和“三体II”这类前缀书名
+    """
+    selected = []
+    last_end = 0
+    for start, end, pattern in sorted(matches, key=lambda m: (m[0], -(m[1] - m[0]))):
+        if start >= last_end:
+            selected.append(pattern)
+            last_end = end
+    return selected
+
+
+class CatalogTitleMatcher:
+    """
+    目录书名匹配：启动时用 new_books 中的书名构建 Aho–Corasick 自动机，
+    输入文本中完整出现的目录书名无需调用生成模型即可直接返回。
+    短书名中的常用词（COMMON_WORDS，或作为子串出现在多个其他书名中的泛称，如“中国”“历史”）不参与匹配，
+    否则几乎任何文本都会命中快速路径而跳过模型。
+    """
+
+    def __init__(self, min_length: int = MIN_TITLE_LENGTH):
+        self.min_length = min_length
+        self._automaton = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._automaton is not None
+
+    def build(self, titles):
+        patterns = {title.strip() for title in titles if title and len(title.strip()) >= self.min_length}
+        patterns -= generic_titles(patterns)
+        automaton = AhoCorasick(patterns)
+        with self._lock:
+            self._automaton = automaton
+        return len(patterns)
+
+    def load(self, engine=None):
+        engine = engine or store.get_db_conn()
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT DISTINCT title FROM new_books WHERE title IS NOT NULL")).fetchall()
+        count = self.build(row[0] for row in rows)
+        logging.info(f"[INFO] Catalog title matcher built with {count} titles")
+
+    def refresh(self):
+        try:
+            self.load()
+        except Exception as e:
+            logging.error(f"[ERROR] Failed to refresh catalog title matcher: {str(e)}")
+
+    def match(self, txt: str) -> list:
+        with self._lock:
+            automaton = self._automaton
+        if automaton is None:
+            return []
+        return longest_non_overlapping(automaton.find_all(txt))
+
+
+def fast_extract_titles(txt: str, matcher: "CatalogTitleMatcher" = None) -> list:
+    """
+    不调用模型的书名提取：先取《》中的书名，再补充文本中出现的目录书名，按出现顺序去重
+    """
+    matcher = matcher or catalog_matcher
+    titles = [title.strip() for title in BRACKET_PATTERN.findall(txt) if title.strip()]
+    titles.extend(matcher.match(txt))
+    return list(dict.fromkeys(titles))
+
+
+# 全局实例（进程内共享）
+catalog_matcher = CatalogTitleMatcher()
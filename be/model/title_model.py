@@ -0,0 +1,328 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from be.model.recommend_cache import _resolve_env_number
+from be.model.lazy_import import LazyModule
+
+# torch / transformers 只在首次加载模型时导入，只处理订单的进程不承担其启动耗时与内存
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+
+DEFAULT_TITLE_MODEL = "charent/ChatLM-mini-Chinese"
+GENERATE_MAX_SEQ_LEN = 256
+BATCH_RESULT_TIMEOUT = 300  # 等待批量推理结果的最长秒数
+SEARCH_TYPES = ("beam", "greedy")
+QUANTIZED_SUFFIX = ":int8"
+# 仓库自带模型代码、必须 trust_remote_code 才能加载的模型；其他模型一律不执行远程代码
+REMOTE_CODE_MODELS = {DEFAULT_TITLE_MODEL}
+
+
+def allowed_title_models() -> set:
+    """
+    服务端允许加载的模型：BOOKSTORE_TITLE_MODELS 逗号分隔追加，默认只有 DEFAULT_TITLE_MODEL
+    """
+    extra = os.getenv("BOOKSTORE_TITLE_MODELS", "")
+    return {DEFAULT_TITLE_MODEL} | {m.strip() for m in extra.split(",") if m.strip()}
+
+
+class InferenceProfile:
+    """
+    书名提取的推理配置：
+    - quantize: CPU 上对线性层做动态 int8 量化；
+    - search_type: beam（默认，与旧版本一致）或 greedy；
+    - num_threads: torch 算子内线程数上限，为空时使用 torch 默认值（全部核心）。
+    """
+
+    def __init__(self, quantize: bool = False, search_type: str = "beam", num_threads: int = None):
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Invalid search_type {search_type}, expected one of {', '.join(SEARCH_TYPES)}")
+        self.quantize = quantize
+        self.search_type = search_type
+        self.num_threads = num_threads
+
+    @classmethod
+    def from_env(cls) -> "InferenceProfile":
+        search_type = os.getenv("BOOKSTORE_TITLE_SEARCH_TYPE", "beam")
+        if search_type not in SEARCH_TYPES:
+            print(f"[WARN] Invalid BOOKSTORE_TITLE_SEARCH_TYPE={search_type}, fallback to default beam")
+            search_type = "beam"
+        return cls(
+            quantize=os.getenv("BOOKSTORE_TITLE_QUANTIZE", "").lower() in ("1", "true", "yes"),
+            search_type=search_type,
+            num_threads=_resolve_env_number("BOOKSTORE_TITLE_THREADS", None, int),
+        )
+
+    def generate_kwargs(self) -> dict:
+        return {"max_seq_len": GENERATE_MAX_SEQ_LEN, "search_type": self.search_type}
+
+    def cache_params(self) -> dict:
+        """
+        参与结果缓存哈希的参数：生成参数 + 是否量化（量化后输出可能不同）
+        """
+        params = self.generate_kwargs()
+        if self.quantize:
+            params["quantize"] = "int8"
+        return params
+
+    def apply_thread_budget(self):
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+
+    def __repr__(self):
+        return f"InferenceProfile(quantize={self.quantize}, search_type={self.search_type}, num_threads={self.num_threads})"
+
+
+def title_input_hash(model_id: str, text: str, params: dict = None) -> str:
+    """
+    书名提取结果的内容哈希：sha256(model_id, 输入文本, 生成参数)，任一项变化都视为不同输入
+    """
+    params = params or title_profile.cache_params()
+    payload = json.dumps([model_id, text, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TitleResultCache:
+    """
+    书名提取结果的进程内 LRU 缓存（input_hash -> 书名列表），位于 generated_titles 表查询之前
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, input_hash: str):
+        with self._lock:
+            titles = self._entries.get(input_hash)
+            if titles is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(input_hash)
+            self.hits += 1
+            return list(titles)
+
+    def put(self, input_hash: str, titles: list):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[input_hash] = list(titles)
+            self._entries.move_to_end(input_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class LoadedModel:
+    def __init__(self, tokenizer, model, device):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """
+    书名提取模型注册表：每个 model_id 在进程内只加载一次。
+    - 首次使用时懒加载（分词器 + 模型，移动到设备并切换到 eval 模式）；
+    - 同一 model_id 的并发首次请求只触发一次加载，不同 model_id 互不阻塞；
+    - idle_seconds 不为空时，unload_idle 会卸载超过该时长未使用的模型以释放内存；
+    - allowed_models 不为空时只加载其中的模型，其他 model_id 抛出 ValueError，不下载也不缓存。
+    """
+
+    def __init__(self, idle_seconds: float = None, allowed_models: set = None):
+        self.idle_seconds = idle_seconds
+        self.allowed_models = allowed_models
+        self._models = {}  # model_id -> LoadedModel
+        self._load_locks = {}  # model_id -> Lock
+        self._lock = threading.Lock()
+
+    def _load(self, model_id: str, quantize: bool = False) -> LoadedModel:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        start = time.perf_counter()
+        tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
+        model = transformers.AutoModelForSeq2SeqLM.from_pretrained(
+            model_id, trust_remote_code=model_id in REMOTE_CODE_MODELS
+        ).to(device)
+        if hasattr(model, "eval"):
+            model.eval()
+        # 动态 int8 量化只支持 CPU 推理，GPU 上保持原精度
+        if quantize and str(device) == "cpu":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logging.info(f"[INFO] Model {model_id} (quantize={quantize}) loaded on {device} in {time.perf_counter() - start:.2f}s")
+        return LoadedModel(tokenizer, model, device)
+
+    def get(self, model_id: str = DEFAULT_TITLE_MODEL, quantize: bool = False) -> LoadedModel:
+        if self.allowed_models is not None and model_id not in self.allowed_models:
+            raise ValueError(f"Unknown title model: {model_id}")
+        key = model_id + QUANTIZED_SUFFIX if quantize else model_id
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is None:
+                load_lock = self._load_locks.setdefault(key, threading.Lock())
+        if loaded is None:
+            with load_lock:
+                with self._lock:
+                    loaded = self._models.get(key)
+                if loaded is None:
+                    loaded = self._load(model_id, quantize)
+                    with self._lock:
+                        self._models[key] = loaded
+        loaded.last_used = time.monotonic()
+        return loaded
+
+    def warm_up(self, model_id: str = DEFAULT_TITLE_MODEL, quantize: bool = False):
+        """
+        启动时预加载模型，避免首个请求承担加载耗时
+        """
+        self.get(model_id, quantize)
+
+    def unload(self, model_id: str = None):
+        """
+        卸载指定模型（含其量化版本）；model_id 为空时卸载全部
+        """
+        with self._lock:
+            if model_id is None:
+                self._models.clear()
+            else:
+                self._models.pop(model_id, None)
+                self._models.pop(model_id + QUANTIZED_SUFFIX, None)
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def unload_idle(self):
+        if not self.idle_seconds:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle = [model_id for model_id, loaded in self._models.items()
+                    if now - loaded.last_used > self.idle_seconds]
+        for key in idle:
+            logging.info(f"[INFO] Unloading idle model {key}")
+            with self._lock:
+                self._models.pop(key, None)
+
+    def loaded_models(self) -> list:
+        with self._lock:
+            return list(self._models)
+
+
+class TitleBatcher:
+    """
+    书名提取的动态微批推理队列：并发请求先进入队列，由后台工作线程合并成批，
+    同一 model_id 的请求右侧补齐到相同长度后只调用一次 my_generate，再把每条结果交还给对应调用方。
+    - 队列中凑满 max_batch_size 条或第一条请求等待超过 max_wait_ms 时立即出批；
+    - 单条请求（低负载）最多只多等待 max_wait_ms。
+    """
+
+    def __init__(self, registry: ModelRegistry, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 profile: InferenceProfile = None):
+        self.registry = registry
+        self.profile = profile or InferenceProfile()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="title-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, model_id: str, text: str) -> Future:
+        future = Future()
+        self._queue.put((model_id, text, future))
+        self._ensure_worker()
+        return future
+
+    def generate(self, model_id: str, text: str, timeout: float = BATCH_RESULT_TIMEOUT) -> str:
+        """
+        提交一条文本并阻塞等待生成结果
+        """
+        return self.submit(model_id, text).result(timeout=timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # 推理线程数上限在工作线程启动时设置（torch 线程池为进程级）
+        self.profile.apply_thread_budget()
+        while True:
+            batch = self._collect()
+            groups = {}
+            for model_id, text, future in batch:
+                groups.setdefault(model_id, []).append((text, future))
+            for model_id, items in groups.items():
+                futures = [future for _, future in items]
+                try:
+                    outputs = self._generate_batch(model_id, [text for text, _ in items])
+                    for future, output in zip(futures, outputs):
+                        future.set_result(output)
+                except Exception as e:
+                    logging.error(f"[ERROR] Batched title generation failed: {str(e)}")
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _generate_batch(self, model_id: str, texts: list) -> list:
+        loaded = self.registry.get(model_id, self.profile.quantize)
+        tokenizer, model, device = loaded.tokenizer, loaded.model, loaded.device
+
+        # 分词后右侧补齐到批内最大长度，补齐位置的 attention_mask 为 0
+        encode_ids = tokenizer(texts)
+        pad_id = getattr(tokenizer, "pad_token_id", None) or 0
+        max_len = max(len(ids) for ids in encode_ids['input_ids'])
+        input_ids = [ids + [pad_id] * (max_len - len(ids)) for ids in encode_ids['input_ids']]
+        attention_mask = [mask + [0] * (max_len - len(mask)) for mask in encode_ids['attention_mask']]
+
+        with torch.no_grad():
+            outs = model.my_generate(
+                input_ids=torch.LongTensor(input_ids).to(device),
+                attention_mask=torch.LongTensor(attention_mask).to(device),
+                **self.profile.generate_kwargs(),
+            )
+        outputs = tokenizer.batch_decode(outs.cpu().numpy(), skip_special_tokens=True, clean_up_tokenization_spaces=True)
+        if len(outputs) != len(texts):
+            raise RuntimeError(f"Expected {len(texts)} generated outputs, got {len(outputs)}")
+        return outputs
+
+
+# 全局实例（进程内共享），BOOKSTORE_TITLE_MODEL_IDLE_SECONDS 为空或 0 时不卸载
+title_profile = InferenceProfile.from_env()
+model_registry = ModelRegistry(
+    idle_seconds=_resolve_env_number("BOOKSTORE_TITLE_MODEL_IDLE_SECONDS", None, float),
+    allowed_models=allowed_title_models(),
+)
+title_result_cache = TitleResultCache(
+    max_entries=_resolve_env_number("BOOKSTORE_TITLE_CACHE_SIZE", 10000, int),
+)
+title_batcher = TitleBatcher(
+    model_registry,
+    max_batch_size=_resolve_env_number("BOOKSTORE_TITLE_BATCH_SIZE", 8, int),
+    max_wait_ms=_resolve_env_number("BOOKSTORE_TITLE_BATCH_WAIT_MS", 10.0, float),
+    profile=title_profile,
+)
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+import uuid
+import jwt
+from sqlalchemy import text
+from be.model import store
+from be.model.recommend_cache import _resolve_env_number
+
+AUTH_MODE_DB = "db"  # 默认：token 以 user_id 签名，并与 users.token 比对
+AUTH_MODE_STATELESS = "stateless"  # 服务端密钥签名 + exp，校验不访问数据库
+REVOCATION_BUCKET_SECONDS = 300  # 吊销记录按 token 过期时间分桶，整桶过期后一起清理
+REVOCATION_SYNC_SECONDS = 5  # 共享吊销表同步到进程内存的间隔，其他 worker 的吊销最多延迟这么久生效
+DEFAULT_REVOCATION_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "revocations.json")
+
+
+def auth_mode() -> str:
+    mode = os.getenv("BOOKSTORE_AUTH_MODE", AUTH_MODE_DB)
+    return mode if mode in (AUTH_MODE_DB, AUTH_MODE_STATELESS) else AUTH_MODE_DB
+
+
+_generated_secret = None
+
+
+def token_secret() -> str:
+    """
+    无状态 token 的签名密钥：多 worker 部署时必须通过 BOOKSTORE_TOKEN_SECRET 配置同一个密钥
+    """
+    global _generated_secret
+    secret = os.getenv("BOOKSTORE_TOKEN_SECRET")
+    if secret:
+        return secret
+    if _generated_secret is None:
+        _generated_secret = secrets.token_hex(32)
+        logging.warning("[WARN] BOOKSTORE_TOKEN_SECRET is not set, using a per-process random secret")
+    return _generated_secret
+
+
+class MySQLRevocationStore:
+    """
+    多 worker 共享的吊销记录：token_revocations 表，单个 token 以 "jti:<jti>"、用户级吊销以 "user:<user_id>" 为主键，
+    expire_at 之后记录不再有意义，由 purge 删除
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def _engine(self):
+        return self.engine or store.get_db_conn()
+
+    def add_token(self, jti: str, expire_at: float):
+        with self._engine().connect() as conn:
+            conn.execute(text("""
+                INSERT INTO token_revocations (revocation_key, cutoff, expire_at)
+                VALUES (:key, NULL, :expire_at)
+                ON DUPLICATE KEY UPDATE expire_at = GREATEST(expire_at, VALUES(expire_at))
+            """), {"key": f"jti:{jti}", "expire_at": expire_at})
+            conn.commit()
+
+    def add_user(self, user_id: str, cutoff: float, expire_at: float):
+        with self._engine().connect() as conn:
+            conn.execute(text("""
+                INSERT INTO token_revocations (revocation_key, cutoff, expire_at)
+                VALUES (:key, :cutoff, :expire_at)
+                ON DUPLICATE KEY UPDATE
+                    cutoff = GREATEST(cutoff, VALUES(cutoff)),
+                    expire_at = GREATEST(expire_at, VALUES(expire_at))
+            """), {"key": f"user:{user_id}", "cutoff": cutoff, "expire_at": expire_at})
+            conn.commit()
+
+    def fetch(self, now: float) -> tuple:
+        """
+        读取仍有效的吊销记录：([(jti, expire_at)], {user_id: (cutoff, expire_at)})
+        """
+        with self._engine().connect() as conn:
+            rows = conn.execute(text(
+                "SELECT revocation_key, cutoff, expire_at FROM token_revocations WHERE expire_at > :now"
+            ), {"now": now}).fetchall()
+        tokens, users = [], {}
+        for key, cutoff, expire_at in rows:
+            kind, _, value = key.partition(":")
+            if kind == "jti":
+                tokens.append((value, expire_at))
+            elif kind == "user":
+                users[value] = (cutoff, expire_at)
+        return tokens, users
+
+    def purge(self, now: float):
+        with self._engine().connect() as conn:
+            conn.execute(text("DELETE FROM token_revocations WHERE expire_at <= :now"), {"now": now})
+            conn.commit()
+
+
+class RevocationList:
+    """
+    无状态 token 的吊销表：
+    - 单个 token（登出）按 jti 记录，并按其过期时间分桶，整桶过期后清理，内存只保留仍可能被使用的记录；
+    - 用户级吊销（修改密码、注销）记录截止时间，该时间之前签发的 token 全部失效；
+    - 配置 shared_store 时（多 worker 部署）吊销先写入共享表，校验前每 sync_seconds 秒从共享表重建内存，
+      任一 worker 的吊销最多 sync_seconds 秒后在所有 worker 生效；
+    - 未配置 shared_store 时每次吊销写入文件（先写临时文件再替换），启动时重新加载；
+      文件保存的是本进程的完整快照，只适用于单进程部署。
+    """
+
+    def __init__(self, path: str = None, bucket_seconds: int = REVOCATION_BUCKET_SECONDS,
+                 shared_store: MySQLRevocationStore = None, sync_seconds: float = REVOCATION_SYNC_SECONDS):
+        self.path = path
+        self.bucket_seconds = bucket_seconds
+        self.shared_store = shared_store
+        self.sync_seconds = sync_seconds
+        self._buckets = {}  # bucket_id -> {jti}
+        self._user_cutoffs = {}  # user_id -> (cutoff, expire_at)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+
+    def _bucket(self, expire_at: float) -> int:
+        return int(expire_at // self.bucket_seconds)
+
+    def revoke(self, jti: str, expire_at: float):
+        """
+        吊销单个 token；共享表写入失败时抛出异常，调用方不能把登出当作成功
+        """
+        if expire_at <= time.time():
+            return
+        if self.shared_store is not None:
+            self.shared_store.add_token(jti, expire_at)
+        with self._lock:
+            self._buckets.setdefault(self._bucket(expire_at), set()).add(jti)
+        self.save()
+
+    def revoke_user(self, user_id: str, lifetime: float):
+        """
+        吊销用户在此刻之前签发的全部 token；记录保留到这些 token 全部过期为止
+        """
+        now = time.time()
+        if self.shared_store is not None:
+            self.shared_store.add_user(user_id, now, now + lifetime)
+        with self._lock:
+            self._user_cutoffs[user_id] = (now, now + lifetime)
+        self.save()
+
+    def is_revoked(self, user_id: str, jti: str, issued_at: float, expire_at: float) -> bool:
+        self._sync_if_due()
+        with self._lock:
+            cutoff = self._user_cutoffs.get(user_id)
+            if cutoff is not None and issued_at <= cutoff[0]:
+                return True
+            return jti in self._buckets.get(self._bucket(expire_at), ())
+
+    def _sync_if_due(self):
+        if self.shared_store is None:
+            return
+        if self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        with self._sync_lock:
+            if self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_seconds:
+                self.sync()
+
+    def sync(self):
+        """
+        从共享表重建内存中的吊销记录；读取失败时保留现有记录，sync_seconds 后重试
+        """
+        try:
+            tokens, users = self.shared_store.fetch(time.time())
+        except Exception as e:
+            logging.error(f"[ERROR] Failed to sync revocation list: {str(e)}")
+        else:
+            buckets = {}
+            for jti, expire_at in tokens:
+                buckets.setdefault(self._bucket(expire_at), set()).add(jti)
+            with self._lock:
+                self._buckets = buckets
+                self._user_cutoffs = users
+        self._synced_at = time.monotonic()
+
+    def purge(self):
+        now = time.time()
+        current = self._bucket(now)
+        with self._lock:
+            for bucket_id in [b for b in self._buckets if b < current]:
+                del self._buckets[bucket_id]
+            for user_id in [u for u, (_, expire_at) in self._user_cutoffs.items() if expire_at <= now]:
+                del self._user_cutoffs[user_id]
+        if self.shared_store is not None:
+            try:
+                self.shared_store.purge(now)
+            except Exception as e:
+                logging.error(f"[ERROR] Failed to purge shared revocations: {str(e)}")
+
+    def save(self):
+        """
+        在持有锁的情况下写入快照：每次写入使用唯一的临时文件再原子替换，
+        并发吊销（多线程或多 worker）不会共用临时文件，文件中总是某一次完整的快照
+        """
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "buckets": {str(b): sorted(jtis) for b, jtis in self._buckets.items()},
+                "users": {u: list(cutoff) for u, cutoff in self._user_cutoffs.items()},
+            }
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(self.path) or ".",
+                                                 prefix=os.path.basename(self.path) + ".",
+                                                 suffix=".tmp", delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.error(f"[ERROR] Failed to persist revocation list: {str(e)}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def load(self):
+        """
+        启动时加载吊销表（共享表模式下立即同步）；文件损坏时吊销记录无法恢复，已吊销的 token 会重新生效，必须告警
+        """
+        if self.shared_store is not None:
+            self.sync()
+            return
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            buckets = {int(b): set(jtis) for b, jtis in data.get("buckets", {}).items()}
+            user_cutoffs = {u: tuple(cutoff) for u, cutoff in data.get("users", {}).items()}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logging.critical(f"[CRITICAL] Revocation list {self.path} is unreadable, "
+                             f"revoked tokens may be accepted again: {str(e)}")
+            return
+        with self._lock:
+            self._buckets = buckets
+            self._user_cutoffs = user_cutoffs
+        self.purge()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(jtis) for jtis in self._buckets.values()) + len(self._user_cutoffs)
+
+
+def encode_stateless(user_id: str, terminal: str, lifetime: float) -> str:
+    now = time.time()
+    payload = {
+        "user_id": user_id,
+        "terminal": terminal,
+        "iat": now,
+        "exp": now + lifetime,
+        "jti": uuid.uuid4().hex,
+    }
+    return jwt.encode(payload, key=token_secret(), algorithm="HS256")
+
+
+def decode_stateless(token: str, user_id: str) -> dict:
+    """
+    校验无状态 token：签名、过期时间、所属用户与吊销表，全部通过时返回 payload，否则返回 None
+    """
+    try:
+        payload = jwt.decode(token, key=token_secret(), algorithms=["HS256"], options={"require": ["exp", "jti"]})
+    except jwt.exceptions.PyJWTError:
+        return None
+    if payload.get("user_id") != user_id:
+        return None
+    if revocation_list.is_revoked(user_id, payload["jti"], payload.get("iat", 0), payload["exp"]):
+        return None
+    return payload
+
+
+def build_revocation_list() -> RevocationList:
+    """
+    默认使用共享的 token_revocations 表；BOOKSTORE_REVOCATION_STORE=file 时改用本地文件（仅限单进程部署），
+    BOOKSTORE_REVOCATION_FILE 指定文件路径
+    """
+    if os.getenv("BOOKSTORE_REVOCATION_STORE", "mysql") == "file":
+        return RevocationList(os.getenv("BOOKSTORE_REVOCATION_FILE", DEFAULT_REVOCATION_FILE))
+    return RevocationList(
+        shared_store=MySQLRevocationStore(),
+        sync_seconds=_resolve_env_number("BOOKSTORE_REVOCATION_SYNC_SECONDS", REVOCATION_SYNC_SECONDS, float),
+    )
+
+
+# 全局实例（进程内共享）
+revocation_list = build_revocation_list()
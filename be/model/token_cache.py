@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from be.model.recommend_cache import _resolve_env_number
+
+TOKEN_INVALIDATE_CHANNEL = "token_invalidate"
+
+
+class LocalBroker:
+    """
+    进程内的发布/订阅替身：接口与 Redis 等消息中间件的 publish/subscribe 一致，
+    多个 worker 部署时替换为真实中间件即可把失效消息广播到所有进程。
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # channel -> [callback]
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def unsubscribe(self, channel: str, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, channel: str, message: dict):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, []))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                logging.error(f"[ERROR] Subscriber on {channel} failed: {str(e)}")
+
+
+class TokenCache:
+    """
+    Token 校验结果缓存：按 (user_id, token) 缓存已通过校验的 token 及其过期时间（JWT timestamp + 有效期）。
+    - 过期的条目在读取时剔除，容量超出时按 LRU 淘汰；
+    - 登录、登出、修改密码、注销时按用户整体失效，并通过 broker 通知其他 worker 同步失效。
+    """
+
+    def __init__(self, max_entries: int = 100000, broker: LocalBroker = None,
+                 channel: str = TOKEN_INVALIDATE_CHANNEL):
+        self.max_entries = max_entries
+        self.broker = broker
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex
+        self._entries = OrderedDict()  # (user_id, token) -> expire_at
+        self._user_keys = {}  # user_id -> set(key)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if broker is not None:
+            broker.subscribe(channel, self._on_message)
+
+    def _remove_key(self, key):
+        self._entries.pop(key, None)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def is_valid(self, user_id: str, token: str) -> bool:
+        key = (user_id, token)
+        with self._lock:
+            expire_at = self._entries.get(key)
+            if expire_at is None:
+                self.misses += 1
+                return False
+            if expire_at <= time.time():
+                self._remove_key(key)
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def put(self, user_id: str, token: str, expire_at: float):
+        if self.max_entries <= 0 or expire_at <= time.time():
+            return
+        key = (user_id, token)
+        with self._lock:
+            self._entries[key] = expire_at
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._remove_key(oldest)
+
+    def _invalidate_local(self, user_id: str):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove_key(key)
+
+    def invalidate_user(self, user_id: str):
+        self._invalidate_local(user_id)
+        if self.broker is not None:
+            self.broker.publish(self.channel, {"user_id": user_id, "origin": self.node_id})
+
+    def _on_message(self, message: dict):
+        if message.get("origin") == self.node_id:
+            return
+        self._invalidate_local(message["user_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# 全局实例（进程内共享）
+token_broker = LocalBroker()
+token_cache = TokenCache(
+    max_entries=_resolve_env_number("BOOKSTORE_TOKEN_CACHE_SIZE", 100000, int),
+    broker=token_broker,
+)
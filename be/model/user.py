@@ -4,12 +4,24 @@ import logging
 import sqlalchemy as sa
 from be.model import error
 from be.model import db_conn
+from be.model import store
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql import text
+from be.model.recommend_cache import recommend_cache
+from be.model import recommender
+from be.model.bestseller import bestseller_books
+from be.model.minhash import minhash_index
+from be.model.token_cache import token_cache
+from be.model import token_auth
+from be.model.credentials import credential_service
 import jieba
 import logging
 
 MAX_REGEX_CANDIDATES = 200
+RECOMMEND_BATCH_CHUNK = 500  # 批量推荐时每次查询书籍详情的用户数
+SESSION_PURGE_BATCH = 1000  # 每次删除的过期会话行数，避免长时间持有锁
+REGISTER_BATCH_CHUNK = 1000  # 批量注册时每条多行 INSERT 的行数
+REGISTER_BATCH_MAX = 10000  # 单次批量注册请求的最大用户数
 # 配置日志记录器
 logging.basicConfig(level=logging.INFO)  # 设置最低日志级别为 INFO
 logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)  # 启用 SQL 语句日志
@@ -30,24 +42,27 @@ def jwt_decode(encoded_token, user_id: str) -> str:
 
 
 class User(db_conn.DBConn):
-    token_lifetime: int = 3600  # Token 有效期（秒）
+    token_lifetime: int = store.SESSION_LIFETIME_SECONDS  # Token 有效期（秒）
 
     def __init__(self):
         db_conn.DBConn.__init__(self)
 
-    def __check_token(self, user_id, db_token, token) -> bool:
+    def __check_token(self, user_id, db_token, token) -> float:
+        """
+        校验 token，通过时返回其过期时间（秒级时间戳），否则返回 None
+        """
         try:
             if db_token != token:
-                return False
+                return None
             jwt_text = jwt_decode(encoded_token=token, user_id=user_id)
             ts = jwt_text["timestamp"]
             if ts is not None:
                 now = time.time()
                 if self.token_lifetime > now - ts >= 0:
-                    return True
+                    return ts + self.token_lifetime
         except jwt.exceptions.InvalidSignatureError as e:# pragma: no cover
             logging.error(str(e))
-            return False
+            return None
 
 
     # def register(self, user_id: str, password: str) -> tuple:
@@ -83,24 +98,23 @@ class User(db_conn.DBConn):
         :return: 返回元组 (状态码, 消息)
         """
         try:
-            # 生成用户的 terminal 和 token（事务外）
-            terminal = f"terminal_{time.time()}"
-            token = jwt_encode(user_id, terminal)
-            logging.info(f"[INFO] Registering user_id: {user_id}, terminal: {terminal}")
+            logging.info(f"[INFO] Registering user_id: {user_id}")
+            # 密码哈希在凭证线程池中计算（事务外）
+            password_hash = credential_service.hash(password)
+            if password_hash is None:
+                return 503, "Credential service is busy"
 
-            # 插入用户信息到数据库（事务内）
+            # 插入用户信息到数据库（事务内）；登录会话在 login 时写入 user_sessions
             with self.conn.connect() as connection:
                 trans = connection.begin()
                 try:
                     query = sa.text("""
-                        INSERT INTO users (user_id, password, token, terminal) 
-                        VALUES (:user_id, :password, :token, :terminal)
+                        INSERT INTO users (user_id, password) 
+                        VALUES (:user_id, :password)
                     """)
                     connection.execute(query, {
                         "user_id": user_id,
-                        "password": password,
-                        "token": token,
-                        "terminal": terminal
+                        "password": password_hash,
                     })
                     trans.commit()
                     logging.info(f"[INFO] User {user_id} registered successfully.")
@@ -125,51 +139,169 @@ class User(db_conn.DBConn):
 
 
 
+    def register_batch(self, users: list) -> tuple:
+        """
+        批量注册：按 REGISTER_BATCH_CHUNK 分块，每块一条多行 INSERT IGNORE，单独提交。
+        已存在或请求内重复的 user_id 记入 conflicts，不影响同一批中的其他用户。
+        :param users: [{"user_id": ..., "password": ...}]
+        :return: (状态码, 消息, {"registered": 数量, "conflicts": [user_id], "invalid": [下标]})
+        """
+        result = {"registered": 0, "conflicts": [], "invalid": []}
+        if not isinstance(users, list):
+            return 400, "users must be a list", result
+        if len(users) > REGISTER_BATCH_MAX:
+            return 400, f"Too many users, at most {REGISTER_BATCH_MAX} per request", result
+
+        pending = {}  # user_id -> password，保持请求中的顺序
+        for index, entry in enumerate(users):
+            user_id = entry.get("user_id") if isinstance(entry, dict) else None
+            password = entry.get("password") if isinstance(entry, dict) else None
+            if not isinstance(user_id, str) or not user_id or not isinstance(password, str):
+                result["invalid"].append(index)
+            elif user_id in pending:
+                result["conflicts"].append(user_id)
+            else:
+                pending[user_id] = password
+
+        items = list(pending.items())
+        try:
+            for start in range(0, len(items), REGISTER_BATCH_CHUNK):
+                chunk = items[start:start + REGISTER_BATCH_CHUNK]
+                hashes = credential_service.hash_many([password for _, password in chunk])
+                if hashes is None:
+                    return 503, "Credential service is busy", result
+                params = {}
+                values = []
+                for i, ((user_id, _), password_hash) in enumerate(zip(chunk, hashes)):
+                    params[f"user_id_{i}"] = user_id
+                    params[f"password_{i}"] = password_hash
+                    values.append(f"(:user_id_{i}, :password_{i})")
+                insert = sa.text(f"INSERT IGNORE INTO users (user_id, password) VALUES {', '.join(values)}")
+                # 哈希带随机盐，存储的哈希与本次生成的一致即为本次插入，否则是已存在的用户
+                query_inserted = sa.text(
+                    "SELECT user_id, password FROM users WHERE user_id IN :user_ids"
+                ).bindparams(sa.bindparam("user_ids", expanding=True))
+                with self.conn.connect() as connection:
+                    connection.execute(insert, params)
+                    rows = connection.execute(query_inserted, {"user_ids": [user_id for user_id, _ in chunk]}).fetchall()
+                    connection.commit()
+                stored = {row[0]: row[1] for row in rows}
+                for (user_id, _), password_hash in zip(chunk, hashes):
+                    if stored.get(user_id) == password_hash:
+                        result["registered"] += 1
+                    else:
+                        result["conflicts"].append(user_id)
+                logging.info(f"[INFO] Batch registration progress: {start + len(chunk)}/{len(items)}")
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] SQLAlchemy error during batch registration: {str(e)}")
+            return 528, f"Database error: {str(e)}", result
+        return 200, "ok", result
+
     def check_token(self, user_id: str, token: str) -> tuple:
-        query = sa.text("SELECT token FROM users WHERE user_id = :user_id")
+        # 无状态模式：只校验签名、过期时间与吊销表，不访问数据库
+        if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+            if token_auth.decode_stateless(token, user_id) is None:
+                return 401, "authorization fail"
+            return 200, "ok"
+        # 已校验且未过期的 token 直接通过，不再查库和解码
+        if token_cache.is_valid(user_id, token):
+            return 200, "ok"
+        # token 中携带 terminal，按 (user_id, terminal) 定位会话；签名不匹配说明 token 不属于该用户
+        try:
+            terminal = jwt_decode(encoded_token=token, user_id=user_id).get("terminal")
+        except jwt.exceptions.PyJWTError:
+            return 401, "authorization fail"
+        query = sa.text("""
+            SELECT token FROM user_sessions
+            WHERE user_id = :user_id AND terminal = :terminal AND expire_at > NOW()
+        """)
         try:
             with self.conn.connect() as connection:
-                result = connection.execute(query, {"user_id": user_id}).fetchone()
+                result = connection.execute(query, {"user_id": user_id, "terminal": terminal}).fetchone()
                 if not result:
-                    return 401, "authorization fail"  # 用户不存在
+                    return 401, "authorization fail"  # 会话不存在或已过期
                 db_token = result[0]  # 从数据库中获取 token
-                if not self.__check_token(user_id, db_token, token):  # 使用 __check_token 进行全面验证
+                expire_at = self.__check_token(user_id, db_token, token)  # 使用 __check_token 进行全面验证
+                if not expire_at:
                     return 401, "authorization fail"
         except sa.exc.SQLAlchemyError as e: 
             return 528, str(e)
+        token_cache.put(user_id, token, expire_at)
         return 200, "ok"
 
 
 
-    def check_password(self, user_id: str, password: str) -> tuple:
+    def _verify_password(self, user_id: str, password: str) -> tuple:
+        """
+        查询存储的密码哈希并交给凭证服务校验，返回 (状态码, 消息, 存储的哈希)
+        """
         try:
             query = sa.text("SELECT password FROM users WHERE user_id = :user_id")
             with self.conn.connect() as connection:
                 result = connection.execute(query, {"user_id": user_id}).fetchone()
-                print(f"[DEBUG] Fetched password from DB: {result}")
-                if not result or result[0] != password:
-                    print(f"[DEBUG] Password mismatch for user_id: {user_id}")
-                    return error.error_authorization_fail()
-            return 200, "ok"
         except sa.exc.SQLAlchemyError as e: 
             print(f"[ERROR] Database error in check_password: {str(e)}")
-            return 528, str(e)
+            return 528, str(e), None
+        if not result:
+            return (*error.error_authorization_fail(), None)
+        code, message = credential_service.verify(user_id, password, result[0])
+        if code == 401:
+            print(f"[DEBUG] Password mismatch for user_id: {user_id}")
+            return (*error.error_authorization_fail(), None)
+        return code, message, result[0]
+
+    def check_password(self, user_id: str, password: str) -> tuple:
+        code, message, _ = self._verify_password(user_id, password)
+        return code, message
+
+    def _rehash_password(self, connection, user_id: str, password: str, stored: str):
+        """
+        登录时的惰性迁移：明文或旧参数的哈希在登录成功后重新哈希；
+        以旧值为条件更新，避免覆盖并发修改的密码；凭证线程池繁忙时跳过，下次登录再迁移
+        """
+        if not credential_service.needs_rehash(stored):
+            return
+        password_hash = credential_service.hash(password)
+        if password_hash is None:
+            return
+        connection.execute(
+            sa.text("UPDATE users SET password = :new_password WHERE user_id = :user_id AND password = :old_password"),
+            {"new_password": password_hash, "user_id": user_id, "old_password": stored},
+        )
 
 
     def login(self, user_id: str, password: str, terminal: str) -> tuple:
         try:
-            code, message = self.check_password(user_id, password)
+            code, message, stored = self._verify_password(user_id, password)
             if code != 200:
                 return code, message, None  # 保持返回值一致
             
-            # 生成 token
+            # 无状态模式：签发带过期时间的 token，不写会话表，同一用户可在多个终端同时登录；
+            # 惰性迁移与认证模式无关，需要重新哈希时先更新密码再签发 token
+            if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+                if credential_service.needs_rehash(stored):
+                    with self.conn.connect() as connection:
+                        self._rehash_password(connection, user_id, password, stored)
+                        connection.commit()
+                return 200, "OK", token_auth.encode_stateless(user_id, terminal, self.token_lifetime)
+
+            # 生成 token，写入 (user_id, terminal) 会话；同一终端重复登录时覆盖旧 token，不写 users 行
             token = jwt_encode(user_id, terminal)
-            query = sa.text("UPDATE users SET token = :token, terminal = :terminal WHERE user_id = :user_id")
+            query = sa.text("""
+                INSERT INTO user_sessions (user_id, terminal, token, expire_at)
+                VALUES (:user_id, :terminal, :token, DATE_ADD(NOW(), INTERVAL :lifetime SECOND))
+                ON DUPLICATE KEY UPDATE token = VALUES(token), expire_at = VALUES(expire_at)
+            """)
             with self.conn.connect() as connection:
-                result = connection.execute(query, {"token": token, "terminal": terminal, "user_id": user_id})
+                self._rehash_password(connection, user_id, password, stored)
+                connection.execute(query, {
+                    "user_id": user_id,
+                    "terminal": terminal,
+                    "token": token,
+                    "lifetime": self.token_lifetime,
+                })
                 connection.commit()
-                # if result.rowcount == 0:
-                #     return 401, "Authorization failed", None  # 更新失败
+            token_cache.invalidate_user(user_id)  # 同一终端的旧 token 不再有效
 
         except Exception as e: 
             return 528, f"Server error: {str(e)}", None
@@ -180,19 +312,33 @@ class User(db_conn.DBConn):
 
     def logout(self, user_id: str, token: str) -> tuple:
         logging.debug(f"[DEBUG] Logout attempt for user_id: {user_id} with token: {token}")
+        if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+            payload = token_auth.decode_stateless(token, user_id)
+            if payload is None:
+                return 401, "authorization fail"
+            try:
+                token_auth.revocation_list.revoke(payload["jti"], payload["exp"])
+            except sa.exc.SQLAlchemyError as e:
+                logging.error(f"[ERROR] Failed to revoke token during logout: {str(e)}")
+                return 528, str(e)
+            return 200, "ok"
+
         code, message = self.check_token(user_id, token)
         if code != 200:
             logging.debug(f"[DEBUG] Token check failed for user_id: {user_id}, code: {code}, message: {message}")
             return code, message
 
-        query = sa.text("UPDATE users SET token = NULL, terminal = NULL WHERE user_id = :user_id")
+        # 只结束当前终端的会话，其他终端保持登录
+        terminal = jwt_decode(encoded_token=token, user_id=user_id).get("terminal")
+        query = sa.text("DELETE FROM user_sessions WHERE user_id = :user_id AND terminal = :terminal")
         try:
             with self.conn.connect() as connection:
-                result = connection.execute(query, {"user_id": user_id})
+                result = connection.execute(query, {"user_id": user_id, "terminal": terminal})
                 connection.commit()  # 显式提交事务
-                logging.debug(f"[DEBUG] Logout DB update result: {result.rowcount} rows affected")
-                if result.rowcount == 0:
-                    return 401, "authorization fail"  # 更新失败
+                logging.debug(f"[DEBUG] Logout session delete result: {result.rowcount} rows affected")
+            token_cache.invalidate_user(user_id)
+            if result.rowcount == 0:
+                return 401, "authorization fail"  # 更新失败
         except sa.exc.SQLAlchemyError as e: 
             logging.error(f"[ERROR] SQLAlchemy error during logout: {str(e)}")
             return 528, str(e)
@@ -215,6 +361,14 @@ class User(db_conn.DBConn):
                 if result.rowcount == 0:
                     print(f"[ERROR] Authorization failed for user_id: {user_id}")
                     return error.error_authorization_fail()
+                connection.execute(sa.text("DELETE FROM user_sessions WHERE user_id = :user_id"), {"user_id": user_id})
+                connection.commit()
+            token_cache.invalidate_user(user_id)
+            credential_service.invalidate_user(user_id)
+            if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+                token_auth.revocation_list.revoke_user(user_id, self.token_lifetime)
+            recommend_cache.invalidate_user(user_id)
+            minhash_index.remove_user(user_id)
         except sa.exc.SQLAlchemyError as e: 
             # 打印数据库异常
             print(f"[ERROR] Database error during unregister: {str(e)}")
@@ -229,17 +383,21 @@ class User(db_conn.DBConn):
             if code != 200:
                 return code, message
 
-            # 更新密码和 token
-            terminal = f"terminal_{time.time()}"
-            token = jwt_encode(user_id, terminal)
-            query = sa.text(
-                "UPDATE users SET password = :new_password, token = :token, terminal = :terminal WHERE user_id = :user_id"
-            )
+            password_hash = credential_service.hash(new_password)
+            if password_hash is None:
+                return 503, "Credential service is busy"
+
+            # 更新密码，并结束该用户在所有终端上的会话
+            query = sa.text("UPDATE users SET password = :new_password WHERE user_id = :user_id")
             with self.conn.connect() as connection:
-                result = connection.execute(
-                    query, {"new_password": new_password, "token": token, "terminal": terminal, "user_id": user_id}
-                )
+                connection.execute(query, {"new_password": password_hash, "user_id": user_id})
+                connection.execute(sa.text("DELETE FROM user_sessions WHERE user_id = :user_id"), {"user_id": user_id})
                 connection.commit()  # 显式提交事务
+            token_cache.invalidate_user(user_id)
+            credential_service.invalidate_user(user_id)
+            # 无状态 token 不经过 users.token 比对，需要吊销修改密码前签发的全部 token
+            if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+                token_auth.revocation_list.revoke_user(user_id, self.token_lifetime)
 
 
         except sa.exc.SQLAlchemyError as e: 
@@ -247,107 +405,143 @@ class User(db_conn.DBConn):
 
         return 200, "Password changed successfully"
 
-    def recommend_books(self, buyer_id: str, n_recommendations: int = 5) -> tuple:
+    def purge_expired_sessions(self, batch_size: int = SESSION_PURGE_BATCH) -> tuple:
         """
-        推荐书籍功能的 MySQL 实现
+        分批删除过期会话（走 expire_at 索引），每批单独提交，返回 (状态码, 消息, 删除行数)
         """
+        total = 0
+        query = sa.text("DELETE FROM user_sessions WHERE expire_at <= NOW() LIMIT :batch_size")
         try:
             with self.conn.connect() as connection:
-                # 获取用户历史订单ID
-                query_orders = sa.text("SELECT order_id FROM history_order WHERE user_id = :buyer_id")
-                orders = connection.execute(query_orders, {"buyer_id": buyer_id}).fetchall()
-                print(f"[DEBUG] Orders fetched: {orders}")
-                
-                # 如果 orders 是元组列表，使用索引访问 order_id
-                order_ids = [order[0] for order in orders]  # 访问元组的第一个元素
-                
-
-                # 获取用户已购买的书籍ID
-                query_user_books = sa.text("""
-                    SELECT DISTINCT book_id 
-                    FROM history_order_detail 
-                    WHERE order_id IN :order_ids
-                """)
-                user_books = connection.execute(
-                    query_user_books, {"order_ids": tuple(order_ids)}
-                ).fetchall()
-                user_books = {book[0] for book in user_books}  # 同样通过索引访问
-                
-                print(f"[DEBUG] User books fetched: {user_books}")
-
+                while True:
+                    result = connection.execute(query, {"batch_size": batch_size})
+                    connection.commit()
+                    total += result.rowcount
+                    if result.rowcount < batch_size:
+                        break
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] SQLAlchemy error during session purge: {str(e)}")
+            return 528, str(e), total
+        return 200, "ok", total
+
+    def recommend_books(self, buyer_id: str, n_recommendations: int = 5, engine: str = None) -> tuple:
+        """
+        推荐书籍功能，默认使用共现推荐引擎，engine 可指定其他已注册的推荐引擎
+        :return: 成功时为 (200, 书籍列表)，失败时为 (状态码, 错误信息)
+        """
+        code, message, books = recommender.recommend(
+            self.conn, buyer_id, n_recommendations, name=engine, default="cooccurrence", endpoint="auth"
+        )
+        if code != 200:
+            return code, message
+        return 200, books
 
+    def recommend_books_batch(self, buyer_ids: list, n_recommendations: int = 5) -> tuple:
+        """
+        批量推荐，与 recommend_books 使用同一个引擎（按 /auth 接口选择，见 recommender.get_recommender）：
+        - 共现引擎：一次扫描历史订单（不含已取消订单）得到 用户 × 书籍 的购买矩阵，在内存中为所有用户计算，
+          没有历史订单的用户与 recommend_books 一致以畅销榜兜底；
+        - 其他引擎：逐个用户经推荐缓存调用该引擎，单个用户失败时返回空列表。
+        buyer_ids 在开始流式输出前校验，必须全部为非空字符串。
+        :return: (状态码, 消息, 生成器)，生成器按 RECOMMEND_BATCH_CHUNK 分块逐个产出 (buyer_id, books)
+        """
+        if not isinstance(buyer_ids, list) or not all(isinstance(b, str) and b for b in buyer_ids):
+            return 400, "buyer_ids must be a list of non-empty strings", iter(())
+        try:
+            engine = recommender.get_recommender(default="cooccurrence", endpoint="auth")
+        except KeyError as e:
+            return 400, f"Unknown recommender engine {e.args[0]}", iter(())
+        if engine.name != recommender.CooccurrenceRecommender.name:
+            return 200, "ok", self._recommend_each(engine.name, buyer_ids, n_recommendations)
 
-                # 获取与用户购买过的书籍相关的其他用户ID
-                query_related_users = sa.text("""
-                    SELECT DISTINCT h.user_id 
+        try:
+            user_book_counts = {}  # user_id -> {book_id: 出现次数}
+            book_users = {}  # book_id -> {user_id}
+            with self.conn.connect() as connection:
+                query_matrix = sa.text("""
+                    SELECT h.user_id, hod.book_id, COUNT(*) AS frequency
                     FROM history_order h
                     JOIN history_order_detail hod ON h.order_id = hod.order_id
-                    WHERE hod.book_id IN :user_books AND h.user_id != :buyer_id
-                """)
-                related_users = connection.execute(
-                    query_related_users, {"user_books": tuple(user_books), "buyer_id": buyer_id}
-                ).fetchall()
-                related_users = {user[0] for user in related_users}  # 通过索引访问
-                
-                print(f"[DEBUG] Related users fetched: {related_users}")
-
- 
-                # 获取这些用户购买的其他书籍
-                query_other_books = sa.text("""
-                    SELECT hod.book_id, COUNT(*) AS frequency
-                    FROM history_order_detail hod
-                    JOIN history_order h ON hod.order_id = h.order_id
-                    WHERE hod.book_id NOT IN :user_books
-                    AND h.user_id IN :related_users
-                    GROUP BY hod.book_id
-                    ORDER BY frequency DESC
-                    LIMIT :n_recommendations
+                    WHERE h.status <> 3
+                    GROUP BY h.user_id, hod.book_id
                 """)
-                print(f"[DEBUG] Number of recommendations requested: {n_recommendations}")
-                recommended_books = connection.execute(
-                    query_other_books,
-                    {
-                        "user_books": tuple(user_books),
-                        "related_users": tuple(related_users),
-                        "n_recommendations": n_recommendations,
-                    },
-                ).fetchall()
-                book_ids = [book[0] for book in recommended_books]  # 通过索引访问
-                
-                print(f"[DEBUG] Recommended books fetched: {book_ids}")
-
-
-                # 获取推荐书籍的详细信息
-                query_book_details = sa.text("""
-                    SELECT book_id, title, author, publisher, price
-                    FROM new_books
-                    WHERE book_id IN :book_ids
-                """)
-                book_details = connection.execute(query_book_details, {"book_ids": tuple(book_ids)}).fetchall()
-
-# 检查 book_details 是否为 Row 类型或元组类型
-                print(f"[DEBUG] Raw book details fetched: {book_details}")
-
-                books_info = [
-                    {
-                        "book_id": book[0],       # 使用索引 0 访问 book_id
-                        "title": book[1],         # 使用索引 1 访问 title
-                        "author": book[2],        # 使用索引 2 访问 author
-                        "publisher": book[3],     # 使用索引 3 访问 publisher
-                        "price": book[4],         # 使用索引 4 访问 price
-                    }
-                    for book in book_details
-                ]
-
-                print(f"[DEBUG] Book details fetched: {books_info}")
-                return 200, books_info
+                for user_id, book_id, frequency in connection.execute(query_matrix).fetchall():
+                    user_book_counts.setdefault(user_id, {})[book_id] = frequency
+                    book_users.setdefault(book_id, set()).add(user_id)
+            logging.info(f"[INFO] Purchase matrix loaded: {len(user_book_counts)} users, {len(book_users)} books")
+        except sa.exc.SQLAlchemyError as e:
+            logging.error(f"[ERROR] SQLAlchemy error in recommend_books_batch: {str(e)}")
+            return 528, f"Database error: {str(e)}", iter(())
+
+        fallback = []  # 畅销榜兜底，首次遇到没有历史订单的用户时查询一次
+
+        def cold_start_books():
+            if not fallback:
+                with self.conn.connect() as connection:
+                    fallback.append(bestseller_books(connection, n_recommendations))
+            return fallback[0]
+
+        def generate():
+            for start in range(0, len(buyer_ids), RECOMMEND_BATCH_CHUNK):
+                chunk = buyer_ids[start:start + RECOMMEND_BATCH_CHUNK]
+                ranked = {
+                    buyer_id: self._rank_cooccurrence(user_book_counts, book_users, buyer_id, n_recommendations)
+                    for buyer_id in chunk
+                }
+                book_ids = {book_id for book_list in ranked.values() for book_id in book_list}
+                details = {}
+                if book_ids:
+                    query_book_details = sa.text("""
+                        SELECT book_id, title, author, publisher, price
+                        FROM new_books
+                        WHERE book_id IN :book_ids
+                    """).bindparams(sa.bindparam("book_ids", expanding=True))
+                    with self.conn.connect() as connection:
+                        rows = connection.execute(query_book_details, {"book_ids": list(book_ids)}).fetchall()
+                    for book in rows:
+                        details[book[0]] = {
+                            "book_id": book[0],
+                            "title": book[1],
+                            "author": book[2],
+                            "publisher": book[3],
+                            "price": book[4],
+                        }
+                for buyer_id in chunk:
+                    if buyer_id not in user_book_counts:
+                        yield buyer_id, cold_start_books()
+                    else:
+                        yield buyer_id, [details[book_id] for book_id in ranked[buyer_id] if book_id in details]
+
+        return 200, "ok", generate()
+
+    def _recommend_each(self, engine: str, buyer_ids: list, n_recommendations: int):
+        for buyer_id in buyer_ids:
+            code, message, books = recommender.recommend(self.conn, buyer_id, n_recommendations, name=engine)
+            if code != 200:
+                logging.error(f"[ERROR] Batch recommendation failed for {buyer_id}: {message}")
+                books = []
+            yield buyer_id, books
 
-        except sa.exc.SQLAlchemyError as e: 
-            logging.error(f"[ERROR] SQLAlchemy error in recommend_books: {str(e)}")
-            return 528, f"Database error: {str(e)}"
-        except Exception as e: 
-            logging.error(f"[ERROR] Unexpected error in recommend_books: {str(e)}")
-            return 538, f"Unexpected error: {str(e)}"
+    @staticmethod
+    def _rank_cooccurrence(user_book_counts: dict, book_users: dict, buyer_id: str, n_recommendations: int) -> list:
+        """
+        基于购买矩阵计算单个用户的共现推荐，返回按出现次数降序的 book_id 列表
+        """
+        user_books = user_book_counts.get(buyer_id)
+        if not user_books:
+            return []
+        related_users = set()
+        for book_id in user_books:
+            related_users.update(book_users.get(book_id, ()))
+        related_users.discard(buyer_id)
+
+        frequency = {}
+        for related_user in related_users:
+            for book_id, count in user_book_counts[related_user].items():
+                if book_id not in user_books:
+                    frequency[book_id] = frequency.get(book_id, 0) + count
+        ranked = sorted(frequency.items(), key=lambda item: (-item[1], item[0]))
+        return [book_id for book_id, _ in ranked[:n_recommendations]]
 
     def search_book(self, query_text: str, page: int = 1, page_size: int = 10, store_id: str = None) -> (int, str, dict):
         try:
@@ -374,7 +568,7 @@ class User(db_conn.DBConn):
                 # 查询 stores 表
                 if store_id:
                     # 检查商店是否存在
-                    query_store_check = sa.text("SELECT 1 FROM stores WHERE store_id = :store_id")
+                    query_store_check = sa.text("SELECT 1 FROM store WHERE store_id = :store_id")
                     store_exists = conn.execute(query_store_check, {"store_id": store_id}).fetchone()
                     if not store_exists:
                         return 513, "Store not found", {}
@@ -441,7 +635,7 @@ class User(db_conn.DBConn):
 
             with self.conn.connect() as conn:
                 if store_id:
-                    query_store_check = sa.text("SELECT 1 FROM stores WHERE store_id = :store_id")
+                    query_store_check = sa.text("SELECT 1 FROM store WHERE store_id = :store_id")
                     store_exists = conn.execute(query_store_check, {"store_id": store_id}).fetchone()
                     if not store_exists:
                         return 513, "店铺不存在", {}
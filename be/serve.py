@@ -1,8 +1,10 @@
 import logging
+import math
 import os
 from flask import Flask
 from flask import Blueprint
 from flask import request
+from flask import jsonify
 from be.view import auth
 from be.view import seller
 from be.view import buyer
@@ -12,6 +14,21 @@ from be.model.store import init_database, init_completed_event, resolve_db_url
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from be.model.times import time_exceed_delete
+from be.model.bestseller import bestseller_board
+from be.model.title_model import model_registry, title_profile
+from be.model.title_matcher import catalog_matcher
+from be.model import token_auth
+from be.model.user import User
+from be.model.rate_limit import rate_limiter
+from be.model.minhash import minhash_index
+from be.model.title_jobs import fail_stale_title_jobs
+
+BESTSELLER_REFRESH_SECONDS = 60  # 畅销榜从物化表重建内存的间隔
+MODEL_IDLE_CHECK_SECONDS = 60  # 检查并卸载空闲书名提取模型的间隔
+TITLE_MATCHER_REFRESH_SECONDS = 600  # 目录书名自动机重建间隔（合并新上架书籍）
+MINHASH_REFRESH_CHECK_SECONDS = 30  # 检查 MinHash 索引是否过期的间隔，过期时全量重建
+SESSION_PURGE_SECONDS = 300  # 分批清理过期登录会话的间隔
+RATE_LIMIT_PURGE_SECONDS = 300  # 清理空闲限流令牌桶的间隔
 
 bp_shutdown = Blueprint("shutdown", __name__)
 
@@ -22,13 +39,30 @@ def shutdown_server():
     func()
 
 
+def purge_expired_sessions():
+    code, message, deleted = User().purge_expired_sessions()
+    if code == 200 and deleted:
+        logging.info(f"[INFO] Purged {deleted} expired sessions")
+
+
+def admission_control():
+    """
+    请求前的限流检查：按客户端地址和 endpoint 类别取令牌，不足时直接返回 429。
+    请求体中的 user_id / buyer_id 未经认证、可任意伪造，不能作为限流键，否则轮换 id 即可绕过限流并无限制地新增令牌桶
+    """
+    wait = rate_limiter.check(request.endpoint, str(request.remote_addr))
+    if wait:
+        return jsonify({"message": "rate limit exceeded"}), 429, {"Retry-After": str(max(1, math.ceil(wait)))}
+    return None
+
+
 @bp_shutdown.route("/shutdown")
 def be_shutdown():
     shutdown_server()
     return "Server shutting down..."
 
 
-def be_run(auto_cancel=True):
+def be_run(auto_cancel=True, warm_up_model=None):
     this_path = os.path.dirname(__file__)
     parent_path = os.path.dirname(this_path)
     log_file = os.path.join(parent_path, "app.log")
@@ -48,10 +82,40 @@ def be_run(auto_cancel=True):
     app.register_blueprint(auth.bp_auth)
     app.register_blueprint(seller.bp_seller)
     app.register_blueprint(buyer.bp_buyer)
+    app.before_request(admission_control)
+    try:
+        bestseller_board.load()
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to load bestseller board: {str(e)}")
+    catalog_matcher.refresh()
+    try:
+        fail_stale_title_jobs()
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to recover interrupted title jobs: {str(e)}")
+    if token_auth.auth_mode() == token_auth.AUTH_MODE_STATELESS:
+        token_auth.revocation_list.load()
+
+    # 预加载书名提取模型：参数优先，其次环境变量 BOOKSTORE_TITLE_MODEL_WARMUP
+    if warm_up_model is None:
+        warm_up_model = os.getenv("BOOKSTORE_TITLE_MODEL_WARMUP", "").lower() in ("1", "true", "yes")
+    if warm_up_model:
+        try:
+            model_registry.warm_up(quantize=title_profile.quantize)
+        except Exception as e:
+            logging.error(f"[ERROR] Failed to warm up title model: {str(e)}")
+
+    # 定义调度器并添加任务
+    scheduler = BackgroundScheduler()
     if auto_cancel:
-        # 定义调度器并添加任务
-        scheduler = BackgroundScheduler()
         scheduler.add_job(time_exceed_delete, 'interval', seconds=1)
-        scheduler.start()
+    scheduler.add_job(bestseller_board.refresh, 'interval', seconds=BESTSELLER_REFRESH_SECONDS)
+    scheduler.add_job(catalog_matcher.refresh, 'interval', seconds=TITLE_MATCHER_REFRESH_SECONDS)
+    scheduler.add_job(minhash_index.refresh, 'interval', seconds=MINHASH_REFRESH_CHECK_SECONDS)
+    scheduler.add_job(token_auth.revocation_list.purge, 'interval', seconds=token_auth.REVOCATION_BUCKET_SECONDS)
+    scheduler.add_job(purge_expired_sessions, 'interval', seconds=SESSION_PURGE_SECONDS)
+    scheduler.add_job(rate_limiter.purge, 'interval', seconds=RATE_LIMIT_PURGE_SECONDS)
+    if model_registry.idle_seconds:
+        scheduler.add_job(model_registry.unload_idle, 'interval', seconds=MODEL_IDLE_CHECK_SECONDS)
+    scheduler.start()
     init_completed_event.set()
     app.run()
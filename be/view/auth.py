@@ -1,7 +1,12 @@
+import json
 from flask import Blueprint
 from flask import request
 from flask import jsonify
+from flask import Response
+from flask import stream_with_context
 from be.model import user
+from be.model.recommend_cache import recommend_cache
+from be.model.credentials import credential_service
 
 bp_auth = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -36,6 +41,14 @@ def register():
     return jsonify({"message": message}), code
 
 
+@bp_auth.route("/register_batch", methods=["POST"])
+def register_batch():
+    users = request.json.get("users", [])
+    u = user.User()
+    code, message, result = u.register_batch(users)
+    return jsonify({"message": message, **result}), code
+
+
 @bp_auth.route("/unregister", methods=["POST"])
 def unregister():
     user_id = request.json.get("user_id", "")
@@ -85,6 +98,7 @@ def search_book_regex():
 def recommend_books():
     buyer_id = request.args.get("buyer_id", "").strip()
     n_recommendations = request.args.get("n_recommendations", 5)  # 默认推荐5本书
+    engine = request.args.get("engine") or None
     if not buyer_id:
         return jsonify({"message": "User ID is required."}), 400
     try:
@@ -93,9 +107,43 @@ def recommend_books():
         return jsonify({"message": "Invalid number of recommendations."}), 400
     
     u = user.User()
-    code, books = u.recommend_books(buyer_id=buyer_id, n_recommendations=n_recommendations)
+    code, books = u.recommend_books(buyer_id=buyer_id, n_recommendations=n_recommendations, engine=engine)
 
     if code == 200:
         return jsonify({"message": "Recommendations fetched successfully", "books": books}), 200
     else:
-        return jsonify({"message": "Failed to fetch recommendations"}), code
\ No newline at end of file
+        return jsonify({"message": "Failed to fetch recommendations"}), code
+
+
+@bp_auth.route("/recommend_books_batch", methods=["POST"])
+def recommend_books_batch():
+    buyer_ids = request.json.get("buyer_ids", [])
+    n_recommendations = request.json.get("n_recommendations", 5)
+    if not isinstance(buyer_ids, list) or not buyer_ids:
+        return jsonify({"message": "buyer_ids must be a non-empty list."}), 400
+    try:
+        n_recommendations = int(n_recommendations)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid number of recommendations."}), 400
+
+    u = user.User()
+    code, message, results = u.recommend_books_batch(buyer_ids, n_recommendations)
+    if code != 200:
+        return jsonify({"message": message}), code
+
+    # 以 NDJSON 流式返回，每行一个用户的推荐结果
+    def stream():
+        for buyer_id, books in results:
+            yield json.dumps({"buyer_id": buyer_id, "books": books}, ensure_ascii=False, default=str) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson"), 200
+
+
+@bp_auth.route("/recommend_cache_stats", methods=["GET"])
+def recommend_cache_stats():
+    return jsonify({"message": "ok", "stats": recommend_cache.stats()}), 200
+
+
+@bp_auth.route("/credential_stats", methods=["GET"])
+def credential_stats():
+    return jsonify({"message": "ok", "stats": credential_service.stats()}), 200
@@ -2,6 +2,7 @@ from flask import Blueprint
 from flask import request
 from flask import jsonify
 from be.model.buyer import Buyer
+from be.model.title_model import DEFAULT_TITLE_MODEL
 
 bp_buyer = Blueprint("buyer", __name__, url_prefix="/buyer")
 
@@ -79,6 +80,51 @@ def auto_cancel():
 def recommend_books_one():
     user_id: str = request.json.get("user_id")
     count: str = request.json.get("count")
+    engine: str = request.json.get("engine")
     b = Buyer()
-    code, message, recommended_books = b.recommend_books_one(user_id, count)
+    code, message, recommended_books = b.recommend_books_one(user_id, count, engine)
     return jsonify({"message": message, "recommended_books_one": recommended_books}), code
+
+
+@bp_buyer.route("/bestsellers", methods=["GET"])
+def bestsellers():
+    store_id = request.args.get("store_id") or None
+    window = request.args.get("window", "7d")
+    try:
+        count = int(request.args.get("count", 10))
+    except ValueError:
+        return jsonify({"message": "Invalid count.", "books": []}), 400
+    b = Buyer()
+    code, message, books = b.bestsellers(store_id, window, count)
+    return jsonify({"message": message, "books": books}), code
+
+
+@bp_buyer.route("/extract_title", methods=["POST"])
+def extract_title():
+    txt: str = request.json.get("text", "")
+    force_model: bool = bool(request.json.get("force_model", False))
+    b = Buyer()
+    result = b.generate_and_extract_titles(txt, DEFAULT_TITLE_MODEL, force_model)
+    code = result[0]
+    if code == 200:
+        return jsonify({"message": "ok", "titles": result[1]}), code
+    message = result[1] if len(result) == 3 else "Title extraction failed"
+    return jsonify({"message": message, "titles": []}), code
+
+
+@bp_buyer.route("/extract_title_job", methods=["POST"])
+def submit_title_job():
+    txt: str = request.json.get("text", "")
+    force_model: bool = bool(request.json.get("force_model", False))
+    b = Buyer()
+    code, message, job_id = b.submit_title_job(txt, DEFAULT_TITLE_MODEL, force_model)
+    return jsonify({"message": message, "job_id": job_id}), code
+
+
+@bp_buyer.route("/extract_title_job", methods=["GET"])
+def title_job_status():
+    job_id = request.args.get("job_id", "")
+    wait = request.args.get("wait", 0)
+    b = Buyer()
+    code, message, job = b.title_job_status(job_id, wait)
+    return jsonify({"message": message, "job": job}), code
@@ -2,6 +2,7 @@ from flask import Blueprint
 from flask import request
 from flask import jsonify
 from be.model import seller
+from datetime import datetime
 import json
 
 bp_seller = Blueprint("seller", __name__, url_prefix="/seller")
@@ -31,6 +32,19 @@ def seller_add_book():
     return jsonify({"message": message}), code
 
 
+@bp_seller.route("/add_books", methods=["POST"])
+def seller_add_books():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    books: list = request.json.get("books", [])
+    stock_level: int = request.json.get("stock_level", 0)
+
+    s = seller.Seller()
+    code, message, results = s.add_books(user_id, store_id, books, stock_level)
+
+    return jsonify({"message": message, "results": results}), code
+
+
 @bp_seller.route("/add_stock_level", methods=["POST"])
 def add_stock_level():
     user_id: str = request.json.get("user_id")
@@ -43,6 +57,17 @@ def add_stock_level():
 
     return jsonify({"message": message}), code
 
+@bp_seller.route("/add_stock_levels", methods=["POST"])
+def add_stock_levels():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    adjustments: list = request.json.get("adjustments", [])
+
+    s = seller.Seller()
+    code, message, results = s.add_stock_levels(user_id, store_id, adjustments)
+
+    return jsonify({"message": message, "results": results}), code
+
 @bp_seller.route("/delivery_order", methods=["POST"])
 def delivery_order():
     store_id: str = request.json.get("store_id")
@@ -51,4 +76,39 @@ def delivery_order():
     s = seller.Seller()
     code, message = s.delivery_order(store_id, order_id)
 
-    return jsonify({"message": message}), code
\ No newline at end of file
+    return jsonify({"message": message}), code
+
+
+@bp_seller.route("/delivery_orders", methods=["POST"])
+def delivery_orders():
+    store_id: str = request.json.get("store_id")
+    order_ids: list = request.json.get("order_ids", [])
+
+    s = seller.Seller()
+    code, message, results = s.delivery_orders(store_id, order_ids)
+
+    return jsonify({"message": message, "results": results}), code
+
+
+@bp_seller.route("/list_orders", methods=["GET"])
+def list_orders():
+    user_id = request.args.get("user_id")
+    store_id = request.args.get("store_id")
+    status = request.args.get("status")
+    start_time = request.args.get("start_time")
+    end_time = request.args.get("end_time")
+    try:
+        status = int(status) if status not in (None, "") else None
+        start_time = datetime.fromisoformat(start_time) if start_time else None
+        end_time = datetime.fromisoformat(end_time) if end_time else None
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"message": "Invalid status, time window or limit.", "orders": []}), 400
+    include_items = request.args.get("include_items", "").lower() in ("1", "true", "yes")
+    cursor = request.args.get("cursor") or None
+
+    s = seller.Seller()
+    code, message, result = s.list_orders(
+        user_id, store_id, status, start_time, end_time, limit, cursor, include_items
+    )
+    return jsonify({"message": message, **result}), code
@@ -1,4 +1,5 @@
 import requests
+import simplejson
 from urllib.parse import urljoin
 
 
@@ -18,6 +19,12 @@ class Auth:
         r = requests.post(url, json=json)
         return r.status_code
 
+    def register_batch(self, users: list) -> (int, dict):
+        json = {"users": [{"user_id": user_id, "password": password} for user_id, password in users]}
+        url = urljoin(self.url_prefix, "register_batch")
+        r = requests.post(url, json=json)
+        return r.status_code, r.json()
+
     def password(self, user_id: str, old_password: str, new_password: str) -> int:
         json = {
             "user_id": user_id,
@@ -41,13 +48,34 @@ class Auth:
         r = requests.post(url, json=json)
         return r.status_code
     
-    def recommend_books(self, buyer_id: str, n_recommendations: int = 5) -> (int, dict):
+    def recommend_books(self, buyer_id: str, n_recommendations: int = 5, engine: str = None) -> (int, dict):
         print(buyer_id)
         params = {"buyer_id": buyer_id, "n_recommendations": n_recommendations}
+        if engine is not None:
+            params["engine"] = engine
         url = urljoin(self.url_prefix, "recommend_books")
         r = requests.get(url, params=params)  # 使用 params 而不是 json
         return r.status_code, r.json()
     
+    def recommend_books_batch(self, buyer_ids: list, n_recommendations: int = 5) -> (int, list):
+        json = {"buyer_ids": buyer_ids, "n_recommendations": n_recommendations}
+        url = urljoin(self.url_prefix, "recommend_books_batch")
+        r = requests.post(url, json=json, stream=True)
+        if r.status_code != 200:
+            return r.status_code, []
+        results = [simplejson.loads(line) for line in r.iter_lines() if line]
+        return r.status_code, results
+
+    def recommend_cache_stats(self) -> (int, dict):
+        url = urljoin(self.url_prefix, "recommend_cache_stats")
+        r = requests.get(url)
+        return r.status_code, r.json().get("stats")
+
+    def credential_stats(self) -> (int, dict):
+        url = urljoin(self.url_prefix, "credential_stats")
+        r = requests.get(url)
+        return r.status_code, r.json().get("stats")
+
     def search_book(self, query_text: str, page: int = 1, page_size: int = 10, store_id: str = None):
         url = urljoin(self.url_prefix, "search_book")
         json = {
@@ -83,10 +83,39 @@ class Buyer:
         response_json = r.json()
         return r.status_code, response_json.get("message")
 
-    def get_recommendations_one(self, count: int):
+    def get_recommendations_one(self, count: int, engine: str = None):
         url = urljoin(self.url_prefix, "recommend_books_one")
         json = {"user_id": self.user_id, "count": count}
+        if engine is not None:
+            json["engine"] = engine
         headers = {"token": self.token}
         r = requests.get(url, headers=headers, json=json)
         response_json = r.json()
         return r.status_code, response_json.get("recommended_books_one")
+
+    def get_bestsellers(self, store_id: str = None, window: str = "7d", count: int = 10):
+        url = urljoin(self.url_prefix, "bestsellers")
+        params = {"window": window, "count": count}
+        if store_id is not None:
+            params["store_id"] = store_id
+        r = requests.get(url, params=params)
+        response_json = r.json()
+        return r.status_code, response_json.get("books")
+
+    def extract_title(self, text: str, force_model: bool = False):
+        url = urljoin(self.url_prefix, "extract_title")
+        r = requests.post(url, json={"text": text, "force_model": force_model})
+        response_json = r.json()
+        return r.status_code, response_json.get("titles")
+
+    def submit_title_job(self, text: str, force_model: bool = False):
+        url = urljoin(self.url_prefix, "extract_title_job")
+        r = requests.post(url, json={"text": text, "force_model": force_model})
+        response_json = r.json()
+        return r.status_code, response_json.get("job_id")
+
+    def get_title_job(self, job_id: str, wait: float = 0):
+        url = urljoin(self.url_prefix, "extract_title_job")
+        r = requests.get(url, params={"job_id": job_id, "wait": wait})
+        response_json = r.json()
+        return r.status_code, response_json.get("job")
@@ -38,6 +38,18 @@ class Seller:
         r = requests.post(url, headers=headers, json=json)
         return r.status_code
 
+    def add_books(self, store_id: str, stock_level: int, books: list) -> (int, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": books,
+            "stock_level": stock_level,
+        }
+        url = urljoin(self.url_prefix, "add_books")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("results", [])
+
     def add_stock_level(
         self, seller_id: str, store_id: str, book_id: str, add_stock_num: int
     ) -> int:
@@ -53,6 +65,17 @@ class Seller:
         r = requests.post(url, headers=headers, json=json)
         return r.status_code
 
+    def add_stock_levels(self, store_id: str, adjustments: list) -> (int, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "adjustments": [{"book_id": book_id, "delta": delta} for book_id, delta in adjustments],
+        }
+        url = urljoin(self.url_prefix, "add_stock_levels")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("results", [])
+
     def delivery_order(self, store_id: str, order_id: str) -> int:
         json = {
             "store_id": store_id,
@@ -61,4 +84,32 @@ class Seller:
         url = urljoin(self.url_prefix, "delivery_order")
         headers = {"token": self.token}
         r = requests.post(url, headers=headers, json=json)
-        return r.status_code
\ No newline at end of file
+        return r.status_code
+
+    def delivery_orders(self, store_id: str, order_ids: list) -> (int, list):
+        json = {
+            "store_id": store_id,
+            "order_ids": order_ids,
+        }
+        url = urljoin(self.url_prefix, "delivery_orders")
+        headers = {"token": self.token}
+        r = requests.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("results", [])
+
+    def list_orders(self, store_id: str, status: int = None, start_time: str = None, end_time: str = None,
+                    limit: int = 20, cursor: str = None, include_items: bool = False) -> (int, dict):
+        params = {"user_id": self.seller_id, "store_id": store_id, "limit": limit}
+        if status is not None:
+            params["status"] = status
+        if start_time is not None:
+            params["start_time"] = start_time
+        if end_time is not None:
+            params["end_time"] = end_time
+        if cursor is not None:
+            params["cursor"] = cursor
+        if include_items:
+            params["include_items"] = "true"
+        url = urljoin(self.url_prefix, "list_orders")
+        headers = {"token": self.token}
+        r = requests.get(url, headers=headers, params=params)
+        return r.status_code, r.json()
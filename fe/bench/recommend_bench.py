@@ -0,0 +1,100 @@
+"""
+推荐引擎离线回放评测：
+取 history_order 中按 commit_time 最新的一部分订单（不含已取消订单）作为留出集，对每个留出订单，
+只用该订单之前的历史为下单用户生成 top-k 推荐，统计命中率（推荐中至少有一本出现在该订单中）、
+延迟分位数与峰值内存，便于在同一份数据上比较已注册的推荐引擎。
+
+用法：python -m fe.bench.recommend_bench --engines cooccurrence,collaborative --k 10 --ratio 0.1
+"""
+import argparse
+import time
+import tracemalloc
+from sqlalchemy import text
+from be.model import store
+from be.model.recommender import RECOMMENDERS, get_recommender
+
+
+def load_holdout(engine, ratio: float, limit: int) -> list:
+    """
+    返回留出订单：[(user_id, commit_time, {book_id})]，按提交时间从新到旧
+    """
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT COUNT(*) FROM history_order WHERE status <> 3")).scalar() or 0
+        size = min(max(int(total * ratio), 1), limit) if total else 0
+        orders = conn.execute(text("""
+            SELECT order_id, user_id, commit_time
+            FROM history_order
+            WHERE status <> 3
+            ORDER BY commit_time DESC
+            LIMIT :size
+        """), {"size": size}).fetchall()
+        if not orders:
+            return []
+        rows = conn.execute(text("""
+            SELECT order_id, book_id FROM history_order_detail WHERE order_id IN :order_ids
+        """), {"order_ids": tuple(order[0] for order in orders)}).fetchall()
+
+    books = {}
+    for order_id, book_id in rows:
+        books.setdefault(order_id, set()).add(book_id)
+    return [(user_id, commit_time, books.get(order_id, set())) for order_id, user_id, commit_time in orders]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def evaluate(engine, name: str, holdout: list, k: int) -> dict:
+    recommender = get_recommender(name)
+    hits = 0
+    errors = 0
+    latencies = []
+    tracemalloc.start()
+    # 按时间正序回放，使依赖快照的引擎（如 minhash）可以复用最早截断时间的快照
+    for user_id, commit_time, bought in sorted(holdout, key=lambda order: order[1]):
+        start = time.perf_counter()
+        code, _, books = recommender.recommend(engine, user_id, k, before=commit_time)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if code != 200:
+            errors += 1
+            continue
+        if bought & {book["book_id"] for book in books}:
+            hits += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "engine": name,
+        "orders": len(holdout),
+        "hit_rate": hits / len(holdout) if holdout else 0.0,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_recommend_bench(engines: list, k: int, ratio: float, limit: int, db_url: str = None):
+    store.init_database(db_url)
+    engine = store.get_db_conn()
+    holdout = load_holdout(engine, ratio, limit)
+    print(f"held-out orders: {len(holdout)}, k={k}")
+    print(f"{'engine':<16}{'hit@k':>8}{'errors':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'peak(KB)':>10}")
+    for name in engines:
+        result = evaluate(engine, name, holdout, k)
+        print(f"{result['engine']:<16}{result['hit_rate']:>8.3f}{result['errors']:>8}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['peak_kb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay held-out orders against recommender engines")
+    parser.add_argument("--engines", default=",".join(RECOMMENDERS))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ratio", type=float, default=0.1)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+    run_recommend_bench(args.engines.split(","), args.k, args.ratio, args.limit, args.db_url)
@@ -0,0 +1,92 @@
+"""
+书名提取推理配置评测：
+以当前线上配置（原精度 + beam search + torch 默认线程数）为基线，
+对比候选配置（int8 动态量化 / greedy 解码 / 线程数上限）的单条延迟分位数，
+以及候选配置提取出的书名集合与基线一致的比例。
+
+用法：python -m fe.bench.title_bench --quantize --search-type greedy --threads 2 [--input texts.txt]
+"""
+import argparse
+import re
+import time
+import torch
+from be.model.title_model import (
+    DEFAULT_TITLE_MODEL,
+    InferenceProfile,
+    ModelRegistry,
+    TitleBatcher,
+)
+
+SAMPLE_TEXTS = [
+    "请给我推荐几本和《三体》类似的科幻小说。",
+    "最近在读《活着》，还有余华的其他作品值得一看吗？",
+    "想找一本讲机器学习入门的书，最好是中文的。",
+    "孩子十岁，喜欢童话故事，推荐一些经典读物。",
+    "有没有关于明朝历史的通俗读物，类似《明朝那些事儿》？",
+    "推荐一本适合初学者的 Python 编程书。",
+    "我喜欢东野圭吾的推理小说，比如《白夜行》。",
+    "想了解经济学基础知识，有什么好的入门书？",
+]
+
+
+def extract_titles(output_text: str) -> set:
+    return set(re.findall(r'《(.*?)》', output_text))
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def run_profile(profile: InferenceProfile, model_id: str, texts: list, default_threads: int) -> dict:
+    torch.set_num_threads(profile.num_threads or default_threads)
+    registry = ModelRegistry()
+    batcher = TitleBatcher(registry, max_batch_size=1, max_wait_ms=0, profile=profile)
+    registry.warm_up(model_id, profile.quantize)
+
+    outputs = []
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        outputs.append(batcher.generate(model_id, text))
+        latencies.append((time.perf_counter() - start) * 1000)
+    registry.unload()
+    return {
+        "profile": profile,
+        "titles": [extract_titles(output) for output in outputs],
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": sum(latencies) / len(latencies),
+    }
+
+
+def run_title_bench(candidate: InferenceProfile, model_id: str, texts: list):
+    default_threads = torch.get_num_threads()
+    baseline = run_profile(InferenceProfile(), model_id, texts, default_threads)
+    result = run_profile(candidate, model_id, texts, default_threads)
+
+    agree = sum(1 for a, b in zip(baseline["titles"], result["titles"]) if a == b)
+    print(f"texts: {len(texts)}, model: {model_id}, default threads: {default_threads}")
+    print(f"{'profile':<72}{'p50(ms)':>10}{'p99(ms)':>10}{'mean(ms)':>10}")
+    for run in (baseline, result):
+        print(f"{repr(run['profile']):<72}{run['p50_ms']:>10.1f}{run['p99_ms']:>10.1f}{run['mean_ms']:>10.1f}")
+    print(f"title agreement with baseline: {agree}/{len(texts)} ({agree / len(texts):.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare title-extraction inference profiles")
+    parser.add_argument("--model-id", default=DEFAULT_TITLE_MODEL)
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--search-type", default="greedy")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--input", default=None, help="UTF-8 text file, one input per line")
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    run_title_bench(InferenceProfile(args.quantize, args.search_type, args.threads), args.model_id, texts)
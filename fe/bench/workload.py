@@ -3,8 +3,8 @@ import uuid
 import random
 import threading
 from fe.access import book
-from fe.access.new_seller import register_new_seller
-from fe.access.new_buyer import register_new_buyer
+from fe.access.auth import Auth
+from fe.access.seller import Seller
 from fe.access.buyer import Buyer
 from fe import conf
 import json
@@ -12,6 +12,7 @@ from pathlib import Path
 # 指定文件路径
 output_file = 'fe/bench/performance.txt'
 CACHE_FILE = Path(__file__).with_name("workload_cache.json")
+REGISTER_BATCH_SIZE = 5000  # 每次调用 /auth/register_batch 注册的用户数
 # 定义函数用于写入日志信息到 txt 文件
 def write_to_file(message):
     with open(output_file, 'a', encoding='utf-8') as file:
@@ -97,6 +98,16 @@ class Workload:
     def to_store_id(self, seller_no: int, i):
         return "store_s_{}_{}_{}".format(seller_no, i, self.uuid)
 
+    def register_users(self, users: list):
+        """
+        通过批量注册接口创建卖家和买家账号，每次 REGISTER_BATCH_SIZE 个
+        """
+        auth = Auth(conf.URL)
+        for start in range(0, len(users), REGISTER_BATCH_SIZE):
+            code, result = auth.register_batch(users[start:start + REGISTER_BATCH_SIZE])
+            assert code == 200
+            assert not result["conflicts"] and not result["invalid"]
+
     def gen_database(self):
         if self.cache_loaded:
             logging.info("benchmark dataset already prepared; skipping regeneration")
@@ -105,9 +116,13 @@ class Workload:
 
         logging.info("load data")
         write_to_file("load data")
+        self.register_users(
+            [self.to_seller_id_and_password(i) for i in range(1, self.seller_num + 1)]
+            + [self.to_buyer_id_and_password(k) for k in range(1, self.buyer_num + 1)]
+        )
         for i in range(1, self.seller_num + 1):
             user_id, password = self.to_seller_id_and_password(i)
-            seller = register_new_seller(user_id, password)
+            seller = Seller(conf.URL, user_id, password)
             for j in range(1, self.store_num_per_user + 1):
                 store_id = self.to_store_id(i, j)
                 code = seller.create_store(store_id)
@@ -120,17 +135,17 @@ class Workload:
                     books = self.book_db.get_book_info(row_no, self.batch_size)
                     if len(books) == 0:
                         break
-                    for bk in books:
-                        code = seller.add_book(store_id, self.stock_level, bk)
-                        assert code == 200
-                        self.book_ids[store_id].append(bk["id"])
+                    code, results = seller.add_books(store_id, self.stock_level, books)
+                    assert code == 200
+                    assert all(result["code"] == 200 for result in results)
+                    self.book_ids[store_id].extend(bk["id"] for bk in books)
                     row_no = row_no + len(books)
 
         logging.info("seller data loaded.")
         write_to_file("seller data loaded.")
         for k in range(1, self.buyer_num + 1):
             user_id, password = self.to_buyer_id_and_password(k)
-            buyer = register_new_buyer(user_id, password)
+            buyer = Buyer(conf.URL, user_id, password)
             buyer.add_funds(self.user_funds)
             self.buyer_ids.append(user_id)
         logging.info("buyer data loaded.")
@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+
+import pytest
+
+from be.model.bestseller import BestsellerBoard, GLOBAL_SCOPE
+import be.model.bestseller as bestseller_module
+
+
+class ResultStub:
+    def __init__(self, *, scalar=None, fetchall=None):
+        self._scalar = scalar
+        self._fetchall = fetchall
+
+    def scalar(self):
+        return self._scalar
+
+    def fetchall(self):
+        return list(self._fetchall or [])
+
+
+class ConnectionStub:
+    def __init__(self, execute_plan):
+        self.execute_plan = list(execute_plan)
+        self.executed = []
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement).strip(), params))
+        return self.execute_plan.pop(0) if self.execute_plan else ResultStub()
+
+    def commit(self):
+        self.committed = True
+
+
+class EngineStub:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def connect(self):
+        return self.connection
+
+
+def test_record_ranks_store_and_global_scopes():
+    board = BestsellerBoard()
+    board.record("s1", [("b1", 2), ("b2", 5)])
+    board.record("s2", [("b1", 4)])
+
+    assert board.top(10, store_id="s1") == [("b2", 5), ("b1", 2)]
+    assert board.top(10, store_id="s2") == [("b1", 4)]
+    assert board.top(10, store_id=GLOBAL_SCOPE) == [("b1", 6), ("b2", 5)]
+    assert board.top(1) == [("b1", 6)]
+
+
+def test_windows_only_include_recent_days():
+    board = BestsellerBoard()
+    today = date.today()
+    board.record("s1", [("old", 100)], today - timedelta(days=10))
+    board.record("s1", [("week", 10)], today - timedelta(days=3))
+    board.record("s1", [("today", 1)], today)
+
+    assert board.top(10, "s1", "1d") == [("today", 1)]
+    assert board.top(10, "s1", "7d") == [("week", 10), ("today", 1)]
+    assert board.top(10, "s1", "30d") == [("old", 100), ("week", 10), ("today", 1)]
+
+
+def test_record_invalidates_memoized_ranking():
+    board = BestsellerBoard()
+    board.record("s1", [("b1", 1)])
+    assert board.top(10, "s1") == [("b1", 1)]
+
+    board.record("s1", [("b2", 3)])
+    assert board.top(10, "s1") == [("b2", 3), ("b1", 1)]
+
+
+def test_load_backfills_empty_table_and_builds_rankings():
+    today = date.today()
+    connection = ConnectionStub([
+        ResultStub(scalar=today),  # CURDATE()
+        ResultStub(scalar=0),  # COUNT(*)
+        ResultStub(),  # 回填 INSERT ... SELECT
+        ResultStub(fetchall=[("s1", "b1", today, 3), ("s2", "b1", today, 2), ("s1", "b2", today, 4)]),
+    ])
+    board = BestsellerBoard()
+    board.load(EngineStub(connection))
+
+    assert board.loaded
+    assert connection.committed
+    assert any("INSERT INTO book_sales_daily" in sql for sql, _ in connection.executed)
+    assert board.top(10) == [("b1", 5), ("b2", 4)]
+    assert board.top(10, "s1") == [("b2", 4), ("b1", 3)]
+
+
+def test_refresh_does_not_backfill_and_swallows_errors(monkeypatch):
+    connection = ConnectionStub([ResultStub(scalar=date.today()), ResultStub(fetchall=[])])
+    monkeypatch.setattr(bestseller_module.store, "get_db_conn", lambda: EngineStub(connection))
+    board = BestsellerBoard()
+    board.refresh()
+    assert len(connection.executed) == 2
+
+    def broken():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(bestseller_module.store, "get_db_conn", broken)
+    board.refresh()  # 不抛出异常
+
+
+def test_top_rejects_unknown_window():
+    with pytest.raises(KeyError):
+        BestsellerBoard().top(10, window="2w")
+
+
+def test_board_follows_database_clock():
+    db_today = date.today() + timedelta(days=1)  # 数据库已跨过零点（或时区领先）
+    connection = ConnectionStub([
+        ResultStub(scalar=db_today),
+        ResultStub(fetchall=[("s1", "b1", db_today, 2)]),
+    ])
+    board = BestsellerBoard()
+    board.load(EngineStub(connection), backfill=False)
+
+    assert connection.executed[1][1] == {"since": db_today - timedelta(days=29)}
+    assert board.today() == db_today
+    # 支付后未指定日期的记录与物化表中 CURDATE() 写入的行落在同一个日桶
+    board.record("s1", [("b1", 1)])
+    assert board.top(10, "s1", "1d") == [("b1", 3)]
@@ -5,6 +5,7 @@ from typing import Iterable, List, Tuple
 import pytest
 
 import be.model.buyer as buyer_module
+import be.model.title_model as title_model_module
 from be.model import error
 
 
@@ -142,6 +143,22 @@ def reset_unpaid_orders(monkeypatch):
     monkeypatch.setattr(buyer_module, "unpaid_orders", [])
 
 
+@pytest.fixture(autouse=True)
+def reset_recommend_cache():
+    buyer_module.recommend_cache.clear()
+    yield
+    buyer_module.recommend_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_model_registry():
+    buyer_module.model_registry.unload()
+    buyer_module.title_result_cache.clear()
+    yield
+    buyer_module.model_registry.unload()
+    buyer_module.title_result_cache.clear()
+
+
 def test_new_order_aggregates_counts_and_success(monkeypatch):
     monkeypatch.setattr(buyer_module.uuid, "uuid1", lambda: "fake-uuid")
 
@@ -405,6 +422,36 @@ def test_recommend_books_one_no_orders():
     assert (code, msg, books) == (528, "User has no orders", [])
 
 
+def test_recommend_books_one_no_orders_falls_back_to_bestsellers(monkeypatch):
+    board = buyer_module.bestseller_board
+    monkeypatch.setattr(board, "_daily", {})
+    monkeypatch.setattr(board, "_ranked", {})
+    board.record("store-1", [("book-9", 4), ("book-8", 1)])
+    conn = ConnectionStub(
+        execute_plan=[
+            ResultStub(fetchone=(1,)),
+            ResultStub(fetchall=[]),
+            ResultStub(fetchall=[
+                ("book-8", "T8", "A", "P", 5),
+                ("book-9", "T9", "A", "P", 9),
+            ]),
+        ]
+    )
+    buyer = make_buyer([conn])
+
+    code, msg, books = buyer.recommend_books_one("buyer", 5)
+    assert (code, msg) == (200, "ok (bestseller fallback)")
+    assert [book["book_id"] for book in books] == ["book-9", "book-8"]
+    assert books[0]["sales"] == 4
+
+
+def test_bestsellers_rejects_unknown_window():
+    buyer = make_buyer([])
+    code, msg, books = buyer.bestsellers(window="2w")
+    assert code == 400
+    assert books == []
+
+
 def test_recommend_books_one_no_purchased_books():
     conn = ConnectionStub(
         execute_plan=[
@@ -450,6 +497,32 @@ def test_recommend_books_one_no_recommendations():
     assert (code, msg, books) == (200, "No recommended books found", [])
 
 
+def test_recommend_books_one_served_from_cache_on_repeat():
+    conn = ConnectionStub(
+        execute_plan=[
+            ResultStub(fetchone=(1,)),
+            ResultStub(fetchall=[("order-1",)]),
+            ResultStub(fetchall=[("book-1",)]),
+            ResultStub(fetchall=[("user-x", "order-x", "book-1")]),
+            ResultStub(mappings=[{"book_id": "book-2", "frequency": 1}]),
+            ResultStub(mappings=[{"book_id": "book-2", "title": "T", "author": "A", "publisher": "P", "price": 10}]),
+        ]
+    )
+    buyer = make_buyer([conn])
+
+    first = buyer.recommend_books_one("buyer", 3)
+    second = buyer.recommend_books_one("buyer", 3)
+
+    assert first == second
+    assert first[0] == 200 and first[2][0]["book_id"] == "book-2"
+    assert buyer_module.recommend_cache.stats()["hits"] == 1
+
+    # 失效后重新查库（此处已无可用连接，返回 528）
+    buyer_module.recommend_cache.invalidate_user("buyer")
+    code, _, _ = buyer.recommend_books_one("buyer", 3)
+    assert code == 528
+
+
 def test_recommend_books_one_handles_exception():
     buyer = make_buyer([RuntimeError("db down")])
     code, msg, books = buyer.recommend_books_one("buyer", 3)
@@ -491,35 +564,153 @@ def test_generate_titles_successful_flow(monkeypatch):
         def my_generate(self, **kwargs):
             return DummyTensor([[0, 1]])
 
-    monkeypatch.setattr(buyer_module.AutoTokenizer, "from_pretrained", lambda *args, **kwargs: DummyTokenizer())
+    monkeypatch.setattr(title_model_module.transformers.AutoTokenizer, "from_pretrained", lambda *args, **kwargs: DummyTokenizer())
     monkeypatch.setattr(
-        buyer_module.AutoModelForSeq2SeqLM,
+        title_model_module.transformers.AutoModelForSeq2SeqLM,
         "from_pretrained",
         lambda *args, **kwargs: DummyModel(),
     )
-    monkeypatch.setattr(buyer_module.torch.cuda, "is_available", lambda: False)
-    monkeypatch.setattr(buyer_module.torch, "device", lambda name: name)
-    monkeypatch.setattr(buyer_module.torch, "LongTensor", lambda data: DummyTensor(data))
+    monkeypatch.setattr(title_model_module.torch.cuda, "is_available", lambda: False)
+    monkeypatch.setattr(title_model_module.torch, "device", lambda name: name)
+    monkeypatch.setattr(title_model_module.torch, "LongTensor", lambda data: DummyTensor(data))
 
+    lookup_conn = ConnectionStub(execute_plan=[ResultStub(fetchone=None)])
     insert_conn = ConnectionStub(
         execute_plan=[ResultStub()],
         begin_side_effect=lambda: TransactionStub(),
     )
-    buyer = make_buyer([insert_conn])
+    buyer = make_buyer([lookup_conn, insert_conn])
 
     code, titles = buyer.generate_and_extract_titles("一些文本")
     assert code == 200
     assert titles == ["推荐书"]
     assert insert_conn.committed or insert_conn.transaction.committed
+    input_hash = buyer_module.title_input_hash(buyer_module.DEFAULT_TITLE_MODEL, "一些文本")
+    assert lookup_conn.executed[0][1] == {"input_hash": input_hash}
+    assert insert_conn.executed[0][1]["input_hash"] == input_hash
+
+    # 相同文本再次提交时命中进程内缓存，不再访问数据库和模型
+    buyer.conn = EngineStub([])
+    assert buyer.generate_and_extract_titles("一些文本") == (200, ["推荐书"])
+
+
+def test_generate_titles_reuses_stored_result_without_model(monkeypatch):
+    def fail_generate(*args, **kwargs):
+        raise AssertionError("model should not be called")
+
+    monkeypatch.setattr(buyer_module.title_batcher, "generate", fail_generate)
+    lookup_conn = ConnectionStub(execute_plan=[ResultStub(fetchone=('["三体"]',))])
+    buyer = make_buyer([lookup_conn])
+
+    assert buyer.generate_and_extract_titles("科幻小说") == (200, ["三体"])
+    input_hash = buyer_module.title_input_hash(buyer_module.DEFAULT_TITLE_MODEL, "科幻小说")
+    assert buyer_module.title_result_cache.get(input_hash) == ["三体"]
+
+
+def test_generate_titles_fast_path_skips_model(monkeypatch):
+    def fail_generate(*args, **kwargs):
+        raise AssertionError("model should not be called")
+
+    monkeypatch.setattr(buyer_module.title_batcher, "generate", fail_generate)
+    buyer = make_buyer([])
+    assert buyer.generate_and_extract_titles("想看《活着》和《三体》") == (200, ["活着", "三体"])
+
+
+def test_generate_titles_common_catalog_word_falls_through_to_model(monkeypatch):
+    import be.model.title_matcher as title_matcher_module
+
+    matcher = title_matcher_module.CatalogTitleMatcher()
+    matcher.build(["小说", "历史", "活着"])
+    monkeypatch.setattr(title_matcher_module, "catalog_matcher", matcher)
+    monkeypatch.setattr(buyer_module.title_batcher, "generate", lambda model_id, txt: "《明朝那些事儿》")
+    lookup_conn = ConnectionStub(execute_plan=[ResultStub(fetchone=None)])
+    insert_conn = ConnectionStub(execute_plan=[ResultStub()])
+    buyer = make_buyer([lookup_conn, insert_conn])
+
+    assert buyer.generate_and_extract_titles("我喜欢看历史小说，有什么推荐吗") == (200, ["明朝那些事儿"])
+
+
+def test_generate_titles_force_model_bypasses_fast_path(monkeypatch):
+    monkeypatch.setattr(buyer_module.title_batcher, "generate", lambda model_id, txt: "《兄弟》")
+    lookup_conn = ConnectionStub(execute_plan=[ResultStub(fetchone=None)])
+    insert_conn = ConnectionStub(execute_plan=[ResultStub()])
+    buyer = make_buyer([lookup_conn, insert_conn])
+
+    assert buyer.generate_and_extract_titles("想看《活着》", force_model=True) == (200, ["兄弟"])
+
+
+def test_title_input_hash_depends_on_model_and_params():
+    base = buyer_module.title_input_hash("m1", "text")
+    assert base == buyer_module.title_input_hash("m1", "text")
+    assert base != buyer_module.title_input_hash("m2", "text")
+    assert base != buyer_module.title_input_hash("m1", "text", {"search_type": "greedy"})
 
 
 def test_generate_titles_handles_generation_exception(monkeypatch):
     monkeypatch.setattr(
-        buyer_module.AutoTokenizer,
+        title_model_module.transformers.AutoTokenizer,
         "from_pretrained",
         lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("load fail")),
     )
-    buyer = make_buyer([])
+    buyer = make_buyer([ConnectionStub(execute_plan=[ResultStub(fetchone=None)])])
     code, titles = buyer.generate_and_extract_titles("内容")
     assert code == 528
-    assert titles == []
\ No newline at end of file
+    assert titles == []
+
+def test_submit_title_job_persists_pending_job(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(
+        buyer_module.title_job_pool,
+        "submit",
+        lambda job_id, fn, *args: submitted.append((job_id, args)) or True,
+    )
+    conn = ConnectionStub(execute_plan=[ResultStub()])
+    buyer = make_buyer([conn])
+
+    code, msg, job_id = buyer.submit_title_job("推荐几本书")
+    assert (code, msg) == (200, "ok")
+    assert submitted == [(job_id, (job_id, "推荐几本书", buyer_module.DEFAULT_TITLE_MODEL, False))]
+    sql, params = conn.executed[0]
+    assert "INSERT INTO title_jobs" in sql
+    assert params["status"] == "pending"
+    assert conn.committed
+
+
+def test_submit_title_job_rejects_when_pool_is_full(monkeypatch):
+    monkeypatch.setattr(buyer_module.title_job_pool, "submit", lambda *args: False)
+    conn = ConnectionStub(execute_plan=[ResultStub(), ResultStub()])
+    buyer = make_buyer([conn])
+
+    code, msg, job_id = buyer.submit_title_job("文本")
+    assert (code, job_id) == (503, "")
+    assert "DELETE FROM title_jobs" in conn.executed[1][0]
+
+
+def test_run_title_job_records_result(monkeypatch):
+    buyer = make_buyer([])
+    updates = []
+    monkeypatch.setattr(buyer, "_update_title_job", lambda job_id, status, **kwargs: updates.append((status, kwargs)))
+    monkeypatch.setattr(buyer, "generate_and_extract_titles", lambda txt, model_id, force_model: (200, ["三体"]))
+
+    buyer._run_title_job("job", "文本", "m")
+    assert updates == [("running", {}), ("done", {"titles": ["三体"]})]
+
+
+def test_title_job_status_long_polls_and_reads_row(monkeypatch):
+    waited = []
+    monkeypatch.setattr(buyer_module.title_job_pool, "wait", lambda job_id, timeout: waited.append(timeout))
+    conn = ConnectionStub(
+        execute_plan=[ResultStub(mappings=[{"job_id": "job", "status": "done", "titles": '["三体"]', "error": None}])]
+    )
+    buyer = make_buyer([conn])
+
+    code, msg, job = buyer.title_job_status("job", wait=120)
+    assert code == 200
+    assert job == {"job_id": "job", "status": "done", "titles": ["三体"], "error": None}
+    assert waited == [buyer_module.MAX_LONG_POLL_SECONDS]
+
+
+def test_title_job_status_unknown_job():
+    buyer = make_buyer([ConnectionStub(execute_plan=[ResultStub(mappings=[])])])
+    code, msg, job = buyer.title_job_status("missing")
+    assert (code, job) == (404, {})
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+import be.model.credentials as credentials_module
+
+FAST_PARAMS = {"n": 2 ** 4, "r": 1, "p": 1}
+
+
+def make_service(**kwargs):
+    options = dict(max_workers=2, max_pending=4, cache_seconds=30)
+    options.update(FAST_PARAMS)
+    options.update(kwargs)
+    return credentials_module.CredentialService(**options)
+
+
+def test_hash_password_round_trip():
+    stored = credentials_module.hash_password("secret", **FAST_PARAMS)
+
+    assert stored.startswith("scrypt$16$1$1$")
+    assert credentials_module.verify_password("secret", stored)
+    assert not credentials_module.verify_password("other", stored)
+    # 相同密码每次使用不同的盐
+    assert credentials_module.hash_password("secret", **FAST_PARAMS) != stored
+
+
+def test_verify_password_accepts_legacy_plaintext():
+    assert credentials_module.verify_password("secret", "secret")
+    assert not credentials_module.verify_password("secret", "Secret")
+    assert not credentials_module.verify_password("secret", None)
+
+
+def test_verify_password_rejects_malformed_hash():
+    assert not credentials_module.verify_password("secret", "scrypt$broken")
+
+
+def test_service_verify_caches_successful_results(monkeypatch):
+    service = make_service()
+    stored = service.hash("secret")
+    calls = []
+    original = credentials_module.verify_password
+    monkeypatch.setattr(credentials_module, "verify_password", lambda *args: calls.append(args) or original(*args))
+
+    assert service.verify("u1", "secret", stored) == (200, "ok")
+    assert service.verify("u1", "secret", stored) == (200, "ok")
+    assert len(calls) == 1
+    assert service.stats()["cache_hits"] == 1
+
+    # 失败结果不缓存；存储的哈希变化（修改密码）后旧缓存不再命中
+    assert service.verify("u1", "wrong", stored)[0] == 401
+    assert service.verify("u1", "secret", service.hash("secret")) == (200, "ok")
+    assert len(calls) == 3
+
+
+def test_service_invalidate_user_drops_cached_results():
+    service = make_service()
+    stored = service.hash("secret")
+    service.verify("u1", "secret", stored)
+
+    service.invalidate_user("u1")
+
+    assert service.stats()["cache_size"] == 0
+
+
+def test_service_rejects_when_queue_is_full(monkeypatch):
+    service = make_service(max_workers=1, max_pending=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_verify(password, stored):
+        started.set()
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(credentials_module, "verify_password", slow_verify)
+    worker = threading.Thread(target=service.verify, args=("u1", "secret", "stored"))
+    worker.start()
+    assert started.wait(5)
+
+    assert service.queue_depth() == 1
+    assert service.verify("u2", "secret", "stored") == (503, "Credential service is busy")
+    release.set()
+    worker.join(5)
+
+    stats = service.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["peak_depth"] == 1
+    assert stats["rejected"] == 1
+
+
+@pytest.mark.parametrize("stored, expected", [
+    ("plaintext", True),
+    (credentials_module.hash_password("secret", n=2 ** 4, r=1, p=1), False),
+    (credentials_module.hash_password("secret", n=2 ** 3, r=1, p=1), True),
+])
+def test_service_needs_rehash(stored, expected):
+    assert make_service().needs_rehash(stored) is expected
+
+
+def test_service_hash_many_keeps_order():
+    service = make_service(max_workers=2)
+
+    hashes = service.hash_many(["a", "b", "c"])
+
+    assert [credentials_module.verify_password(p, h) for p, h in zip("abc", hashes)] == [True] * 3
+    assert service.queue_depth() == 0
+
+
+def test_service_hash_many_returns_none_when_a_worker_fails():
+    service = make_service(max_workers=2)
+    valid_n, service.n = service.n, 3  # scrypt 要求 n 为 2 的幂，工作线程中抛出 ValueError
+
+    assert service.hash_many(["a", "b"]) is None
+    assert service.stats()["rejected"] == 1
+    # 失败后批量名额全部归还，后续批量仍可执行
+    service.n = valid_n
+    assert len(service.hash_many(["a", "b", "c"])) == 3
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# be.serve 的导入耗时上限（毫秒）；torch / transformers 被提前导入时会达到数秒
+IMPORT_BUDGET_MS = float(os.getenv("BOOKSTORE_IMPORT_BUDGET_MS", 3000))
+HEAVY_MODULES = ("torch", "transformers", "mysql.connector")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_python(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_serve_import_does_not_load_heavy_modules():
+    code = (
+        "import sys, be.serve; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = run_python(code)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_serve_import_time_within_budget():
+    result = run_python("import be.serve", "-X", "importtime")
+    assert result.returncode == 0, result.stderr
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "be.serve":
+            cumulative_us = int(parts[1])
+    if cumulative_us is None:
+        pytest.fail("be.serve not found in -X importtime output")
+    assert cumulative_us / 1000 <= IMPORT_BUDGET_MS
@@ -0,0 +1,260 @@
+from datetime import datetime
+
+import pytest
+
+from be.model.minhash import MinHashIndex
+from be.model.recommender import MinHashRecommender
+
+
+class ResultStub:
+    def __init__(self, *, fetchall=None):
+        self._fetchall = fetchall
+
+    def fetchall(self):
+        return list(self._fetchall or [])
+
+    def mappings(self):
+        return self
+
+
+class ConnectionStub:
+    def __init__(self, execute_plan):
+        self.execute_plan = list(execute_plan)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement).strip(), params))
+        return self.execute_plan.pop(0) if self.execute_plan else ResultStub()
+
+
+class EngineStub:
+    def __init__(self, connections):
+        self._connections = list(connections)
+
+    def connect(self):
+        return self._connections.pop(0)
+
+
+def book_detail(book_id):
+    return {"book_id": book_id, "title": f"T-{book_id}", "author": "A", "publisher": "P", "price": 10}
+
+
+def test_signature_is_deterministic_and_order_independent():
+    index = MinHashIndex()
+    assert index.signature(["b1", "b2", "b3"]) == index.signature(["b3", "b1", "b2"])
+    assert index.signature(["b1"]) == MinHashIndex().signature(["b1"])
+    assert len(index.signature(["b1"])) == index.num_perm
+
+
+def test_rejects_bands_not_dividing_signature():
+    with pytest.raises(ValueError):
+        MinHashIndex(num_perm=10, bands=3)
+
+
+def test_query_finds_similar_users_and_skips_disjoint_ones():
+    index = MinHashIndex()
+    shared = [f"b{i}" for i in range(20)]
+    index.add("twin", shared)
+    index.add("close", shared[:18] + ["x1", "x2"])
+    index.add("stranger", [f"z{i}" for i in range(20)])
+
+    result = dict(index.query(shared, exclude="me"))
+    assert result["twin"] == 1.0
+    assert "close" in result
+    assert result["close"] < 1.0
+    assert "stranger" not in result
+
+
+def test_add_reindexes_user_and_remove_user_drops_it():
+    index = MinHashIndex()
+    index.add("u1", ["b1"])
+    assert [user for user, _ in index.query(["b1"])] == ["u1"]
+
+    index.add("u1", ["b2"])
+    assert index.books("u1") == {"b1", "b2"}
+    assert [user for user, _ in index.query(["b1", "b2"])] == ["u1"]
+
+    index.remove_user("u1")
+    assert index.query(["b1", "b2"]) == []
+    assert index.books("u1") == set()
+
+
+def test_load_builds_index_with_optional_cutoff():
+    connection = ConnectionStub([ResultStub(fetchall=[("u1", "b1"), ("u1", "b2"), ("u2", "b1")])])
+    index = MinHashIndex()
+    cutoff = datetime(2024, 1, 1)
+    index.load(EngineStub([connection]), before=cutoff)
+
+    assert index.loaded
+    assert index.books("u1") == {"b1", "b2"}
+    sql, params = connection.executed[0]
+    assert "h.commit_time < :before" in sql
+    assert params == {"before": cutoff}
+
+
+def test_minhash_recommender_aggregates_neighbour_books(monkeypatch):
+    index = MinHashIndex()
+    index.loaded = True
+    owned = [f"b{i}" for i in range(10)]
+    index.add("me", owned)
+    index.add("n1", owned + ["r1", "r2"])
+    index.add("n2", owned + ["r1"])
+    recommender = MinHashRecommender(index)
+    monkeypatch.setattr(recommender, "_book_details", lambda conn, book_ids: [book_detail(b) for b in book_ids])
+
+    connection = ConnectionStub([
+        ResultStub(fetchall=[("o1",)]),
+        ResultStub(fetchall=[(book_id,) for book_id in owned]),
+    ])
+    code, message, books = recommender.recommend(EngineStub([connection]), "me", 5)
+
+    assert (code, message) == (200, "ok")
+    assert [book["book_id"] for book in books] == ["r1", "r2"]
+
+
+def test_other_worker_sees_purchase_only_after_rebuild(monkeypatch):
+    import be.model.minhash as minhash_module
+
+    clock = [1000.0]
+    monkeypatch.setattr(minhash_module.time, "monotonic", lambda: clock[0])
+    rows = [("u1", "b1")]
+    # 两个 worker 各自持有索引；支付只在处理它的 worker 中增量更新
+    paying = MinHashIndex(max_age_seconds=60)
+    other = MinHashIndex(max_age_seconds=60)
+    for index in (paying, other):
+        index.load(EngineStub([ConnectionStub([ResultStub(fetchall=list(rows))])]))
+    paying.add("u2", ["b1"])
+    rows.append(("u2", "b1"))
+
+    assert other.books("u2") == set()
+    assert not other.is_stale()
+    other.refresh(EngineStub([]))  # 未过期时不访问数据库
+
+    clock[0] += 60
+    assert other.is_stale()
+    other.refresh(EngineStub([ConnectionStub([ResultStub(fetchall=list(rows))])]))
+    assert other.books("u2") == {"b1"}
+    assert not other.is_stale()
+
+
+def test_refresh_skips_index_never_loaded_in_this_process():
+    index = MinHashIndex(max_age_seconds=1)
+    index.refresh(EngineStub([]))
+    assert not index.loaded
+
+
+def test_recommender_serves_stale_index_while_rebuilding_in_background(monkeypatch):
+    import be.model.minhash as minhash_module
+
+    clock = [1000.0]
+    monkeypatch.setattr(minhash_module.time, "monotonic", lambda: clock[0])
+    started = []
+
+    class ThreadStub:
+        def __init__(self, target, args, daemon):
+            self.run = lambda: target(*args)
+            started.append(self)
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr(minhash_module.threading, "Thread", ThreadStub)
+    index = MinHashIndex(max_age_seconds=60)
+    index.load(EngineStub([ConnectionStub([ResultStub(fetchall=[("u1", "b1")])])]))
+    clock[0] += 120
+    recommender = MinHashRecommender(index)
+    engine = EngineStub([ConnectionStub([ResultStub(fetchall=[("u2", "b2")])])])
+
+    served = recommender._index_for(engine, None)
+
+    # 请求路径不重建：返回旧索引，重建交给后台线程
+    assert served is index
+    assert served.books("u1") == {"b1"} and served.books("u2") == set()
+    assert len(started) == 1
+    started[0].run()
+    assert index.books("u2") == {"b2"} and index.books("u1") == set()
+    assert not index.is_stale()
+
+
+def test_refresh_skips_while_another_build_holds_the_lock(monkeypatch):
+    import be.model.minhash as minhash_module
+
+    clock = [1000.0]
+    monkeypatch.setattr(minhash_module.time, "monotonic", lambda: clock[0])
+    index = MinHashIndex(max_age_seconds=60)
+    index.load(EngineStub([ConnectionStub([ResultStub(fetchall=[("u1", "b1")])])]))
+    clock[0] += 120
+
+    with index._build_lock:
+        index.refresh(EngineStub([]))  # 不访问数据库
+        index.refresh_in_background(EngineStub([]))
+    assert index.is_stale()
+
+
+def test_failed_refresh_waits_before_retrying(monkeypatch):
+    import be.model.minhash as minhash_module
+
+    clock = [1000.0]
+    monkeypatch.setattr(minhash_module.time, "monotonic", lambda: clock[0])
+    index = MinHashIndex(max_age_seconds=60)
+    index.load(EngineStub([ConnectionStub([ResultStub(fetchall=[("u1", "b1")])])]))
+    clock[0] += 120
+
+    class FailingEngine:
+        calls = 0
+
+        def connect(self):
+            FailingEngine.calls += 1
+            raise RuntimeError("db down")
+
+    index.refresh(FailingEngine())
+    index.refresh(FailingEngine())
+    assert FailingEngine.calls == 1
+    assert index.books("u1") == {"b1"}  # 继续使用旧索引
+
+    clock[0] += minhash_module.MINHASH_RETRY_SECONDS
+    index.refresh(EngineStub([ConnectionStub([ResultStub(fetchall=[("u1", "b2")])])]))
+    assert index.books("u1") == {"b2"}
+
+
+def test_purchase_committed_during_rebuild_survives_swap():
+    index = MinHashIndex()
+    index.load(EngineStub([ConnectionStub([ResultStub(fetchall=[("u1", "b1")])])]))
+
+    class PurchaseDuringQuery(ResultStub):
+        def fetchall(self):
+            # 查询读到的快照之后，另一请求完成支付并增量更新索引
+            index.add("u2", ["b9"])
+            index.remove_user("u3")
+            return [("u1", "b1"), ("u3", "b3")]
+
+    index.load(EngineStub([ConnectionStub([PurchaseDuringQuery()])]))
+
+    assert index.books("u2") == {"b9"}
+    assert index.books("u3") == set()
+    assert [user for user, _ in index.query(["b9"])] == ["u2"]
+
+
+def test_accepts_updates_only_once_loading_has_started():
+    index = MinHashIndex()
+    assert not index.accepting_updates
+
+    class CheckDuringQuery(ResultStub):
+        def fetchall(self):
+            assert index.accepting_updates
+            return []
+
+    index.load(EngineStub([ConnectionStub([CheckDuringQuery()])]))
+    assert index.accepting_updates
+
+
+def test_purchased_books_excludes_cancelled_orders():
+    conn = ConnectionStub([ResultStub(fetchall=[])])
+    MinHashRecommender(MinHashIndex())._purchased_books(conn, "u1")
+    assert "status <> 3" in conn.executed[0][0]
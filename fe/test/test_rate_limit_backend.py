@@ -0,0 +1,193 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify
+
+import be.model.rate_limit as rate_limit_module
+import be.serve as serve_module
+
+
+LIMITS = {
+    rate_limit_module.CLASS_EXPENSIVE: (1, 2, 10, 3),
+    rate_limit_module.CLASS_CHECKOUT: (0, 0, 0, 0),
+    rate_limit_module.CLASS_DEFAULT: (0, 0, 0, 0),
+}
+
+
+def make_limiter(**kwargs):
+    return rate_limit_module.RateLimiter(limits=LIMITS, **kwargs)
+
+
+def test_memory_bucket_refills_over_time():
+    bucket_store = rate_limit_module.MemoryBucketStore()
+
+    assert bucket_store.consume("k", rate=2, burst=2, now=100.0) == 0
+    assert bucket_store.consume("k", rate=2, burst=2, now=100.0) == 0
+    assert bucket_store.consume("k", rate=2, burst=2, now=100.0) == pytest.approx(0.5)
+    # 0.5 秒后补充一个令牌
+    assert bucket_store.consume("k", rate=2, burst=2, now=100.5) == 0
+
+
+def test_memory_bucket_purge_drops_idle_keys():
+    bucket_store = rate_limit_module.MemoryBucketStore()
+    bucket_store.consume("old", rate=1, burst=1, now=0.0)
+
+    bucket_store.purge(idle_seconds=60)
+
+    assert len(bucket_store) == 0
+
+
+def test_limiter_applies_per_user_bucket():
+    limiter = make_limiter()
+
+    assert limiter.check("auth.search_book_regex", "u1") == 0
+    assert limiter.check("auth.search_book_regex", "u1") == 0
+    assert limiter.check("auth.search_book_regex", "u1") > 0
+    # 其他用户不受影响
+    assert limiter.check("auth.search_book_regex", "u2") == 0
+    assert limiter.rejected == {rate_limit_module.CLASS_EXPENSIVE: 1}
+
+
+def test_title_job_long_poll_is_expensive():
+    assert rate_limit_module.RateLimiter.classify("buyer.title_job_status") == rate_limit_module.CLASS_EXPENSIVE
+
+
+def test_rejection_counter_is_thread_safe():
+    limiter = make_limiter()
+    threads = [
+        threading.Thread(target=lambda: [limiter._reject("expensive", 1.0) for _ in range(1000)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert limiter.rejected == {"expensive": 8000}
+
+
+def test_limiter_class_bucket_protects_checkout():
+    limiter = make_limiter()
+
+    for i in range(3):
+        assert limiter.check("buyer.recommend_books_one", f"user-{i}") == 0
+    # 昂贵类别总令牌耗尽，新用户也被拒绝，但下单不受影响
+    assert limiter.check("buyer.recommend_books_one", "user-9") > 0
+    assert all(limiter.check("buyer.new_order", "user-9") == 0 for _ in range(100))
+
+
+def test_limiter_disabled_and_exempt_endpoints():
+    assert all(make_limiter(enabled=False).check("auth.search_book", "u1") == 0 for _ in range(10))
+    limiter = make_limiter()
+    assert all(limiter.check("shutdown.be_shutdown", "u1") == 0 for _ in range(10))
+
+
+def test_limiter_fails_open_when_store_errors():
+    class BrokenStore:
+        def consume(self, *args):
+            raise RuntimeError("store down")
+
+    assert make_limiter(bucket_store=BrokenStore()).check("auth.search_book", "u1") == 0
+
+
+def test_mysql_bucket_store_persists_refilled_tokens():
+    executed = []
+
+    class Result:
+        def __init__(self, row=None):
+            self.row = row
+
+        def fetchone(self):
+            return self.row
+
+    class Conn:
+        committed = False
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, statement, params=None):
+            executed.append((str(statement).strip(), params))
+            return Result((0.5, 99.0)) if len(executed) == 1 else Result()
+
+        def commit(self):
+            Conn.committed = True
+
+    class Engine:
+        def connect(self):
+            return Conn()
+
+    bucket_store = rate_limit_module.MySQLBucketStore(Engine())
+
+    assert bucket_store.consume("k", rate=1, burst=5, now=100.0) == 0
+    assert "FOR UPDATE" in executed[0][0]
+    assert executed[1][1] == {"key": "k", "tokens": pytest.approx(0.5), "now": 100.0}
+    assert Conn.committed
+
+
+def test_admission_control_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(serve_module, "rate_limiter", make_limiter())
+    app = Flask(__name__)
+    app.before_request(serve_module.admission_control)
+    app.add_url_rule(
+        "/search_book_regex", "auth.search_book_regex", lambda: jsonify({"message": "ok"}), methods=["POST"]
+    )
+    client = app.test_client()
+
+    codes = [client.post("/search_book_regex", json={"user_id": "u1"}).status_code for _ in range(3)]
+    response = client.post("/search_book_regex", json={"user_id": "u1"})
+
+    assert codes == [200, 200, 429]
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    # 请求体中的 user_id 不参与限流键：同一地址换 user_id 仍被拒绝，不同地址各自计数
+    assert client.post("/search_book_regex", json={"user_id": "u2"}).status_code == 429
+    other = client.post("/search_book_regex", json={"user_id": "u1"}, environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert other.status_code == 200
+
+
+def test_mysql_bucket_store_purges_idle_rows_in_batches():
+    executed = []
+    deleted = [2, 2, 1]
+
+    class Result:
+        def __init__(self, rowcount):
+            self.rowcount = rowcount
+
+    class Conn:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, statement, params=None):
+            executed.append((str(statement).strip(), params))
+            return Result(deleted.pop(0))
+
+        def commit(self):
+            pass
+
+    class Engine:
+        def connect(self):
+            return Conn()
+
+    bucket_store = rate_limit_module.MySQLBucketStore(Engine())
+
+    assert bucket_store.purge(idle_seconds=60, batch_size=2) == 5
+    assert len(executed) == 3
+    assert all(sql.startswith("DELETE FROM rate_limit_buckets WHERE updated_at <") for sql, _ in executed)
+
+
+def test_limiter_purge_delegates_to_shared_store():
+    purged = []
+
+    class SharedStore:
+        def purge(self):
+            purged.append(True)
+
+    make_limiter(bucket_store=SharedStore()).purge()
+    assert purged == [True]
@@ -115,3 +115,14 @@ class TestRecommendBooks:
 
 
 
+
+    def test_recommend_books_batch_ok(self):
+        code, results = self.auth.recommend_books_batch(self.buyer_ids, 5)
+        assert code == 200
+        assert [item["buyer_id"] for item in results] == self.buyer_ids
+        assert any(len(item["books"]) > 0 for item in results)
+
+    def test_recommend_books_batch_empty_ids(self):
+        code, results = self.auth.recommend_books_batch([], 5)
+        assert code == 400
+        assert results == []
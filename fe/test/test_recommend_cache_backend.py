@@ -0,0 +1,79 @@
+import pytest
+
+import be.model.recommend_cache as cache_module
+from be.model.recommend_cache import RecommendationCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", fake.time)
+    return fake
+
+
+def test_get_returns_none_on_miss_and_value_on_hit(clock):
+    cache = RecommendationCache(max_entries=10, ttl_seconds=60)
+    assert cache.get("u1", "cooccurrence", 5) is None
+
+    cache.put("u1", "cooccurrence", 5, [{"book_id": "b1"}])
+    assert cache.get("u1", "cooccurrence", 5) == [{"book_id": "b1"}]
+    assert cache.get("u1", "cooccurrence", 3) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = RecommendationCache(max_entries=10, ttl_seconds=30)
+    cache.put("u1", "collaborative", 5, ("ok", []))
+
+    clock.now += 29
+    assert cache.get("u1", "collaborative", 5) == ("ok", [])
+
+    clock.now += 2
+    assert cache.get("u1", "collaborative", 5) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    cache = RecommendationCache(max_entries=2, ttl_seconds=60)
+    cache.put("u1", "cooccurrence", 5, ["a"])
+    cache.put("u2", "cooccurrence", 5, ["b"])
+    assert cache.get("u1", "cooccurrence", 5) == ["a"]
+
+    cache.put("u3", "cooccurrence", 5, ["c"])
+
+    assert cache.get("u2", "cooccurrence", 5) is None
+    assert cache.get("u1", "cooccurrence", 5) == ["a"]
+    assert cache.get("u3", "cooccurrence", 5) == ["c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_user_drops_all_engines(clock):
+    cache = RecommendationCache(max_entries=10, ttl_seconds=60)
+    cache.put("u1", "cooccurrence", 5, ["a"])
+    cache.put("u1", "collaborative", 3, ("ok", ["b"]))
+    cache.put("u2", "cooccurrence", 5, ["c"])
+
+    cache.invalidate_user("u1")
+
+    assert cache.get("u1", "cooccurrence", 5) is None
+    assert cache.get("u1", "collaborative", 3) is None
+    assert cache.get("u2", "cooccurrence", 5) == ["c"]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_zero_capacity_disables_cache(clock):
+    cache = RecommendationCache(max_entries=0, ttl_seconds=60)
+    cache.put("u1", "cooccurrence", 5, ["a"])
+    assert cache.get("u1", "cooccurrence", 5) is None
@@ -81,12 +81,27 @@ class TestRecommendOne:
         assert code == 200
 
     def test_recommend_books_no_purchases(self):
-        # 测试没有购买记录的买家推荐情况
+        # 测试没有购买记录的买家推荐情况：以畅销榜兜底
         buyer_id = f"test_no_purchases_buyer_{uuid.uuid1()}"
         new_buyer = register_new_buyer(buyer_id, self.password)
         code, recommendations = new_buyer.get_recommendations_one(count=self.count)
-        assert code == 528
-        assert len(recommendations) == 0
+        assert code == 200
+        assert 0 < len(recommendations) <= self.count
+
+    def test_bestsellers_store(self):
+        code, books = self.buyer.get_bestsellers(store_id=self.store_id, window="1d", count=self.count)
+        assert code == 200
+        assert 0 < len(books) <= self.count
+        # 前两本书被主买家和 5 个相似买家各购买一次，应位居榜首
+        top_ids = {book["book_id"] for book in books[:2]}
+        assert top_ids == {book_id for book_id, _ in self.buy_book_id_list[:2]}
+        sales = [book["sales"] for book in books]
+        assert sales == sorted(sales, reverse=True)
+
+    def test_bestsellers_invalid_window(self):
+        code, books = self.buyer.get_bestsellers(window="2w")
+        assert code == 400
+        assert books == []
 
     def test_recommend_books_invalid_user(self):
         # 测试不存在的用户推荐情况
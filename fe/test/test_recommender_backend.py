@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import pytest
+
+import be.model.recommender as recommender_module
+from be.model.recommender import (
+    CooccurrenceRecommender,
+    Recommender,
+    get_recommender,
+    recommend,
+    register_recommender,
+)
+
+
+class ResultStub:
+    def __init__(self, *, fetchone=None, fetchall=None):
+        self._fetchone = fetchone
+        self._fetchall = fetchall
+
+    def fetchone(self):
+        return self._fetchone
+
+    def fetchall(self):
+        return list(self._fetchall or [])
+
+    def mappings(self):
+        return self
+
+
+class ConnectionStub:
+    def __init__(self, execute_plan):
+        self.execute_plan = list(execute_plan)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement).strip(), params))
+        return self.execute_plan.pop(0) if self.execute_plan else ResultStub()
+
+
+class EngineStub:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def connect(self):
+        return self.connection
+
+
+class FixedRecommender(Recommender):
+    name = "fixed"
+
+    def __init__(self):
+        self.calls = 0
+
+    def recommend(self, engine, user_id, n, before=None):
+        self.calls += 1
+        return 200, "ok", [{"book_id": f"b{i}"} for i in range(n)]
+
+
+@pytest.fixture(autouse=True)
+def isolate_registry(monkeypatch):
+    monkeypatch.setattr(recommender_module, "RECOMMENDERS", dict(recommender_module.RECOMMENDERS))
+    monkeypatch.delenv(recommender_module.DEFAULT_ENGINE_ENV, raising=False)
+    for endpoint in ("AUTH", "BUYER"):
+        monkeypatch.delenv(recommender_module.ENDPOINT_ENGINE_ENV.format(endpoint), raising=False)
+    recommender_module.recommend_cache.clear()
+    yield
+    recommender_module.recommend_cache.clear()
+
+
+def test_builtin_engines_are_registered():
+    assert get_recommender("cooccurrence").name == "cooccurrence"
+    assert get_recommender("collaborative").name == "collaborative"
+    assert get_recommender().name == "cooccurrence"
+
+
+def test_engine_selected_by_environment(monkeypatch):
+    fixed = register_recommender(FixedRecommender())
+    monkeypatch.setenv(recommender_module.DEFAULT_ENGINE_ENV, "fixed")
+    assert get_recommender() is fixed
+    # 请求参数优先于环境变量
+    assert get_recommender("collaborative").name == "collaborative"
+
+
+def test_endpoint_environment_overrides_global_for_that_endpoint_only(monkeypatch):
+    fixed = register_recommender(FixedRecommender())
+    monkeypatch.setenv(recommender_module.ENDPOINT_ENGINE_ENV.format("AUTH"), "fixed")
+    assert get_recommender(default="cooccurrence", endpoint="auth") is fixed
+    assert get_recommender(default="collaborative", endpoint="buyer").name == "collaborative"
+    # 全局环境变量作用于所有接口，接口环境变量优先
+    monkeypatch.setenv(recommender_module.DEFAULT_ENGINE_ENV, "minhash")
+    assert get_recommender(default="collaborative", endpoint="buyer").name == "minhash"
+    assert get_recommender(default="cooccurrence", endpoint="auth") is fixed
+
+
+def test_recommender_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Recommender()
+
+
+def test_recommend_unknown_engine_returns_400():
+    code, message, books = recommend(None, "u1", 5, name="nope")
+    assert code == 400
+    assert "nope" in message
+    assert books == []
+
+
+def test_recommend_caches_per_engine():
+    fixed = register_recommender(FixedRecommender())
+    first = recommend(None, "u1", 2, name="fixed")
+    second = recommend(None, "u1", 2, name="fixed")
+    assert first == second == (200, "ok", [{"book_id": "b0"}, {"book_id": "b1"}])
+    assert fixed.calls == 1
+
+
+def test_cooccurrence_applies_time_cutoff():
+    connection = ConnectionStub([
+        ResultStub(fetchall=[("o1",)]),
+        ResultStub(fetchall=[("b1",)]),
+        ResultStub(fetchall=[]),
+    ])
+    cutoff = datetime(2024, 1, 1)
+    code, message, books = CooccurrenceRecommender().recommend(EngineStub(connection), "u1", 5, before=cutoff)
+
+    assert (code, message, books) == (200, "ok", [])
+    assert "commit_time < :before" in connection.executed[0][0]
+    assert "h.commit_time < :before" in connection.executed[2][0]
+    assert connection.executed[2][1]["before"] == cutoff
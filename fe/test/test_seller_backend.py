@@ -7,9 +7,10 @@ from be.model import error
 
 
 class ResultStub:
-    def __init__(self, fetchone=None, scalar=None):
+    def __init__(self, fetchone=None, scalar=None, rowcount=1):
         self._fetchone = fetchone
         self._scalar = scalar
+        self.rowcount = rowcount
 
     def fetchone(self):
         return self._fetchone
@@ -106,9 +107,8 @@ def test_add_book_invalid_json_returns_400(seller_instance):
 
 
 def test_add_book_flattens_tag_list(seller_instance):
-    context_store = ConnectionStub()
-    context_book = ConnectionStub()
-    seller_instance.conn = EngineStub([context_store, context_book])
+    context = ConnectionStub()
+    seller_instance.conn = EngineStub([context])
 
     book_info = {
         "tags": ["tech", "python"],
@@ -133,8 +133,9 @@ def test_add_book_flattens_tag_list(seller_instance):
         "uid", "sid", "bid", json.dumps(book_info), 10
     )
     assert (code, message) == (200, "ok")
-    _, params = context_book.last_execute
+    _, params = context.last_execute
     assert params["tags"] == "tech\npython"
+    assert context.transaction.committed
 
 
 def test_add_book_handles_unexpected_exception(seller_instance):
@@ -275,4 +276,490 @@ def test_delivery_order_outer_exception(seller_instance):
 
     code, message = seller_instance.delivery_order("sid", "oid")
     assert code == 528
-    assert "发货时发生未知错误" in message
\ No newline at end of file
+    assert "发货时发生未知错误" in message
+
+class RowsResult:
+    def __init__(self, rows=None, fetchone=None):
+        self._rows = rows or []
+        self._fetchone = fetchone
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._fetchone
+
+
+def sequenced(results, executed):
+    results = list(results)
+
+    def _execute(query, params):
+        executed.append((str(query).strip(), params))
+        return results.pop(0) if results else RowsResult()
+
+    return _execute
+
+
+def make_book(book_id, **overrides):
+    info = {field: "" for field in seller_module.REQUIRED_BOOK_FIELDS}
+    info.update({"id": book_id, "tags": ["t1", "t2"], "price": 10, "pages": 1})
+    info.update(overrides)
+    return info
+
+
+def test_add_books_reports_per_book_status(seller_instance):
+    validate_executed, insert_executed = [], []
+    validate = ConnectionStub(execute_side_effect=sequenced(
+        [RowsResult(fetchone=(1, 1, 1)), RowsResult(rows=[("in-store",)])], validate_executed
+    ))
+    insert = ConnectionStub(execute_side_effect=sequenced(
+        [RowsResult(rows=[]), RowsResult(), RowsResult()], insert_executed
+    ))
+    seller_instance.conn = EngineStub([validate, insert])
+    broken = make_book("broken")
+    del broken["title"]
+
+    code, message, results = seller_instance.add_books("uid", "sid", [
+        make_book("b1"), make_book("in-store"), make_book("b2"), broken, make_book("b1"), {"title": "no id"},
+    ], 5)
+
+    assert (code, message) == (200, "ok")
+    assert [(r["book_id"], r["code"]) for r in results] == [
+        ("b1", 200), ("in-store", 516), ("b2", 200), ("broken", 400), ("b1", 516), (None, 400),
+    ]
+    # 一个事务：锁定查询已在店内的书，stores 多行插入，new_books 多行插入（目录中已有的 book_id 保持不变）
+    assert insert.transaction.committed
+    assert len(insert_executed) == 3
+    assert "FOR UPDATE" in insert_executed[0][0]
+    assert insert_executed[0][1]["book_ids"] == ["b1", "b2"]
+    stores_sql, stores_params = insert_executed[1]
+    assert stores_sql.startswith("INSERT INTO stores") and "ON DUPLICATE KEY UPDATE" not in stores_sql
+    assert (stores_params["book_id_0"], stores_params["book_id_1"]) == ("b1", "b2")
+    books_sql, books_params = insert_executed[2]
+    assert books_sql.startswith("INSERT INTO new_books") and "ON DUPLICATE KEY UPDATE book_id = book_id" in books_sql
+    assert (books_params["book_id_0"], books_params["book_id_1"]) == ("b1", "b2")
+    assert books_params["tags_0"] == "t1\nt2"
+
+
+def test_add_books_missing_store_returns_513(seller_instance):
+    validate = ConnectionStub(result=RowsResult(fetchone=(1, 0, 0)))
+    seller_instance.conn = EngineStub([validate])
+
+    code, _, results = seller_instance.add_books("uid", "sid", [make_book("b1")], 5)
+
+    assert code == 513
+    assert results == []
+
+
+def test_add_books_reports_concurrently_listed_books_as_existing(seller_instance):
+    insert_executed = []
+    validate = ConnectionStub(execute_side_effect=sequenced([RowsResult(fetchone=(1, 1, 1)), RowsResult()], []))
+    insert = ConnectionStub(execute_side_effect=sequenced(
+        [RowsResult(rows=[("b1",)]), RowsResult(), RowsResult()], insert_executed
+    ))
+    seller_instance.conn = EngineStub([validate, insert])
+
+    code, _, results = seller_instance.add_books("uid", "sid", [make_book("b1"), make_book("b2")], 5)
+
+    assert code == 200
+    assert [(r["book_id"], r["code"]) for r in results] == [("b1", 516), ("b2", 200)]
+    stores_params = insert_executed[1][1]
+    assert stores_params["book_id_0"] == "b2" and "book_id_1" not in stores_params
+
+
+def test_add_books_skips_writes_when_whole_chunk_exists(seller_instance):
+    insert_executed = []
+    validate = ConnectionStub(execute_side_effect=sequenced([RowsResult(fetchone=(1, 1, 1)), RowsResult()], []))
+    insert = ConnectionStub(execute_side_effect=sequenced([RowsResult(rows=[("b1",)])], insert_executed))
+    seller_instance.conn = EngineStub([validate, insert])
+
+    _, _, results = seller_instance.add_books("uid", "sid", [make_book("b1")], 5)
+
+    assert results[0]["code"] == 516
+    assert len(insert_executed) == 1
+    assert insert.transaction.committed
+
+
+def test_add_books_rejects_non_string_ids_per_book(seller_instance):
+    validate_executed = []
+    validate = ConnectionStub(execute_side_effect=sequenced(
+        [RowsResult(fetchone=(1, 1, 1)), RowsResult()], validate_executed
+    ))
+    insert = ConnectionStub(execute_side_effect=sequenced([RowsResult(rows=[]), RowsResult(), RowsResult()], []))
+    seller_instance.conn = EngineStub([validate, insert])
+
+    code, _, results = seller_instance.add_books("uid", "sid", [
+        make_book(["b1"]), make_book({"id": "b2"}), make_book(7), make_book("b3"),
+    ], 5)
+
+    # 不可哈希的 id 不会引发 TypeError，逐本返回 400
+    assert code == 200
+    assert [r["code"] for r in results] == [400, 400, 400, 200]
+    assert validate_executed[1][1]["book_ids"] == ["b3"]
+
+
+def test_add_books_rejects_store_owned_by_another_user(seller_instance):
+    validate = ConnectionStub(result=RowsResult(fetchone=(1, 1, 0)))
+    seller_instance.conn = EngineStub([validate])
+
+    code, _, results = seller_instance.add_books("intruder", "sid", [make_book("b1")], 5)
+
+    assert code == error.error_authorization_fail()[0]
+    assert results == []
+
+
+def test_add_books_chunk_failure_marks_only_that_chunk(monkeypatch, seller_instance):
+    monkeypatch.setattr(seller_module, "ADD_BOOKS_CHUNK", 1)
+    validate = ConnectionStub(execute_side_effect=sequenced(
+        [RowsResult(fetchone=(1, 1, 1)), RowsResult()], []
+    ))
+    ok_chunk = ConnectionStub(execute_side_effect=sequenced([], []))
+    failed_chunk = ConnectionStub(execute_side_effect=sa_exc.SQLAlchemyError("boom"))
+    seller_instance.conn = EngineStub([validate, ok_chunk, failed_chunk])
+
+    code, _, results = seller_instance.add_books("uid", "sid", [make_book("b1"), make_book("b2")], 5)
+
+    assert code == 200
+    assert [r["code"] for r in results] == [200, 528]
+    assert failed_chunk.transaction.rolled_back
+
+
+def test_add_books_rejects_oversized_request(monkeypatch, seller_instance):
+    monkeypatch.setattr(seller_module, "ADD_BOOKS_MAX", 1)
+
+    code, _, _ = seller_instance.add_books("uid", "sid", [make_book("b1"), make_book("b2")], 5)
+
+    assert code == 400
+
+
+def test_add_book_guarded_insert_uses_single_transaction(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([ResultStub(rowcount=1), ResultStub()], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _ = seller_instance.add_book("uid", "sid", "bid", json.dumps(make_book("bid")), 3)
+
+    assert code == 200
+    assert len(executed) == 2
+    guard_sql, guard_params = executed[0]
+    assert guard_sql.startswith("INSERT INTO stores") and "JOIN users" in guard_sql
+    assert guard_params["user_id"] == "uid" and guard_params["store_id"] == "sid"
+    assert executed[1][0].startswith("INSERT INTO new_books")
+    assert context.transaction.committed
+
+
+@pytest.mark.parametrize("exists, expected", [
+    ((0, 1), 511),
+    ((1, 0), 513),
+    ((1, 1), 401),
+])
+def test_add_book_guard_miss_reports_reason(seller_instance, exists, expected):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced(
+        [ResultStub(rowcount=0), RowsResult(fetchone=exists)], executed
+    ))
+    seller_instance.conn = EngineStub([context])
+
+    code, _ = seller_instance.add_book("uid", "sid", "bid", json.dumps(make_book("bid")), 3)
+
+    assert code == expected
+    assert context.transaction.rolled_back
+    assert not any(sql.startswith("INSERT INTO new_books") for sql, _ in executed)
+
+
+def test_add_book_duplicate_returns_516(seller_instance):
+    context = ConnectionStub(execute_side_effect=sa_exc.IntegrityError("stmt", {}, Exception("dup")))
+    seller_instance.conn = EngineStub([context])
+
+    code, _ = seller_instance.add_book("uid", "sid", "bid", json.dumps(make_book("bid")), 3)
+
+    assert code == 516
+    assert context.transaction.rolled_back
+
+
+def test_add_stock_levels_applies_all_deltas_in_one_update(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        RowsResult(rows=[("b1", 5), ("b2", 1)]),
+        RowsResult(),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, message, results = seller_instance.add_stock_levels("uid", "sid", [
+        {"book_id": "b1", "delta": 3},
+        {"book_id": "b2", "delta": -2},
+        {"book_id": "b1", "delta": 2},
+        {"book_id": "missing", "delta": 1},
+        {"book_id": "b3", "delta": 0},
+    ])
+
+    assert (code, message) == (200, "ok")
+    assert [(r["book_id"], r["code"], r["stock_level"]) for r in results] == [
+        ("b1", 200, 10), ("b2", 517, 1), ("missing", 515, None), ("b3", 400, None),
+    ]
+    assert "FOR UPDATE" in executed[1][0]
+    update_sql, update_params = executed[2]
+    assert update_sql.startswith("UPDATE stores s") and "UNION ALL" not in update_sql
+    assert update_params == {"store_id": "sid", "book_id_0": "b1", "delta_0": 5}
+    assert context.transaction.committed
+
+
+def test_add_stock_levels_builds_union_all_derived_table(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        RowsResult(rows=[("b1", 0), ("b2", 0)]),
+        RowsResult(),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, _ = seller_instance.add_stock_levels("uid", "sid", [
+        {"book_id": "b1", "delta": 1}, {"book_id": "b2", "delta": 2},
+    ])
+
+    assert code == 200
+    assert len(executed) == 3
+    assert "UNION ALL" in executed[2][0] and "JOIN" in executed[2][0]
+
+
+@pytest.mark.parametrize("exists, expected", [
+    ((0, 0, 0), 511),
+    ((1, 0, 0), 513),
+    ((1, 1, 0), 401),
+])
+def test_add_stock_levels_checks_user_and_store(seller_instance, exists, expected):
+    context = ConnectionStub(result=RowsResult(fetchone=exists))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, results = seller_instance.add_stock_levels("uid", "sid", [{"book_id": "b1", "delta": 1}])
+
+    assert code == expected
+    assert results == []
+    assert context.transaction.rolled_back
+
+
+def test_add_stock_levels_database_error_rolls_back(seller_instance):
+    executed = []
+
+    def failing(query, params):
+        if executed:
+            raise sa_exc.SQLAlchemyError("lock wait timeout")
+        executed.append(query)
+        return RowsResult(fetchone=(1, 1, 1))
+
+    context = ConnectionStub(execute_side_effect=failing)
+    seller_instance.conn = EngineStub([context])
+
+    code, _, _ = seller_instance.add_stock_levels("uid", "sid", [{"book_id": "b1", "delta": 1}])
+
+    assert code == 528
+    assert context.transaction.rolled_back
+
+
+class MappingsResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+def order_row(row_id, order_id, minute, status=1):
+    return {
+        "_id": row_id,
+        "order_id": order_id,
+        "user_id": "buyer",
+        "status": status,
+        "commit_time": seller_module.datetime(2024, 1, 1, 12, minute),
+    }
+
+
+def test_list_orders_uses_keyset_pagination(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([order_row(3, "o3", 30), order_row(2, "o2", 20), order_row(1, "o1", 10)]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, result = seller_instance.list_orders("uid", "sid", status=1, limit=2)
+
+    assert code == 200
+    assert [o["order_id"] for o in result["orders"]] == ["o3", "o2"]
+    assert seller_module.decode_order_cursor(result["next_cursor"]) == (seller_module.datetime(2024, 1, 1, 12, 20), 2)
+    sql, params = executed[1]
+    assert "status = :status" in sql and "ORDER BY commit_time DESC, _id DESC" in sql
+    assert params["limit"] == 3
+
+
+def test_list_orders_applies_cursor_and_time_window(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([order_row(1, "o1", 10)]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+    cursor = seller_module.encode_order_cursor(seller_module.datetime(2024, 1, 1, 12, 20), 2)
+    start = seller_module.datetime(2024, 1, 1)
+
+    code, _, result = seller_instance.list_orders("uid", "sid", start_time=start, limit=2, cursor=cursor)
+
+    assert code == 200
+    assert result["next_cursor"] is None
+    sql, params = executed[1]
+    assert "status = :status" not in sql
+    assert "commit_time >= :start_time" in sql and "_id < :cursor_id" in sql
+    assert params["cursor_id"] == 2 and params["start_time"] == start
+
+
+def test_list_orders_pages_across_orders_without_commit_time(seller_instance):
+    untimed = dict(order_row(5, "o5", 0), commit_time=None)
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([order_row(3, "o3", 30), untimed, dict(untimed, _id=4, order_id="o4")]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, result = seller_instance.list_orders("uid", "sid", limit=2)
+
+    # 本页最后一条订单 commit_time 为空：游标仍可编码，不抛出异常
+    assert code == 200
+    assert result["orders"][1] == {"order_id": "o5", "buyer_id": "buyer", "status": 1, "commit_time": None}
+    assert seller_module.decode_order_cursor(result["next_cursor"]) == (None, 5)
+
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([dict(untimed, _id=4, order_id="o4")]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, result = seller_instance.list_orders("uid", "sid", limit=2, cursor=result["next_cursor"])
+
+    assert code == 200
+    assert [o["order_id"] for o in result["orders"]] == ["o4"]
+    assert result["next_cursor"] is None
+    sql, params = executed[1]
+    assert "commit_time IS NULL AND _id < :cursor_id" in sql
+    assert params["cursor_id"] == 5 and params["cursor_time"] is None
+
+
+def test_list_orders_cursor_after_timed_order_keeps_untimed_orders(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+    cursor = seller_module.encode_order_cursor(seller_module.datetime(2024, 1, 1, 12, 20), 2)
+
+    code, _, _ = seller_instance.list_orders("uid", "sid", cursor=cursor)
+
+    assert code == 200
+    assert "OR commit_time IS NULL" in executed[1][0]
+
+
+def test_list_orders_includes_items_in_one_query(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        RowsResult(fetchone=(1, 1, 1)),
+        MappingsResult([order_row(2, "o2", 20), order_row(1, "o1", 10)]),
+        MappingsResult([
+            {"order_id": "o1", "book_id": "b1", "count": 2, "price": 10},
+            {"order_id": "o1", "book_id": "b2", "count": 1, "price": 5},
+        ]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, result = seller_instance.list_orders("uid", "sid", include_items=True)
+
+    assert code == 200
+    assert len(executed) == 3
+    assert executed[2][1] == {"order_ids": ["o2", "o1"]}
+    assert result["orders"][0]["items"] == []
+    assert [item["book_id"] for item in result["orders"][1]["items"]] == ["b1", "b2"]
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({"limit": 0}, 400),
+    ({"limit": 1000}, 400),
+    ({"cursor": "not-a-cursor"}, 400),
+])
+def test_list_orders_validates_arguments(seller_instance, kwargs, expected):
+    seller_instance.conn = EngineStub([])
+
+    code, _, _ = seller_instance.list_orders("uid", "sid", **kwargs)
+
+    assert code == expected
+
+
+@pytest.mark.parametrize("exists, expected", [((0, 0), 513), ((1, 0), 401)])
+def test_list_orders_checks_store_owner(seller_instance, exists, expected):
+    seller_instance.conn = EngineStub([ConnectionStub(result=RowsResult(fetchone=exists))])
+
+    code, _, _ = seller_instance.list_orders("uid", "sid")
+
+    assert code == expected
+
+
+def test_delivery_orders_validates_in_one_query_and_updates_once(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        ResultStub(scalar=1),
+        RowsResult(rows=[("o1", "sid", 1), ("o2", "other", 1), ("o3", "sid", 2), ("o4", "sid", 1)]),
+        ResultStub(rowcount=2),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, message, results = seller_instance.delivery_orders("sid", ["o1", "o2", "o3", "missing", "o4", "o1"])
+
+    assert (code, message) == (200, "ok")
+    assert [(r["order_id"], r["code"]) for r in results] == [
+        ("o1", 200), ("o2", 524), ("o3", 525), ("missing", 518), ("o4", 200),
+    ]
+    assert len(executed) == 3
+    assert "FOR UPDATE" in executed[1][0]
+    update_sql, update_params = executed[2]
+    assert update_sql.startswith("UPDATE history_order") and "status = 1" in update_sql
+    assert update_params == {"order_ids": ["o1", "o4"], "store_id": "sid"}
+    assert context.transaction.committed
+
+
+def test_delivery_orders_missing_store_returns_513(seller_instance):
+    context = ConnectionStub(result=ResultStub(scalar=0))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, results = seller_instance.delivery_orders("sid", ["o1"])
+
+    assert code == 513
+    assert results == []
+    assert context.transaction.rolled_back
+
+
+def test_delivery_orders_skips_update_when_nothing_eligible(seller_instance):
+    executed = []
+    context = ConnectionStub(execute_side_effect=sequenced([
+        ResultStub(scalar=1), RowsResult(rows=[("o1", "sid", 3)]),
+    ], executed))
+    seller_instance.conn = EngineStub([context])
+
+    code, _, results = seller_instance.delivery_orders("sid", ["o1"])
+
+    assert code == 200
+    assert results[0]["code"] == 525
+    assert len(executed) == 2
+
+
+@pytest.mark.parametrize("order_ids", ["o1", [""], [1]])
+def test_delivery_orders_rejects_malformed_input(seller_instance, order_ids):
+    seller_instance.conn = EngineStub([])
+
+    assert seller_instance.delivery_orders("sid", order_ids)[0] == 400
@@ -10,6 +10,9 @@ class DummyResult:
     def scalar(self):
         return self._scalar_value
 
+    def fetchall(self):
+        return []
+
 
 class ConnectionStub:
     """
@@ -33,6 +36,9 @@ class ConnectionStub:
             return DummyResult(next(self._scalar_iter, 0))
         return DummyResult()
 
+    def commit(self):
+        self.recorder.append(("COMMIT", None))
+
 
 class EngineStub:
     def __init__(self, connection):
@@ -44,11 +50,18 @@ class EngineStub:
 
 INDEX_NAMES = [
     "idx_users_user_id",
+    "idx_user_sessions_expire_at",
+    "idx_token_revocations_expire_at",
+    "idx_rate_limit_buckets_updated_at",
     "unique_store_user_book",
     "idx_new_order_order_id",
     "idx_new_order_detail_order_id_book_id",
     "idx_history_order_order_id",
+    "idx_history_order_store_status_time",
     "idx_history_order_detail_order_id_book_id",
+    "idx_book_sales_daily_date",
+    "idx_generated_titles_input_hash",
+    "uniq_new_books_book_id",
     "idx_new_books_title_tags",
 ]
 
@@ -82,6 +95,19 @@ def test_init_tables_skips_existing_indexes(monkeypatch):
     assert created_indexes == []
 
 
+def test_init_tables_adds_missing_generated_titles_columns(monkeypatch):
+    executed = []
+    connection = ConnectionStub([1] * len(INDEX_NAMES), executed)
+    engine = EngineStub(connection)
+
+    monkeypatch.setattr(store_module, "create_engine", lambda *args, **kwargs: engine)
+    store_module.Store("sqlite:///dummy")
+
+    alters = [sql for sql, _ in executed if sql.startswith("ALTER TABLE generated_titles")]
+    assert any("input_hash" in sql for sql in alters)
+    assert any("model_id" in sql for sql in alters)
+
+
 def test_index_exists_returns_boolean(monkeypatch):
     executed = []
     connection = ConnectionStub([1], executed)
@@ -94,4 +120,107 @@ def test_index_exists_returns_boolean(monkeypatch):
     assert result is True
     sql, params = executed[0]
     assert "INFORMATION_SCHEMA.STATISTICS" in sql
-    assert params == {"table_name": "users", "index_name": "idx_users_user_id"}
\ No newline at end of file
+    assert params == {"table_name": "users", "index_name": "idx_users_user_id"}
+
+def test_init_tables_skips_session_migration_without_legacy_columns(monkeypatch):
+    executed = []
+    connection = ConnectionStub([1] * len(INDEX_NAMES), executed)
+    monkeypatch.setattr(store_module, "create_engine", lambda *args, **kwargs: EngineStub(connection))
+    store_module.Store("sqlite:///dummy")
+
+    statements = [sql for sql, _ in executed]
+    assert not any("user_sessions (user_id, terminal, token, expire_at)" in sql and "INSERT" in sql for sql in statements)
+    assert not any(sql.startswith("ALTER TABLE users") for sql in statements)
+
+
+class LegacySessionConnection(ConnectionStub):
+    def __init__(self, rows, recorder):
+        super().__init__([], recorder)
+        self.rows = rows
+
+    def execute(self, statement, params=None):
+        result = super().execute(statement, params)
+        if str(statement).strip().startswith("SELECT user_id, terminal, token FROM users"):
+            result.fetchall = lambda: self.rows
+        return result
+
+
+def test_migrate_legacy_sessions_keeps_original_expiry(monkeypatch):
+    now = store_module.time.time()
+    live = store_module.jwt.encode({"user_id": "u1", "terminal": "t1", "timestamp": now - 60}, key="u1", algorithm="HS256")
+    expired = store_module.jwt.encode({"user_id": "u2", "terminal": "t2", "timestamp": now - 10 ** 5}, key="u2",
+                                      algorithm="HS256")
+    executed = []
+    connection = LegacySessionConnection([("u1", "t1", live), ("u2", "t2", expired), ("u3", "t3", "garbage")], executed)
+    store_obj = store_module.Store.__new__(store_module.Store)
+
+    store_obj.migrate_legacy_sessions(connection)
+
+    statements = [sql for sql, _ in executed]
+    insert_index = next(i for i, sql in enumerate(statements) if sql.startswith("INSERT IGNORE INTO user_sessions"))
+    sessions = executed[insert_index][1]
+    assert [s["user_id"] for s in sessions] == ["u1"]
+    assert sessions[0]["expire_at"] == pytest.approx(now - 60 + store_module.SESSION_LIFETIME_SECONDS)
+    clear_index = next(i for i, sql in enumerate(statements) if sql.startswith("UPDATE users SET token = NULL"))
+    assert insert_index < clear_index < statements.index("COMMIT")
+    # 默认保留旧列，不执行不可回滚的 DROP COLUMN
+    assert not any(sql.startswith("ALTER TABLE users") for sql in statements)
+
+
+def test_migrate_legacy_sessions_drops_columns_only_when_requested(caplog):
+    executed = []
+    connection = LegacySessionConnection([], executed)
+    store_obj = store_module.Store.__new__(store_module.Store)
+
+    with caplog.at_level("WARNING"):
+        store_obj.migrate_legacy_sessions(connection, drop_columns=True)
+
+    statements = [sql for sql, _ in executed]
+    assert "ALTER TABLE users DROP COLUMN token, DROP COLUMN terminal" in statements
+    assert statements[-1] == "COMMIT"
+    assert any("cannot be undone" in record.message for record in caplog.records)
+
+
+def test_init_tables_dedupes_new_books_before_unique_key(monkeypatch):
+    executed = []
+    connection = ConnectionStub([0] * len(INDEX_NAMES), executed)
+    monkeypatch.setattr(store_module, "create_engine", lambda *args, **kwargs: EngineStub(connection))
+    store_module.Store("sqlite:///dummy")
+
+    statements = [sql for sql, _ in executed]
+    dedupe_index = next(i for i, sql in enumerate(statements) if sql.startswith("DELETE nb FROM new_books"))
+    unique_index = next(i for i, sql in enumerate(statements) if "uniq_new_books_book_id ON new_books" in sql)
+    assert dedupe_index < unique_index
+    dedupe_sql = statements[dedupe_index]
+    assert "GROUP BY book_id" in dedupe_sql and "nb._id <> d.keep_id" in dedupe_sql
+
+
+def test_init_tables_migrates_legacy_store_rows(monkeypatch):
+    executed = []
+    connection = ConnectionStub([1] * len(INDEX_NAMES), executed)
+    monkeypatch.setattr(store_module, "create_engine", lambda *args, **kwargs: EngineStub(connection))
+    store_module.Store("sqlite:///dummy")
+
+    statements = [sql for sql, _ in executed]
+    create_index = next(i for i, sql in enumerate(statements) if sql.startswith("CREATE TABLE IF NOT EXISTS store ("))
+    copy_index = next(i for i, sql in enumerate(statements) if sql.startswith("INSERT IGNORE INTO store "))
+    delete_index = statements.index("DELETE FROM stores WHERE book_id IS NULL")
+    assert create_index < copy_index < delete_index
+    assert statements[delete_index + 1] == "COMMIT"
+
+
+def test_init_tables_migrates_sessions_while_legacy_columns_exist(monkeypatch):
+    executed = []
+    connection = ConnectionStub([1] * len(INDEX_NAMES), executed)
+    migrated = []
+    monkeypatch.setattr(store_module, "create_engine", lambda *args, **kwargs: EngineStub(connection))
+    monkeypatch.setattr(store_module.Store, "column_exists",
+                        lambda self, conn, table, column: (table, column) == ("users", "token"))
+    monkeypatch.setattr(store_module.Store, "migrate_legacy_sessions",
+                        lambda self, conn, drop_columns: migrated.append((conn, drop_columns)))
+    monkeypatch.delenv(store_module.DROP_LEGACY_SESSION_COLUMNS_ENV, raising=False)
+    store_module.Store("sqlite:///dummy")
+    monkeypatch.setenv(store_module.DROP_LEGACY_SESSION_COLUMNS_ENV, "1")
+    store_module.Store("sqlite:///dummy")
+
+    assert migrated == [(connection, False), (connection, True)]
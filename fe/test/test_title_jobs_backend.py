@@ -0,0 +1,91 @@
+import threading
+
+from be.model.title_jobs import TitleJobPool, fail_stale_title_jobs, JOB_FAILED, JOB_PENDING, JOB_RUNNING
+
+
+def test_submit_runs_job_and_signals_waiters():
+    pool = TitleJobPool(max_workers=1, max_pending=2)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def job(value):
+        started.set()
+        release.wait(5)
+        calls.append(value)
+
+    assert pool.submit("j1", job, "a")
+    assert started.wait(5)
+    assert pool.wait("j1", 0.01) is False
+    release.set()
+    assert pool.wait("j1", 5) is True
+    assert calls == ["a"]
+    # 已结束的任务不再阻塞长轮询
+    assert pool.wait("j1", 5) is False
+
+
+def test_submit_rejects_when_queue_is_full():
+    pool = TitleJobPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    assert pool.submit("j1", release.wait, 5)
+    assert pool.submit("j2", release.wait, 5) is False
+    assert pool.pending() == 1
+
+    release.set()
+    assert pool.wait("j1", 5)
+    assert pool.submit("j3", lambda: None)
+
+
+def test_crashing_job_releases_its_slot():
+    pool = TitleJobPool(max_workers=1, max_pending=1)
+
+    def broken():
+        raise RuntimeError("boom")
+
+    assert pool.submit("j1", broken)
+    pool.wait("j1", 5)
+    assert pool.submit("j2", lambda: None)
+
+
+class UpdateResult:
+    rowcount = 2
+
+
+class ConnectionStub:
+    def __init__(self):
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement), params))
+        return UpdateResult()
+
+    def commit(self):
+        self.executed.append(("COMMIT", None))
+
+
+class EngineStub:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self.conn
+
+
+def test_fail_stale_title_jobs_marks_interrupted_jobs_failed():
+    conn = ConnectionStub()
+
+    assert fail_stale_title_jobs(EngineStub(conn), stale_seconds=120) == 2
+
+    sql, params = conn.executed[0]
+    assert "UPDATE title_jobs" in sql and "updated_at < NOW() - INTERVAL :stale_seconds SECOND" in sql
+    assert params["failed"] == JOB_FAILED
+    assert (params["pending"], params["running"]) == (JOB_PENDING, JOB_RUNNING)
+    assert params["stale_seconds"] == 120
+    assert conn.executed[-1] == ("COMMIT", None)
@@ -0,0 +1,77 @@
+from be.model.title_matcher import AhoCorasick, CatalogTitleMatcher, fast_extract_titles
+
+
+class ResultStub:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+class ConnectionStub:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        self.executed.append(str(statement))
+        return ResultStub(self.rows)
+
+
+class EngineStub:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def connect(self):
+        return self.connection
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    found = sorted(automaton.find_all("ushers"))
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_matcher_prefers_longest_title_and_skips_short_ones():
+    matcher = CatalogTitleMatcher()
+    matcher.build(["三体", "三体II", "活", "活着", None, "  "])
+
+    assert matcher.match("最近看完了三体II和活着") == ["三体II", "活着"]
+    assert matcher.match("没有目录中的书") == []
+
+
+def test_matcher_load_reads_catalog_titles():
+    connection = ConnectionStub([("百年孤独",), ("围城",)])
+    matcher = CatalogTitleMatcher()
+    assert not matcher.loaded
+
+    matcher.load(EngineStub(connection))
+    assert matcher.loaded
+    assert "new_books" in connection.executed[0]
+    assert matcher.match("推荐类似围城的小说") == ["围城"]
+
+
+def test_fast_extract_combines_brackets_and_catalog_in_order():
+    matcher = CatalogTitleMatcher()
+    matcher.build(["围城", "活着"])
+
+    assert fast_extract_titles("《活着》之后读了围城，又读了《 平凡的世界 》", matcher) == ["活着", "平凡的世界", "围城"]
+    assert fast_extract_titles("随便推荐几本", matcher) == []
+    assert fast_extract_titles("《》", CatalogTitleMatcher()) == []
+
+
+def test_matcher_skips_common_words_and_generic_short_titles():
+    matcher = CatalogTitleMatcher()
+    matcher.build(["小说", "中国", "中国历史", "中国哲学简史", "围城"])
+
+    # “小说”是常用词，“中国”出现在多个其他书名中：普通文本不应命中快速路径
+    assert matcher.match("最近想找一本关于中国农村生活的小说") == []
+    assert matcher.match("读完中国历史再读围城") == ["中国历史", "围城"]
+
@@ -0,0 +1,240 @@
+import threading
+import time
+
+import pytest
+
+import be.model.title_model as title_model_module
+from be.model.title_model import ModelRegistry
+
+
+class DummyModel:
+    def __init__(self):
+        self.evaluated = False
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        self.evaluated = True
+        return self
+
+
+@pytest.fixture
+def load_counter(monkeypatch):
+    calls = {"tokenizer": 0, "model": 0}
+
+    def load_tokenizer(*args, **kwargs):
+        calls["tokenizer"] += 1
+        return object()
+
+    def load_model(*args, **kwargs):
+        calls["model"] += 1
+        time.sleep(0.01)
+        return DummyModel()
+
+    monkeypatch.setattr(title_model_module.transformers.AutoTokenizer, "from_pretrained", load_tokenizer)
+    monkeypatch.setattr(title_model_module.transformers.AutoModelForSeq2SeqLM, "from_pretrained", load_model)
+    monkeypatch.setattr(title_model_module.torch.cuda, "is_available", lambda: False)
+    return calls
+
+
+def test_get_loads_each_model_once_in_eval_mode(load_counter):
+    registry = ModelRegistry()
+    first = registry.get("m1")
+    second = registry.get("m1")
+
+    assert first is second
+    assert first.model.evaluated
+    assert load_counter == {"tokenizer": 1, "model": 1}
+
+    registry.get("m2")
+    assert load_counter["model"] == 2
+    assert sorted(registry.loaded_models()) == ["m1", "m2"]
+
+
+def test_concurrent_first_requests_share_one_load(load_counter):
+    registry = ModelRegistry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("m1"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert load_counter["model"] == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_unload_idle_drops_only_stale_models(load_counter):
+    registry = ModelRegistry(idle_seconds=60)
+    registry.warm_up("old")
+    registry.get("fresh")
+    registry.get("old").last_used -= 120
+
+    registry.unload_idle()
+    assert registry.loaded_models() == ["fresh"]
+
+    registry.get("old")
+    assert load_counter["model"] == 3
+
+
+def test_unload_idle_disabled_without_timeout(load_counter):
+    registry = ModelRegistry()
+    registry.get("m1").last_used -= 10 ** 6
+    registry.unload_idle()
+    assert registry.loaded_models() == ["m1"]
+
+
+class RecordingTensor:
+    def __init__(self, data):
+        self.data = data
+
+    def to(self, device):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+class EchoTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, texts):
+        ids = [[ord(ch) for ch in text] for text in texts]
+        return {"input_ids": ids, "attention_mask": [[1] * len(row) for row in ids]}
+
+    def batch_decode(self, outputs, **kwargs):
+        return ["".join(chr(i) for i in row if i) for row in outputs]
+
+
+class EchoModel:
+    def __init__(self):
+        self.batches = []
+
+    def my_generate(self, input_ids, attention_mask, **kwargs):
+        self.batches.append((input_ids.data, attention_mask.data))
+        return input_ids
+
+
+class RegistryStub:
+    def __init__(self, model):
+        self.loaded = title_model_module.LoadedModel(EchoTokenizer(), model, "cpu")
+
+    def get(self, model_id, quantize=False):
+        return self.loaded
+
+
+@pytest.fixture
+def echo_model(monkeypatch):
+    monkeypatch.setattr(title_model_module.torch, "LongTensor", RecordingTensor)
+    return EchoModel()
+
+
+def test_batcher_merges_concurrent_requests_into_one_padded_generate(echo_model):
+    batcher = title_model_module.TitleBatcher(RegistryStub(echo_model), max_batch_size=3, max_wait_ms=1000)
+    futures = [batcher.submit("m", text) for text in ("a", "bcd", "ef")]
+
+    assert [future.result(timeout=5) for future in futures] == ["a", "bcd", "ef"]
+    assert len(echo_model.batches) == 1
+    input_ids, attention_mask = echo_model.batches[0]
+    assert all(len(row) == 3 for row in input_ids)
+    assert attention_mask == [[1, 0, 0], [1, 1, 1], [1, 1, 0]]
+
+
+def test_batcher_flushes_partial_batch_after_max_wait(echo_model):
+    batcher = title_model_module.TitleBatcher(RegistryStub(echo_model), max_batch_size=8, max_wait_ms=5)
+    assert batcher.generate("m", "solo", timeout=5) == "solo"
+    assert len(echo_model.batches) == 1
+
+
+def test_batcher_propagates_generation_errors(echo_model):
+    def broken(**kwargs):
+        raise RuntimeError("boom")
+
+    echo_model.my_generate = broken
+    batcher = title_model_module.TitleBatcher(RegistryStub(echo_model), max_batch_size=2, max_wait_ms=5)
+    with pytest.raises(RuntimeError):
+        batcher.generate("m", "x", timeout=5)
+
+
+def test_quantized_variant_is_loaded_separately(load_counter, monkeypatch):
+    quantized = []
+
+    def quantize_dynamic(model, layers, dtype):
+        quantized.append((layers, dtype))
+        return model
+
+    monkeypatch.setattr(title_model_module.torch.ao.quantization, "quantize_dynamic", quantize_dynamic)
+    registry = ModelRegistry()
+    registry.get("m1")
+    registry.get("m1", quantize=True)
+    registry.get("m1", quantize=True)
+
+    assert load_counter["model"] == 2
+    assert quantized == [({title_model_module.torch.nn.Linear}, title_model_module.torch.qint8)]
+    assert sorted(registry.loaded_models()) == ["m1", "m1:int8"]
+
+    registry.unload("m1")
+    assert registry.loaded_models() == []
+
+
+def test_inference_profile_from_env(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_TITLE_QUANTIZE", "true")
+    monkeypatch.setenv("BOOKSTORE_TITLE_SEARCH_TYPE", "greedy")
+    monkeypatch.setenv("BOOKSTORE_TITLE_THREADS", "2")
+    profile = title_model_module.InferenceProfile.from_env()
+
+    assert (profile.quantize, profile.search_type, profile.num_threads) == (True, "greedy", 2)
+    assert profile.cache_params() == {"max_seq_len": 256, "search_type": "greedy", "quantize": "int8"}
+
+    with pytest.raises(ValueError):
+        title_model_module.InferenceProfile(search_type="sampling")
+
+
+def test_batcher_applies_profile(echo_model, monkeypatch):
+    threads = []
+    monkeypatch.setattr(title_model_module.torch, "set_num_threads", threads.append)
+    kwargs_seen = []
+
+    def my_generate(input_ids, attention_mask, **kwargs):
+        kwargs_seen.append(kwargs)
+        return input_ids
+
+    echo_model.my_generate = my_generate
+    profile = title_model_module.InferenceProfile(search_type="greedy", num_threads=3)
+    batcher = title_model_module.TitleBatcher(RegistryStub(echo_model), max_wait_ms=1, profile=profile)
+
+    assert batcher.generate("m", "x", timeout=5) == "x"
+    assert threads == [3]
+    assert kwargs_seen == [{"max_seq_len": 256, "search_type": "greedy"}]
+
+
+def test_registry_rejects_models_outside_allow_list(load_counter):
+    registry = ModelRegistry(allowed_models={"m1"})
+    registry.get("m1")
+
+    with pytest.raises(ValueError):
+        registry.get("attacker/repo")
+    assert registry.loaded_models() == ["m1"]
+    assert load_counter["model"] == 1
+
+
+def test_only_default_model_loads_remote_code(monkeypatch):
+    trusted = []
+    monkeypatch.setattr(title_model_module.transformers.AutoTokenizer, "from_pretrained", lambda *a, **k: object())
+    monkeypatch.setattr(title_model_module.transformers.AutoModelForSeq2SeqLM, "from_pretrained",
+                        lambda model_id, **kwargs: trusted.append(kwargs["trust_remote_code"]) or DummyModel())
+    monkeypatch.setattr(title_model_module.torch.cuda, "is_available", lambda: False)
+    registry = ModelRegistry()
+
+    registry.get(title_model_module.DEFAULT_TITLE_MODEL)
+    registry.get("other/model")
+    assert trusted == [True, False]
+
+
+def test_allowed_title_models_always_includes_default(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_TITLE_MODELS", "extra/model, ")
+    assert title_model_module.allowed_title_models() == {title_model_module.DEFAULT_TITLE_MODEL, "extra/model"}
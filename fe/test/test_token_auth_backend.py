@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import be.model.token_auth as token_auth
+import be.model.user as user_module
+from be.model.token_auth import RevocationList
+
+
+@pytest.fixture
+def stateless(monkeypatch, tmp_path):
+    monkeypatch.setenv("BOOKSTORE_AUTH_MODE", "stateless")
+    monkeypatch.setenv("BOOKSTORE_TOKEN_SECRET", "test-secret")
+    revocations = RevocationList(str(tmp_path / "revocations.json"))
+    monkeypatch.setattr(token_auth, "revocation_list", revocations)
+    return revocations
+
+
+def make_user():
+    u = user_module.User.__new__(user_module.User)
+    u.conn = None  # 无状态模式下校验 token 不访问数据库
+    return u
+
+
+def test_auth_mode_defaults_to_db(monkeypatch):
+    monkeypatch.delenv("BOOKSTORE_AUTH_MODE", raising=False)
+    assert token_auth.auth_mode() == token_auth.AUTH_MODE_DB
+    monkeypatch.setenv("BOOKSTORE_AUTH_MODE", "bogus")
+    assert token_auth.auth_mode() == token_auth.AUTH_MODE_DB
+
+
+def test_stateless_token_verifies_without_database(stateless):
+    token = token_auth.encode_stateless("u1", "t1", 60)
+    u = make_user()
+    assert u.check_token("u1", token) == (200, "ok")
+    assert u.check_token("u2", token) == (401, "authorization fail")
+    assert u.check_token("u1", token + "x") == (401, "authorization fail")
+
+
+def test_expired_stateless_token_is_rejected(stateless):
+    token = token_auth.encode_stateless("u1", "t1", -1)
+    assert token_auth.decode_stateless(token, "u1") is None
+
+
+def test_logout_revokes_only_that_token(stateless):
+    first = token_auth.encode_stateless("u1", "phone", 60)
+    second = token_auth.encode_stateless("u1", "laptop", 60)
+    u = make_user()
+
+    assert u.logout("u1", first) == (200, "ok")
+    assert u.check_token("u1", first) == (401, "authorization fail")
+    assert u.check_token("u1", second) == (200, "ok")
+    assert u.logout("u1", first) == (401, "authorization fail")
+
+
+def test_user_revocation_covers_tokens_issued_before(stateless):
+    old = token_auth.encode_stateless("u1", "t1", 60)
+    stateless.revoke_user("u1", 60)
+    time.sleep(0.01)
+    new = token_auth.encode_stateless("u1", "t1", 60)
+
+    assert token_auth.decode_stateless(old, "u1") is None
+    assert token_auth.decode_stateless(new, "u1") is not None
+
+
+def test_revocations_survive_reload_and_purge_expired(tmp_path):
+    path = str(tmp_path / "revocations.json")
+    now = time.time()
+    revocations = RevocationList(path, bucket_seconds=1)
+    revocations.revoke("live", now + 60)
+    revocations.revoke("already-expired", now - 5)
+    revocations.revoke_user("u1", 60)
+    revocations._buckets[revocations._bucket(now - 10)] = {"stale"}
+    revocations.save()
+
+    reloaded = RevocationList(path, bucket_seconds=1)
+    reloaded.load()
+    assert reloaded.is_revoked("u2", "live", now, now + 60)
+    assert reloaded.is_revoked("u1", "any", now - 1, now + 60)
+    assert len(reloaded) == 2
+
+
+def test_concurrent_revokes_are_all_persisted(tmp_path):
+    path = str(tmp_path / "revocations.json")
+    revocations = RevocationList(path)
+    expire_at = time.time() + 60
+    threads = [threading.Thread(target=revocations.revoke, args=(f"jti-{i}", expire_at)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = RevocationList(path)
+    reloaded.load()
+    assert len(reloaded) == 20
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["revocations.json"]
+
+
+def test_corrupt_revocation_file_is_reported(tmp_path, caplog):
+    path = tmp_path / "revocations.json"
+    path.write_text("{\"buckets\": {\"1\": [", encoding="utf-8")
+
+    revocations = RevocationList(str(path))
+    with caplog.at_level(logging.CRITICAL):
+        revocations.load()
+
+    assert len(revocations) == 0
+    assert any(record.levelno == logging.CRITICAL for record in caplog.records)
+
+
+class SharedStoreStub:
+    """
+    与 MySQLRevocationStore 接口一致的内存替身，两个 RevocationList 共用同一个实例模拟两个 worker
+    """
+
+    def __init__(self):
+        self.tokens = {}
+        self.users = {}
+
+    def add_token(self, jti, expire_at):
+        self.tokens[jti] = max(expire_at, self.tokens.get(jti, 0))
+
+    def add_user(self, user_id, cutoff, expire_at):
+        self.users[user_id] = (cutoff, expire_at)
+
+    def fetch(self, now):
+        return ([(jti, e) for jti, e in self.tokens.items() if e > now],
+                {u: c for u, c in self.users.items() if c[1] > now})
+
+    def purge(self, now):
+        self.tokens = {jti: e for jti, e in self.tokens.items() if e > now}
+
+
+def test_revocation_in_one_worker_is_seen_by_another(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_TOKEN_SECRET", "test-secret")
+    shared = SharedStoreStub()
+    worker_a = RevocationList(shared_store=shared, sync_seconds=0)
+    worker_b = RevocationList(shared_store=shared, sync_seconds=0)
+    token = token_auth.encode_stateless("u1", "t1", 60)
+
+    monkeypatch.setattr(token_auth, "revocation_list", worker_b)
+    assert token_auth.decode_stateless(token, "u1") is not None
+
+    payload = token_auth.jwt.decode(token, key="test-secret", algorithms=["HS256"])
+    worker_a.revoke(payload["jti"], payload["exp"])
+    assert token_auth.decode_stateless(token, "u1") is None
+
+    worker_a.revoke_user("u2", 60)
+    assert worker_b.is_revoked("u2", "other", time.time() - 1, time.time() + 60)
+
+
+def test_shared_revocations_sync_at_most_every_interval(monkeypatch):
+    shared = SharedStoreStub()
+    worker = RevocationList(shared_store=shared, sync_seconds=60)
+    now = time.time()
+    assert not worker.is_revoked("u1", "jti-1", now, now + 60)
+
+    shared.add_token("jti-1", now + 60)
+    assert not worker.is_revoked("u1", "jti-1", now, now + 60)  # 间隔内使用内存快照
+    worker._synced_at -= 60
+    assert worker.is_revoked("u1", "jti-1", now, now + 60)
+
+
+def test_sync_failure_keeps_existing_revocations():
+    class BrokenStore(SharedStoreStub):
+        def fetch(self, now):
+            raise RuntimeError("db down")
+
+    worker = RevocationList(shared_store=BrokenStore(), sync_seconds=0)
+    now = time.time()
+    worker.revoke("jti-1", now + 60)
+
+    assert worker.is_revoked("u1", "jti-1", now, now + 60)
+
+
+def test_mysql_revocation_store_round_trip():
+    executed = []
+
+    class Result:
+        def fetchall(self):
+            return [("jti:abc", None, 200.0), ("user:u1", 100.0, 300.0)]
+
+    class Conn:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, statement, params=None):
+            executed.append((str(statement).strip(), params))
+            return Result()
+
+        def commit(self):
+            pass
+
+    class Engine:
+        def connect(self):
+            return Conn()
+
+    shared = token_auth.MySQLRevocationStore(Engine())
+    shared.add_user("u1", 100.0, 300.0)
+    assert executed[0][1] == {"key": "user:u1", "cutoff": 100.0, "expire_at": 300.0}
+    assert "GREATEST(cutoff, VALUES(cutoff))" in executed[0][0]
+    assert shared.fetch(150.0) == ([("abc", 200.0)], {"u1": (100.0, 300.0)})
@@ -0,0 +1,63 @@
+import time
+
+from be.model.token_cache import LocalBroker, TokenCache
+
+
+def test_valid_until_expiry():
+    cache = TokenCache()
+    cache.put("u1", "t1", time.time() + 60)
+    assert cache.is_valid("u1", "t1")
+    assert not cache.is_valid("u1", "other")
+
+    cache.put("u2", "t2", time.time() + 0.01)
+    time.sleep(0.02)
+    assert not cache.is_valid("u2", "t2")
+    assert len(cache) == 1
+
+
+def test_expired_tokens_are_not_cached():
+    cache = TokenCache()
+    cache.put("u1", "t1", time.time() - 1)
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_user_index_consistent():
+    cache = TokenCache(max_entries=2)
+    expire = time.time() + 60
+    cache.put("u1", "a", expire)
+    cache.put("u2", "b", expire)
+    assert cache.is_valid("u1", "a")
+    cache.put("u3", "c", expire)
+
+    assert not cache.is_valid("u2", "b")
+    assert cache.is_valid("u1", "a")
+    cache.invalidate_user("u2")
+    assert len(cache) == 2
+
+
+def test_invalidation_fans_out_to_other_workers():
+    broker = LocalBroker()
+    worker_a = TokenCache(broker=broker)
+    worker_b = TokenCache(broker=broker)
+    expire = time.time() + 60
+    for cache in (worker_a, worker_b):
+        cache.put("u1", "t1", expire)
+        cache.put("u2", "t2", expire)
+
+    worker_a.invalidate_user("u1")
+    assert not worker_a.is_valid("u1", "t1")
+    assert not worker_b.is_valid("u1", "t1")
+    assert worker_b.is_valid("u2", "t2")
+
+
+def test_broker_isolates_failing_subscribers():
+    broker = LocalBroker()
+    received = []
+
+    def broken(message):
+        raise RuntimeError("boom")
+
+    broker.subscribe("ch", broken)
+    broker.subscribe("ch", received.append)
+    broker.publish("ch", {"user_id": "u1"})
+    assert received == [{"user_id": "u1"}]
@@ -0,0 +1,392 @@
+from typing import Iterable, List, Tuple
+
+import pytest
+
+import be.model.credentials as credentials_module
+import be.model.user as user_module
+
+
+class ResultStub:
+    def __init__(self, *, fetchone=None, scalar=None, fetchall=None, rowcount=None):
+        self._fetchone = fetchone
+        self._scalar = scalar
+        self._fetchall = fetchall
+        self.rowcount = rowcount
+
+    def fetchone(self):
+        return self._fetchone
+
+    def scalar(self):
+        return self._scalar
+
+    def fetchall(self):
+        return list(self._fetchall or [])
+
+
+class TransactionStub:
+    def __init__(self):
+        self.committed = False
+        self.rolled_back = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class ConnectionStub:
+    def __init__(self, *, execute_plan: Iterable = None):
+        self.execute_plan = list(execute_plan or [])
+        self.executed: List[Tuple[str, object]] = []
+        self.transaction = None
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, statement, params=None):
+        sql = str(statement).strip()
+        self.executed.append((sql, params))
+        if not self.execute_plan:
+            return ResultStub()
+        step = self.execute_plan.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        if callable(step):
+            return step(sql, params)
+        return step
+
+    def begin(self):
+        self.transaction = TransactionStub()
+        return self.transaction
+
+    def commit(self):
+        self.committed = True
+
+
+class EngineStub:
+    def __init__(self, connections):
+        self._connections = list(connections)
+
+    def connect(self):
+        if not self._connections:
+            raise AssertionError("No more connections available.")
+        conn = self._connections.pop(0)
+        if isinstance(conn, Exception):
+            raise conn
+        return conn
+
+
+@pytest.fixture(autouse=True)
+def reset_token_cache():
+    user_module.token_cache.clear()
+    user_module.credential_service.clear()
+    yield
+    user_module.token_cache.clear()
+    user_module.credential_service.clear()
+
+
+def make_user(connections):
+    u = user_module.User.__new__(user_module.User)
+    u.conn = EngineStub(connections)
+    return u
+
+
+def book_row(book_id):
+    return (book_id, f"title-{book_id}", "author", "publisher", 10)
+
+
+@pytest.fixture(autouse=True)
+def default_recommender(monkeypatch):
+    monkeypatch.delenv(user_module.recommender.DEFAULT_ENGINE_ENV, raising=False)
+    monkeypatch.delenv(user_module.recommender.ENDPOINT_ENGINE_ENV.format("AUTH"), raising=False)
+
+
+def test_recommend_books_batch_ranks_cooccurring_books(monkeypatch):
+    cold_start = []
+    monkeypatch.setattr(user_module, "bestseller_books",
+                        lambda conn, n: cold_start.append(n) or [{"book_id": "hot"}])
+    matrix_conn = ConnectionStub(
+        execute_plan=[
+            ResultStub(fetchall=[
+                ("u1", "b1", 1),
+                ("u2", "b1", 1),
+                ("u2", "b2", 2),
+                ("u3", "b1", 1),
+                ("u3", "b3", 1),
+                ("u4", "b9", 1),
+            ])
+        ]
+    )
+    details_conn = ConnectionStub(
+        execute_plan=[ResultStub(fetchall=[book_row("b2"), book_row("b3"), book_row("b1")])]
+    )
+    u = make_user([matrix_conn, details_conn, ConnectionStub(execute_plan=[])])
+
+    code, message, results = u.recommend_books_batch(["u1", "u4", "ghost", "ghost2"], 5)
+    assert (code, message) == (200, "ok")
+
+    results = dict(results)
+    assert [book["book_id"] for book in results["u1"]] == ["b2", "b3"]
+    assert results["u4"] == []
+    # 没有历史订单的用户与 recommend_books 一致以畅销榜兜底，畅销榜只查询一次
+    assert results["ghost"] == results["ghost2"] == [{"book_id": "hot"}]
+    assert cold_start == [5]
+    # 同一分块只发出一次书籍详情查询
+    assert len(details_conn.executed) == 1
+    assert "h.status <> 3" in matrix_conn.executed[0][0]
+
+
+@pytest.mark.parametrize("buyer_ids", [["u1", ["u2"]], ["u1", {"id": "u2"}], ["u1", ""], "u1"])
+def test_recommend_books_batch_rejects_invalid_ids_before_streaming(buyer_ids):
+    u = make_user([])
+
+    code, _, results = u.recommend_books_batch(buyer_ids, 5)
+
+    assert code == 400
+    assert list(results) == []
+
+
+def test_recommend_books_batch_uses_selected_engine(monkeypatch):
+    monkeypatch.setenv(user_module.recommender.ENDPOINT_ENGINE_ENV.format("AUTH"), "minhash")
+    calls = []
+
+    def fake_recommend(engine, user_id, n, name=None, **kwargs):
+        calls.append((user_id, n, name))
+        return (200, "ok", [{"book_id": "m1"}]) if user_id == "u1" else (528, "db down", [])
+
+    monkeypatch.setattr(user_module.recommender, "recommend", fake_recommend)
+    u = make_user([])
+
+    code, _, results = u.recommend_books_batch(["u1", "u2"], 3)
+
+    assert code == 200
+    assert list(results) == [("u1", [{"book_id": "m1"}]), ("u2", [])]
+    assert calls == [("u1", 3, "minhash"), ("u2", 3, "minhash")]
+
+
+def test_recommend_books_batch_respects_limit():
+    matrix = [("u1", "b0", 1)] + [(f"other{i}", "b0", 1) for i in range(3)]
+    matrix += [(f"other{i}", f"x{i}", i + 1) for i in range(3)]
+    u = make_user([
+        ConnectionStub(execute_plan=[ResultStub(fetchall=matrix)]),
+        ConnectionStub(execute_plan=[ResultStub(fetchall=[book_row("x2"), book_row("x1")])]),
+    ])
+
+    code, _, results = u.recommend_books_batch(["u1"], 2)
+    assert code == 200
+    assert [book["book_id"] for _, books in results for book in books] == ["x2", "x1"]
+
+
+def test_recommend_books_batch_handles_database_error():
+    u = make_user([user_module.sa.exc.SQLAlchemyError("db down")])
+    code, message, results = u.recommend_books_batch(["u1"], 5)
+    assert code == 528
+    assert "Database error" in message
+    assert list(results) == []
+
+
+def test_check_token_caches_successful_validation():
+    token = user_module.jwt_encode("u1", "terminal")
+    u = make_user([ConnectionStub(execute_plan=[ResultStub(fetchone=(token,))])])
+
+    assert u.check_token("u1", token) == (200, "ok")
+    # 第二次校验命中缓存，不再获取数据库连接
+    assert u.check_token("u1", token) == (200, "ok")
+
+
+def test_check_token_rejects_mismatched_token_without_caching():
+    token = user_module.jwt_encode("u1", "terminal")
+    u = make_user([
+        ConnectionStub(execute_plan=[ResultStub(fetchone=("newer",))]),
+        ConnectionStub(execute_plan=[ResultStub(fetchone=("newer",))]),
+    ])
+
+    assert u.check_token("u1", token) == (401, "authorization fail")
+    assert u.check_token("u1", token) == (401, "authorization fail")
+
+
+def test_logout_invalidates_cached_token():
+    token = user_module.jwt_encode("u1", "terminal")
+    user_module.token_cache.put("u1", token, user_module.time.time() + 60)
+    u = make_user([ConnectionStub(execute_plan=[ResultStub(rowcount=1)])])
+
+    assert u.logout("u1", token) == (200, "ok")
+    assert not user_module.token_cache.is_valid("u1", token)
+
+
+def test_check_token_looks_up_session_by_terminal():
+    token = user_module.jwt_encode("u1", "terminal-a")
+    conn = ConnectionStub(execute_plan=[ResultStub(fetchone=(token,))])
+    u = make_user([conn])
+
+    assert u.check_token("u1", token) == (200, "ok")
+    sql, params = conn.executed[0]
+    assert "FROM user_sessions" in sql
+    assert params == {"user_id": "u1", "terminal": "terminal-a"}
+
+
+def test_check_token_rejects_foreign_token_without_database():
+    token = user_module.jwt_encode("u2", "terminal")
+    u = make_user([])
+
+    assert u.check_token("u1", token) == (401, "authorization fail")
+
+
+def test_login_upserts_session_without_touching_users():
+    stored = user_module.credential_service.hash("pwd")
+    conns = [
+        ConnectionStub(execute_plan=[ResultStub(fetchone=(stored,))]),
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1)]),
+    ]
+    u = make_user(conns)
+
+    code, _, token = u.login("u1", "pwd", "terminal-b")
+
+    assert code == 200
+    assert len(conns[1].executed) == 1
+    sql, params = conns[1].executed[0]
+    assert "INSERT INTO user_sessions" in sql and "ON DUPLICATE KEY UPDATE" in sql
+    assert params["terminal"] == "terminal-b" and params["token"] == token
+    assert conns[1].committed
+
+
+def test_login_rehashes_legacy_plaintext_password():
+    conns = [
+        ConnectionStub(execute_plan=[ResultStub(fetchone=("pwd",))]),
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1), ResultStub(rowcount=1)]),
+    ]
+    u = make_user(conns)
+
+    code, _, _ = u.login("u1", "pwd", "terminal-b")
+
+    assert code == 200
+    sql, params = conns[1].executed[0]
+    assert sql.startswith("UPDATE users SET password")
+    assert params["old_password"] == "pwd"
+    assert credentials_module.verify_password("pwd", params["new_password"])
+    assert "INSERT INTO user_sessions" in conns[1].executed[1][0]
+
+
+def test_stateless_login_rehashes_before_issuing_token(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_AUTH_MODE", "stateless")
+    conns = [
+        ConnectionStub(execute_plan=[ResultStub(fetchone=("pwd",))]),
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1)]),
+    ]
+    u = make_user(conns)
+
+    code, _, token = u.login("u1", "pwd", "terminal-b")
+
+    assert code == 200 and token
+    assert len(conns[1].executed) == 1
+    sql, params = conns[1].executed[0]
+    assert sql.startswith("UPDATE users SET password")
+    assert credentials_module.verify_password("pwd", params["new_password"])
+    assert conns[1].committed
+
+
+def test_stateless_login_skips_database_when_hash_is_current(monkeypatch):
+    monkeypatch.setenv("BOOKSTORE_AUTH_MODE", "stateless")
+    stored = user_module.credential_service.hash("pwd")
+    u = make_user([ConnectionStub(execute_plan=[ResultStub(fetchone=(stored,))])])
+
+    code, _, token = u.login("u1", "pwd", "terminal-b")
+
+    assert code == 200 and token
+
+
+def test_login_rejects_wrong_password():
+    stored = user_module.credential_service.hash("pwd")
+    u = make_user([ConnectionStub(execute_plan=[ResultStub(fetchone=(stored,))])])
+
+    assert u.login("u1", "wrong", "terminal")[0] == 401
+
+
+def test_logout_deletes_only_current_terminal_session():
+    token = user_module.jwt_encode("u1", "terminal-a")
+    user_module.token_cache.put("u1", token, user_module.time.time() + 60)
+    conn = ConnectionStub(execute_plan=[ResultStub(rowcount=1)])
+    u = make_user([conn])
+
+    assert u.logout("u1", token) == (200, "ok")
+    sql, params = conn.executed[0]
+    assert sql.startswith("DELETE FROM user_sessions")
+    assert params == {"user_id": "u1", "terminal": "terminal-a"}
+
+
+def test_purge_expired_sessions_deletes_in_batches():
+    conn = ConnectionStub(execute_plan=[ResultStub(rowcount=2), ResultStub(rowcount=2), ResultStub(rowcount=1)])
+    u = make_user([conn])
+
+    assert u.purge_expired_sessions(batch_size=2) == (200, "ok", 5)
+    assert len(conn.executed) == 3
+    assert all(params == {"batch_size": 2} for _, params in conn.executed)
+
+
+@pytest.fixture
+def fast_hashes(monkeypatch):
+    monkeypatch.setattr(user_module.credential_service, "hash_many", lambda passwords: [f"hash-{p}" for p in passwords])
+
+
+def test_register_batch_reports_conflicts_without_aborting(monkeypatch, fast_hashes):
+    monkeypatch.setattr(user_module, "REGISTER_BATCH_CHUNK", 2)
+    conns = [
+        # 第一块：u2 已存在，保存的是旧哈希
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1), ResultStub(fetchall=[("u1", "hash-p1"), ("u2", "old")])]),
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1), ResultStub(fetchall=[("u3", "hash-p3")])]),
+    ]
+    u = make_user(conns)
+
+    code, message, result = u.register_batch([
+        {"user_id": "u1", "password": "p1"},
+        {"user_id": "u2", "password": "p2"},
+        {"user_id": "u1", "password": "again"},
+        {"user_id": "", "password": "p"},
+        {"user_id": "u3", "password": "p3"},
+    ])
+
+    assert (code, message) == (200, "ok")
+    assert result == {"registered": 2, "conflicts": ["u1", "u2"], "invalid": [3]}
+    insert_sql, params = conns[0].executed[0]
+    assert insert_sql.startswith("INSERT IGNORE INTO users (user_id, password) VALUES")
+    assert params == {"user_id_0": "u1", "password_0": "hash-p1", "user_id_1": "u2", "password_1": "hash-p2"}
+    assert conns[0].committed and conns[1].committed
+
+
+def test_register_batch_rejects_oversized_request(monkeypatch):
+    monkeypatch.setattr(user_module, "REGISTER_BATCH_MAX", 1)
+    u = make_user([])
+
+    code, _, result = u.register_batch([{"user_id": "u1", "password": "p"}, {"user_id": "u2", "password": "p"}])
+
+    assert code == 400
+    assert result["registered"] == 0
+
+
+def test_register_batch_returns_partial_result_on_database_error(monkeypatch, fast_hashes):
+    monkeypatch.setattr(user_module, "REGISTER_BATCH_CHUNK", 1)
+    conns = [
+        ConnectionStub(execute_plan=[ResultStub(rowcount=1), ResultStub(fetchall=[("u1", "hash-p1")])]),
+        ConnectionStub(execute_plan=[user_module.sa.exc.SQLAlchemyError("boom")]),
+    ]
+    u = make_user(conns)
+
+    code, _, result = u.register_batch([{"user_id": "u1", "password": "p1"}, {"user_id": "u2", "password": "p2"}])
+
+    assert code == 528
+    assert result["registered"] == 1
+
+
+def test_register_batch_returns_503_when_hashing_fails(monkeypatch):
+    monkeypatch.setattr(user_module.credential_service, "hash_many", lambda passwords: None)
+    u = make_user([])
+
+    code, message, result = u.register_batch([{"user_id": "u1", "password": "p"}])
+
+    assert (code, message) == (503, "Credential service is busy")
+    assert result["registered"] == 0
@@ -70,9 +70,9 @@ def stub_registers(monkeypatch):
             self.created.append(store_id)
             return 200
 
-        def add_book(self, store_id, stock_level, book_info):
-            self.added.append((store_id, book_info["id"]))
-            return 200
+        def add_books(self, store_id, stock_level, books):
+            self.added.extend((store_id, book_info["id"]) for book_info in books)
+            return 200, [{"book_id": book_info["id"], "code": 200, "message": "ok"} for book_info in books]
 
     class DummyRegisteredBuyer:
         def __init__(self, user_id):
@@ -82,19 +82,29 @@ def stub_registers(monkeypatch):
         def add_funds(self, amount):
             self.funds += amount
 
-    def fake_register_new_seller(user_id, password):
+    class DummyAuth:
+        def __init__(self, url_prefix):
+            self.url_prefix = url_prefix
+
+        def register_batch(self, users):
+            registered.extend(users)
+            return 200, {"registered": len(users), "conflicts": [], "invalid": []}
+
+    def fake_seller(url_prefix, user_id, password):
         seller = DummySeller(user_id)
         sellers.append(seller)
         return seller
 
-    def fake_register_new_buyer(user_id, password):
+    def fake_buyer(url_prefix, user_id, password):
         buyer = DummyRegisteredBuyer(user_id)
         buyers.append(buyer)
         return buyer
 
-    monkeypatch.setattr(workload, "register_new_seller", fake_register_new_seller)
-    monkeypatch.setattr(workload, "register_new_buyer", fake_register_new_buyer)
-    return sellers, buyers
+    registered = []
+    monkeypatch.setattr(workload, "Auth", DummyAuth)
+    monkeypatch.setattr(workload, "Seller", fake_seller)
+    monkeypatch.setattr(workload, "Buyer", fake_buyer)
+    return sellers, buyers, registered
 
 
 @pytest.fixture
@@ -190,7 +200,7 @@ def test_workload_init_respects_existing_cache_uuid(monkeypatch, book_db_factory
 def test_gen_database_populates_and_saves_cache(
     monkeypatch, tmp_path, book_db_factory, stub_registers, capture_writes, capture_logging
 ):
-    sellers, buyers = stub_registers
+    sellers, buyers, registered = stub_registers
     infos, _ = capture_logging
     book_db_factory(count=1, infos=[[{"id": "book-1"}], []])
     configure_bench_conf(monkeypatch, Book_Num_Per_Store=1, Buyer_Num=1)
@@ -202,7 +212,9 @@ def test_gen_database_populates_and_saves_cache(
     assert wl.cache_loaded is True
     assert sellers[0].created == [wl.store_ids[0]]
     assert wl.book_ids[wl.store_ids[0]] == ["book-1"]
+    assert sellers[0].added == [(wl.store_ids[0], "book-1")]
     assert buyers[0].funds == conf.Default_User_Funds
+    assert registered == [wl.to_seller_id_and_password(1), wl.to_buyer_id_and_password(1)]
     assert any("seller data loaded" in msg for msg in infos)
 
     payload = json.load(wl.cache_path.open("r", encoding="utf-8"))
@@ -225,8 +237,8 @@ def test_gen_database_skips_when_cache_present(monkeypatch, book_db_factory, cap
     monkeypatch.setattr(workload.Workload, "_try_load_cache", fake_try)
     monkeypatch.setattr(
         workload,
-        "register_new_seller",
-        lambda *args, **kwargs: pytest.fail("should not register seller when cache exists"),
+        "Auth",
+        lambda *args, **kwargs: pytest.fail("should not register users when cache exists"),
     )
     wl = workload.Workload()
     wl.gen_database()
@@ -357,4 +369,22 @@ def test_identifier_helpers_use_uuid(monkeypatch, book_db_factory):
     assert str(5) in seller_pwd and wl.uuid in seller_pwd
 
     store_id = wl.to_store_id(2, 3)
-    assert str(2) in store_id and str(3) in store_id and wl.uuid in store_id
\ No newline at end of file
+    assert str(2) in store_id and str(3) in store_id and wl.uuid in store_id
+
+def test_register_users_calls_batch_endpoint_in_chunks(monkeypatch, stub_registers):
+    _, _, registered = stub_registers
+    calls = []
+    original = workload.Auth.register_batch
+
+    def counting(self, users):
+        calls.append(len(users))
+        return original(self, users)
+
+    monkeypatch.setattr(workload.Auth, "register_batch", counting)
+    monkeypatch.setattr(workload, "REGISTER_BATCH_SIZE", 2)
+    wl = workload.Workload.__new__(workload.Workload)
+
+    wl.register_users([("u1", "p1"), ("u2", "p2"), ("u3", "p3")])
+
+    assert calls == [2, 1]
+    assert [user_id for user_id, _ in registered] == ["u1", "u2", "u3"]